@@ -1,15 +1,39 @@
 import click
 import logging
 
+# only the lightweight modules are imported here, so that `--help` and the option validation
+# start fast: the engines, and their heavy dependencies (selenium, requests, aiohttp), are
+# imported in `main`, once the selected engine and options need them
 from _logs import set_logger_config
-from _scraper import BootsPageScraper
+from _base import DEFAULT_MAX_CONCURRENCY, DEFAULT_RATE, read_seed_file
+from _browser import BrowserProfile, PAGE_LOAD_STRATEGIES, DEFAULT_PAGE_LOAD_STRATEGY, DEFAULT_MAX_PAGES
+from _incremental import DEFAULT_TTL
+from _changes import ChangeIndex
+from _cache import PageCache, DEFAULT_MAX_BYTES
+from _metrics import METRICS, METRICS_FORMATS
+from _output import OUTPUT_WRITERS
+
+def _is_given(name: str) -> bool:
+    """Whether the option `name` of the running command was given, rather than left to its default"""
+    source = click.get_current_context().get_parameter_source(name)
+    return source is not None and source is not click.core.ParameterSource.DEFAULT
 
 @click.command()
 @click.option(
     '--url', 
-    default = None, 
+    'urls',
+    multiple = True, 
     type = str, 
-    help = 'Target URL for the Boots - Sleep page.'
+    help = (
+        'Target URL for the Boots - Sleep page. Repeat it to crawl several categories, '
+        'whose products are parsed once, even if listed in several.'
+    )
+)
+@click.option(
+    '--seed-file', 
+    default = None, 
+    type = click.Path(exists = True, dir_okay = False), 
+    help = 'File with the URLs of the categories to crawl, one per line, in addition to the `--url` ones.'
 )
 @click.option(
     '--headless', 
@@ -36,6 +60,37 @@ from _scraper import BootsPageScraper
     type = str, 
     help = 'File containing the output data.'
 )
+@click.option(
+    '--output-format', 
+    default = 'json', 
+    type = click.Choice(list(OUTPUT_WRITERS)), 
+    show_default = True, 
+    help = (
+        'Format of the output file: `json` writes a single JSON object, whereas `ndjson` '
+        'writes a product per line, and the summary in a separate file, as `csv`, `parquet` '
+        'and `arrow` (IPC) do, whose typed records also have the run timestamp. The last two need `pyarrow`.'
+    )
+)
+@click.option(
+    '--append', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to add the output file to the history of runs, i.e., a folder named as the output file '
+        'and partitioned by run date, e.g., `sleep_products/run_date=2024-01-31/`, instead of overwriting it.'
+    )
+)
+@click.option(
+    '--listing-only', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to build the product records from the listing pages, i.e., from the product teasers and '
+        'their structured data, and only load the pages of the products whose listing misses the title or price.'
+    )
+)
 @click.option(
     '--force-remove', 
     is_flag = True, 
@@ -58,38 +113,334 @@ from _scraper import BootsPageScraper
     show_default = True, 
     help = 'Whether to paginate over all results in the Boots - Sleep page.'
 )
+@click.option(
+    '--workers', 
+    default = 1, 
+    type = click.IntRange(min = 1), 
+    show_default = True, 
+    help = (
+        'Number of sessions (WebDriver or HTTP) that parse the products concurrently, '
+        'or of requests in flight for the `async` engine.'
+    )
+)
+@click.option(
+    '--engine', 
+    default = 'selenium', 
+    type = click.Choice(['selenium', 'http', 'async']), 
+    show_default = True, 
+    help = (
+        'How pages are fetched: `selenium` loads them in Chrome, whereas `http` '
+        'requests their HTML and only uses Chrome to read the ratings. `async` '
+        'is like `http`, but requests the pages from an asyncio event loop.'
+    )
+)
+@click.option(
+    '--rating-fallback/--no-rating-fallback', 
+    default = True, 
+    show_default = True, 
+    help = 'Whether the `http` and `async` engines read the ratings with Chrome. If not, they are NaN.'
+)
+@click.option(
+    '--rate', 
+    default = DEFAULT_RATE, 
+    type = click.FloatRange(min = 0, min_open = True), 
+    show_default = True, 
+    help = 'Maximum requests per second to the site, for the `async` engine.'
+)
+@click.option(
+    '--max-concurrency', 
+    default = DEFAULT_MAX_CONCURRENCY, 
+    type = click.IntRange(min = 1), 
+    show_default = True, 
+    help = 'Maximum requests in flight to the site, for the `async` engine.'
+)
+@click.option(
+    '--incremental', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to reuse the data of the products whose page did not change since '
+        'the previous runs, checking it with conditional requests.'
+    )
+)
+@click.option(
+    '--incremental-ttl', 
+    default = DEFAULT_TTL/3600, 
+    type = click.FloatRange(min = 0), 
+    show_default = True, 
+    help = 'Hours after which a product is parsed again, even if its page did not change.'
+)
+@click.option(
+    '--change-feed', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to write the products added, removed and modified since the previous '
+        '`--change-feed` run, with the fields that changed, next to the output file.'
+    )
+)
+@click.option(
+    '--page-cache', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = 'Whether to read the pages through an on-disk cache, e.g., to speed up reruns.'
+)
+@click.option(
+    '--page-cache-size', 
+    default = DEFAULT_MAX_BYTES//1024**2, 
+    type = click.IntRange(min = 1), 
+    show_default = True, 
+    help = 'Maximum size of the page cache, in MB. The least recently used pages are evicted first.'
+)
+@click.option(
+    '--replay', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = 'Whether to load the pages from the page cache only, i.e., without network.'
+)
+@click.option(
+    '--page-load-strategy', 
+    default = DEFAULT_PAGE_LOAD_STRATEGY, 
+    type = click.Choice(PAGE_LOAD_STRATEGIES), 
+    show_default = True, 
+    help = (
+        'When the browser is done loading a page, for the `selenium` engine: `normal` waits '
+        'for all its resources, and `eager` only for its HTML, as the rating is waited for.'
+    )
+)
+@click.option(
+    '--lean-browser', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether the browser skips loading images, fonts, trackers and ads, for the '
+        '`selenium` engine.'
+    )
+)
+@click.option(
+    '--network-stats', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to log the network usage of the lean browser, with `--lean-browser`, '
+        'which reads its performance log after each page.'
+    )
+)
+@click.option(
+    '--warm-sessions', 
+    is_flag = True, 
+    default = False, 
+    show_default = True, 
+    help = (
+        'Whether to reuse warm browser sessions, with the cookies accepted, for the `selenium` engine. '
+        'With `--headless`, the sessions are kept alive in the selenium Grid for the next run.'
+    )
+)
+@click.option(
+    '--max-session-pages', 
+    default = DEFAULT_MAX_PAGES, 
+    type = click.IntRange(min = 1), 
+    show_default = True, 
+    help = 'Pages a warm browser session loads before it is replaced, to bound its memory usage.'
+)
+@click.option(
+    '--node-url', 
+    'node_urls',
+    multiple = True, 
+    type = str, 
+    help = (
+        'Node to distribute the product parsing across, with `--workers` sessions each: a selenium Grid '
+        'executor URL for the `selenium` engine, or a mirror of the site for the `http` one. Repeat it for each node.'
+    )
+)
+@click.option(
+    '--ratings-passkey', 
+    default = None, 
+    type = str, 
+    help = (
+        'API key of the Bazaarvoice reviews backend, i.e., the one the rating widget of the site uses. '
+        'If given, the ratings are read in bulk from it, instead of waiting for the widget in each product page.'
+    )
+)
+@click.option(
+    '--ratings-url', 
+    default = None, 
+    type = str, 
+    help = 'Statistics endpoint the `--ratings-passkey` ratings are read from. [default: the Bazaarvoice API]'
+)
+@click.option(
+    '--metrics-file', 
+    default = None, 
+    type = str, 
+    help = 'File where the run metrics, i.e., the latency of each stage, retries, timeouts and page sizes, are exported.'
+)
+@click.option(
+    '--metrics-format', 
+    default = 'json', 
+    type = click.Choice(METRICS_FORMATS), 
+    show_default = True, 
+    help = 'Format of the `--metrics-file`: `json`, or `prometheus` text, e.g., for the node exporter textfile collector.'
+)
 def main(
-    url,
+    urls,
+    seed_file,
     headless,
     webdriver_path,
     output_path,
     output_file,
+    output_format,
+    append,
+    listing_only,
     force_remove,
     verbose,
-    paginate
+    paginate,
+    workers,
+    engine,
+    rating_fallback,
+    rate,
+    max_concurrency,
+    incremental,
+    incremental_ttl,
+    change_feed,
+    page_cache,
+    page_cache_size,
+    replay,
+    page_load_strategy,
+    lean_browser,
+    network_stats,
+    warm_sessions,
+    max_session_pages,
+    node_urls,
+    ratings_passkey,
+    ratings_url,
+    metrics_file,
+    metrics_format
 ):  
-    if paginate:
-        raise NotImplementedError(
-            'Paginating over all pages of the Boots - Sleep page is not '
-            'implemented yet. If you want the scraper to do so, kindly '
-            'do hire me :)'
-        )
-    
     log_level = max(logging.WARNING - verbose*10, 0)
     set_logger_config(log_level = log_level)
 
-    scraper = BootsPageScraper(
-        url = url,
-        driver_path = webdriver_path,
-        headless = headless
-    )
-    products = scraper.find_products()
-    scraper.parse_products(
-        products,
-        output_path = output_path, 
-        output_file = output_file, 
-        force_remove = force_remove
-    )
+    urls = list(urls)
+    if seed_file is not None:
+        urls += read_seed_file(seed_file)
+    url = urls or None
+
+    if node_urls and engine == 'async':
+        raise click.UsageError('`--node-url` is not supported by the `async` engine.')
+    if network_stats and not lean_browser:
+        raise click.UsageError('`--network-stats` is only supported with `--lean-browser`.')
+    # the options of the other engines, which would be ignored
+    engine_options = {
+        'selenium': ('page_load_strategy', 'lean_browser', 'warm_sessions'),
+        'async': ('rate', 'max_concurrency'),
+    }
+    for option_engine, names in engine_options.items():
+        for name in names:
+            if engine != option_engine and _is_given(name):
+                raise click.UsageError(
+                    f'`--{name.replace("_", "-")}` is only supported by the `{option_engine}` engine.'
+                )
+
+    if warm_sessions and engine == 'selenium':
+        from _sessions import SessionManager
+
+        session_manager = SessionManager(max_pages = max_session_pages, site_url = urls[0] if urls else None)
+    else:
+        session_manager = None
+
+    if page_cache or replay:
+        page_cache = PageCache(max_bytes = page_cache_size*1024**2, replay_only = replay)
+    else:
+        page_cache = None
+
+    if engine == 'async':
+        from _async import AsyncBootsScraper
+
+        scraper = AsyncBootsScraper(
+            url = url,
+            driver_path = webdriver_path,
+            headless = headless,
+            rating_fallback = rating_fallback,
+            rate = rate,
+            max_concurrency = max_concurrency,
+            page_cache = page_cache,
+            listing_only = listing_only
+        )
+    elif engine == 'http':
+        from _http import BootsHttpScraper
+
+        scraper = BootsHttpScraper(
+            url = url,
+            driver_path = webdriver_path,
+            headless = headless,
+            rating_fallback = rating_fallback,
+            page_cache = page_cache,
+            listing_only = listing_only
+        )
+    else:
+        from _scraper import BootsPageScraper
+
+        scraper = BootsPageScraper(
+            url = url,
+            driver_path = webdriver_path,
+            headless = headless,
+            page_cache = page_cache,
+            page_load_strategy = page_load_strategy,
+            profile = BrowserProfile(collect_stats = network_stats) if lean_browser else None,
+            session_manager = session_manager,
+            listing_only = listing_only
+        )
+    if ratings_passkey is not None:
+        from _ratings import RatingsProvider
+
+        ratings_provider = RatingsProvider(ratings_passkey, api_url = ratings_url)
+    else:
+        ratings_provider = None
+
+    # products are streamed while listed, so their parsing starts right away
+    products = scraper.iter_products(paginate = paginate)
+    if incremental:
+        from _incremental import IncrementalCache
+
+        incremental_cache = IncrementalCache(ttl = incremental_ttl*3600)
+    else:
+        incremental_cache = None
+
+    try:
+        scraper.parse_products(
+            products,
+            output_path = output_path, 
+            output_file = output_file, 
+            output_format = output_format,
+            append = append,
+            force_remove = force_remove,
+            n_workers = workers,
+            incremental_cache = incremental_cache,
+            node_urls = list(node_urls) or None,
+            ratings_provider = ratings_provider,
+            change_index = ChangeIndex() if change_feed else None
+        )
+    finally:
+        # the metrics of failed runs are the most telling ones
+        click.echo(f'Run metrics:\n{METRICS.summary()}', err = True)
+        if metrics_file is not None:
+            METRICS.export(metrics_file, metrics_format)
+
+        # quits the browsers, i.e., the scraper session, or the fallback ones of the `http` and
+        # `async` engines, unless there is a session manager, which parks the scraper session
+        # for the next run to reuse it
+        scraper.quit()
+        if session_manager is not None:
+            session_manager.close()
+        if page_cache is not None:
+            page_cache.close()
+        if ratings_provider is not None:
+            ratings_provider.close()
 
 if __name__ == '__main__':
     main()
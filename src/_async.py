@@ -0,0 +1,307 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Iterator, Mapping
+from urllib.parse import urlsplit
+
+from _product import Product
+from _decorator import RETRY_BUDGET, async_retry
+from _metrics import METRICS, PAGE_BYTES
+from _base import DEFAULT_MAX_CONCURRENCY, DEFAULT_RATE, PageSize
+from _http import BootsHttpScraper, HOST_BREAKER, HTTP_HEADERS, HTTP_TIMEOUT, RETRIABLE_STATUS_CODES, parse_product_html
+
+if TYPE_CHECKING:
+    from _cache import PageCache
+    from _incremental import Probe
+
+
+def is_retriable_aiohttp_error(e: Exception) -> bool:
+    """Asynchronous counterpart of `is_retriable_http_error`"""
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status in RETRIABLE_STATUS_CODES
+    return True
+
+ASYNC_HTTP_RETRY = async_retry(
+    exceptions = (aiohttp.ClientError, asyncio.TimeoutError), 
+    backoff = 2, 
+    is_retriable = is_retriable_aiohttp_error, 
+    budget = RETRY_BUDGET, 
+    breaker = HOST_BREAKER, 
+    breaker_key = lambda self, session, limiter, url, *args, **kwargs: urlsplit(url).netloc
+)
+
+# sentinel that signals the end of the result stream
+_STOP = object()
+
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Token bucket rate limiter, which allows `rate` acquisitions per second on average,
+    and bursts of up to `capacity` acquisitions
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Parameters
+        ----------
+        rate: float
+            Tokens added to the bucket per second
+        capacity: float, optional
+            Maximum number of tokens in the bucket. default: `rate`, i.e.,
+            up to one second worth of requests at once
+        """
+        if rate <= 0:
+            raise ValueError(f'The rate must be positive, got {rate}')
+
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at)*self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """Waits until there is a token in the bucket, and takes it"""
+        # the lock makes the waiters take the tokens in order
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens)/self.rate)
+                self._refill()
+            self._tokens -= 1
+
+class HostLimiter:
+    """Limits the request rate (with a `TokenBucket`) and the concurrency (with a semaphore) per host"""
+    def __init__(self, rate: float = DEFAULT_RATE, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        Parameters
+        ----------
+        rate: float, optional
+            Maximum requests per second to each host
+        max_concurrency: int, optional
+            Maximum requests in flight to each host
+        """
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+        self._limits = {}
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Asynchronous context manager that holds a request slot for the `url` host"""
+        host = urlsplit(url).netloc
+        if host not in self._limits:
+            self._limits[host] = (asyncio.Semaphore(self.max_concurrency), TokenBucket(self.rate))
+        semaphore, bucket = self._limits[host]
+
+        async with semaphore:
+            await bucket.acquire()
+            yield
+
+class AsyncBootsScraper(BootsHttpScraper):
+    """
+    Variant of `BootsHttpScraper` that fetches the product pages from an `asyncio` event loop,
+    so that a single thread keeps many requests in flight, while staying polite to the site
+    through a per-host `HostLimiter`
+    """
+    def __init__(
+        self,
+        *,
+        url: str | list[str] = None,
+        headless: bool = False,
+        driver_path: str = None,
+        rating_fallback: bool = True,
+        rate: float = DEFAULT_RATE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        page_cache: 'PageCache' = None,
+        listing_only: bool = False
+    ):
+        """
+        Parameters
+        ----------
+        url: str or list[str], optional
+            The URL from where we extract the data, or the URLs of several categories to crawl
+        headless: bool, optional
+            Whether the fallback `BootsPageScraper` runs headless, i.e.,
+            without GUI, and within a running docker container
+        driver_path: str, optional
+            Path to the webdriver executable of the fallback `BootsPageScraper`
+        rating_fallback: bool, optional
+            Whether to read the ratings with a `BootsPageScraper`. If False,
+            the products rating is NaN, i.e., as if they had no rating
+        rate: float, optional
+            Maximum requests per second to each host
+        max_concurrency: int, optional
+            Maximum requests in flight to each host
+        page_cache: PageCache, optional
+            Cache the pages are read through, which the fallback `BootsPageScraper` shares
+        listing_only: bool, optional
+            Whether to build the product records from the listing pages, and only parse
+            the pages of the products whose listing misses any required field, i.e.,
+            `BaseScraper` listing-only mode
+        """
+        super().__init__(
+            url = url,
+            headless = headless,
+            driver_path = driver_path,
+            rating_fallback = rating_fallback,
+            page_cache = page_cache,
+            listing_only = listing_only
+        )
+        self.rate = rate
+        self.max_concurrency = max_concurrency
+
+    @ASYNC_HTTP_RETRY
+    async def _fetch(
+        self, 
+        session: aiohttp.ClientSession, 
+        limiter: HostLimiter, 
+        url: str, 
+        headers: dict = None
+    ) -> tuple[str | None, PageSize | None, Mapping]:
+        """
+        Helper coroutine that GETs the given URL, within the `limiter` host limits, and
+        returns its body and size, i.e., its `Content-Length`, if any, and decoded one,
+        (both None if the response is a 304 to a conditional request) and its headers
+        """
+        async with limiter.limit(url):
+            async with session.get(url, headers = headers) as resp:
+                resp.raise_for_status()
+                if resp.status == 304:
+                    return None, None, resp.headers
+                body = await resp.read()
+                # fall back to UTF-8 (the site encoding) instead of guessing it
+                return body.decode(resp.charset or 'utf-8'), PageSize(resp.content_length, len(body)), resp.headers
+
+    async def _get_cached_html_async(self, url: str) -> tuple[str, PageSize] | None:
+        """Asynchronous counterpart of `_get_cached_html`, which returns the page HTML and size only"""
+        if self.page_cache is not None and (page := await asyncio.to_thread(self.page_cache.get, url)) is not None:
+            return page.html, PageSize(None, len(page.html.encode('utf-8')))
+        return None
+
+    async def _get_html_async(
+        self, 
+        session: aiohttp.ClientSession, 
+        limiter: HostLimiter, 
+        url: str, 
+        headers: dict = None
+    ) -> tuple[str | None, PageSize | None, Mapping]:
+        """
+        Asynchronous counterpart of `_get_html`, which returns the page HTML and size only, and
+        the response headers (none for cached pages), sending the given `headers`, e.g., of a
+        conditional request, whose 304 response has no HTML
+        """
+        if (page := await self._get_cached_html_async(url)) is not None:
+            return *page, {}
+
+        html, page_size, resp_headers = await self._fetch(session, limiter, url, headers)
+        if self.page_cache is not None and html is not None:
+            await asyncio.to_thread(self.page_cache.put, url, html)
+        return html, page_size, resp_headers
+
+    async def _probe_product_async(self, session: aiohttp.ClientSession, limiter: HostLimiter, product: Product) -> 'Probe':
+        """Asynchronous counterpart of `_probe_product`, whose page is `(html, page_size)`"""
+        entry, headers = await asyncio.to_thread(self.incremental_cache.request_headers, product.href)
+        html, page_size, resp_headers = await self._get_html_async(session, limiter, product.href, headers)
+        if html is None:
+            return self.incremental_cache.check(product.href, entry, 304, resp_headers)
+        return self.incremental_cache.check(product.href, entry, 200, resp_headers, html, (html, page_size))
+
+    async def _parse_product_async(self, session: aiohttp.ClientSession, limiter: HostLimiter, product: Product) -> dict:
+        """Asynchronous counterpart of `_parse_or_reuse_product`"""
+        if (product_data := self._listing_record(product)) is not None:
+            return product_data
+
+        # the caches (and the fallback browsers) are blocking, so they run out of the event loop
+        page = None
+        if self.incremental_cache is not None:
+            probe = await self._probe_product_async(session, limiter, product)
+            if probe.unchanged:
+                return probe.record
+            # the page the probe fetched is parsed instead of fetched again
+            page, probe.page = probe.page, None
+
+        with METRICS.timer('fetch'):
+            html, page_size = page or (await self._get_html_async(session, limiter, product.href))[:2]
+        with METRICS.timer('extraction'):
+            parse_product_html(html, product, page_size)
+        METRICS.observe(PAGE_BYTES, page_size.decoded_bytes)
+
+        # unless the ratings provider reads it in bulk
+        if product.rating is None and not self._rating_pending(product):
+            product.rating = await asyncio.to_thread(self._read_rating, product)
+
+        product_data = product.as_dict()
+        if self.incremental_cache is not None:
+            await asyncio.to_thread(self._store_incremental, product, product_data, probe)
+        return product_data
+
+    async def _parse_all(self, pending_products: Iterator[tuple[Product, str]], n_workers: int, results: queue.Queue):
+        """
+        Parses the pending products with `n_workers` worker coroutines, which put
+        `(product, key, product_data, error)` tuples in `results` as they finish
+        """
+        # asyncio primitives are bound to an event loop, so the limiter is created for each run
+        limiter = HostLimiter(rate = self.rate, max_concurrency = self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit = n_workers, limit_per_host = self.max_concurrency)
+        timeout = aiohttp.ClientTimeout(total = HTTP_TIMEOUT)
+
+        async with aiohttp.ClientSession(connector = connector, timeout = timeout, headers = HTTP_HEADERS) as session:
+            async def work():
+                # pending products are pulled lazily, and only from the event loop thread
+                for product, key in pending_products:
+                    logger.debug(f'Parsing product {product.name!r} data')
+                    try:
+                        with METRICS.timer('product'):
+                            product_data, error = await self._parse_product_async(session, limiter, product), None
+                    except Exception as e:
+                        product_data, error = None, e
+                    results.put((product, key, product_data, error))
+
+            await asyncio.gather(*(work() for _ in range(n_workers)))
+
+    def _iter_parsed_products(
+        self,
+        pending_products: Iterator[tuple[Product, str]],
+        n_workers: int = 1
+    ) -> Iterator[tuple[Product, str, dict, Exception]]:
+        """
+        Parses the pending products from an event loop, running in a background thread,
+        with `n_workers` requests in flight at most, and yields
+        `(product, key, product_data, error)` tuples as they finish
+
+        Note that the job queue is updated by the caller, i.e., from a single thread
+        """
+        if self.node_urls:
+            raise ValueError('The async engine does not distribute the parsing across nodes')
+
+        results = queue.Queue()
+        errors = []
+
+        def run():
+            try:
+                asyncio.run(self._parse_all(pending_products, n_workers, results))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                results.put(_STOP)
+
+        logger.info(f'Parsing products with up to {n_workers} concurrent requests')
+        thread = threading.Thread(target = run, daemon = True)
+        thread.start()
+
+        while (result := results.get()) is not _STOP:
+            yield result
+        thread.join()
+
+        if errors:
+            raise errors[0]
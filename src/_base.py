@@ -0,0 +1,922 @@
+import logging
+import os
+import json
+import re
+
+from datetime import datetime, timezone
+from itertools import count
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, NamedTuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from _product import Product
+from _html import BY_ID, BY_CLASS_NAME, HtmlElement, extract_elements, extract_json_ld, extract_scoped_elements
+from _pool import DriverPool, prefetch
+from _cluster import NodePool
+from _jobs import PENDING, IN_PROGRESS, FAILED, JobQueue
+from _metrics import METRICS, DUPLICATE_PRODUCTS, LISTING_RECORDS
+from _output import (
+    OUTPUT_EXTENSIONS,
+    ProductsWriter,
+    history_fp,
+    in_progress_fp,
+    move_output,
+    open_products_writer,
+    remove_output
+)
+
+if TYPE_CHECKING:
+    from _cache import PageCache
+    from _changes import ChangeIndex
+    from _incremental import IncrementalCache, Probe
+    from _ratings import RatingsProvider
+
+
+URL = 'https://www.boots.com/health-pharmacy/medicines-treatments/sleep'
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_PATH = os.path.join(ROOT_DIR, 'data')
+LOG_PATH = os.path.join(ROOT_DIR, 'log')
+OUTPUT_PATH = os.path.join(DATA_PATH, 'output')
+TMP_DATA_PATH = os.path.join(DATA_PATH, 'tmp')
+CACHE_PATH = os.path.join(DATA_PATH, 'cache')
+
+JOBS_FILE = 'jobs.sqlite'
+
+OUTPUT_FILE = 'sleep_products.json'
+OUTPUT_FP = os.path.join(OUTPUT_PATH, OUTPUT_FILE)
+# products of each category, in multi-category crawls, written next to the output file
+CATEGORIES_FILE_SUFFIX = '_categories.json'
+
+FAILED_PRODUCTS_LOG_FILE = 'failed_products_{time}.txt'
+FAILED_PRODUCTS_LOG_FP = os.path.join(LOG_PATH, FAILED_PRODUCTS_LOG_FILE)
+
+PAGING_INDEX_PARAM = 'paging.index'
+PAGING_SIZE_PARAM = 'paging.size'
+PAGING_SIZE = 96
+
+# politeness defaults of the `async` engine, per host
+DEFAULT_RATE = 10               # requests per second
+DEFAULT_MAX_CONCURRENCY = 20    # requests in flight
+
+# query parameters that do not change the product page, e.g., tracking ones, which canonical hrefs drop
+TRACKING_PARAMS = frozenset({'gclid', 'fbclid', 'msclkid', 'srsltid', 'cm_sp', 'cm_re', 'cm_mmc'})
+TRACKING_PARAM_PREFIXES = ('utm_',)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# the whole product parsing is retried (once) for the failed products
+PARSE_N_TRIES = 2
+
+PRODUCT_ELEMENT_CLASS_NAME = 'oct-teaser__title-link'
+
+# each product teaser of the listing pages, with its price and, if any, its rating
+TEASER_CLASS_NAME = 'oct-teaser'
+TEASER_PRICE_CLASS_NAME = 'oct-teaser__productPrice'
+TEASER_RATING_CLASS_NAME = 'oct-teaser__rating'
+
+PRODUCT_TITLE_ID = 'estore_product_title'
+PRODUCT_RATING_CLASS_NAME = 'bv_avgRating_component_container'
+PRODUCT_TEXT_CLASS_NAME = 'product_text'
+PRODUCT_PRICE_STR_CLASS_NAME = 'price'
+
+# the rating is rendered by the Bazaarvoice widget, in the container of class `RATING_WIDGET_CLASS_NAME`,
+# into the placeholder that `RATING_PLACEHOLDER_SELECTOR` matches, which is served empty with the page,
+# i.e., the widget has loaded once it rendered its summary into it (the rating, or its "no reviews" state)
+RATING_WIDGET_CLASS_NAME = 'bv_main_container'
+RATING_PLACEHOLDER_SELECTOR = '[data-bv-show]'
+# the placeholder attribute with the Bazaarvoice ID of the product, to read its rating in bulk
+RATING_PRODUCT_ID_ATTRIBUTE = 'data-bv-product-id'
+
+# selector specs of the listing and product pages, shared by all engines
+LISTING_SELECTORS = {
+    'products': (BY_CLASS_NAME, PRODUCT_ELEMENT_CLASS_NAME),
+}
+TEASER_SELECTORS = {
+    'link': (BY_CLASS_NAME, PRODUCT_ELEMENT_CLASS_NAME),
+    'price': (BY_CLASS_NAME, TEASER_PRICE_CLASS_NAME),
+    'rating': (BY_CLASS_NAME, TEASER_RATING_CLASS_NAME),
+}
+PRODUCT_SELECTORS = {
+    'title': (BY_ID, PRODUCT_TITLE_ID),
+    'rating': (BY_CLASS_NAME, PRODUCT_RATING_CLASS_NAME),
+    'text': (BY_CLASS_NAME, PRODUCT_TEXT_CLASS_NAME),
+    'price': (BY_CLASS_NAME, PRODUCT_PRICE_STR_CLASS_NAME),
+    'rating_widget': (BY_CLASS_NAME, RATING_WIDGET_CLASS_NAME),
+}
+
+PRICE_STR_PATTERN = re.compile(r'(\D)(\d+\.\d{2})')
+PRICE_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+MISSING_DESCRIPTION = 'Missing product description.'
+
+# in listing-only mode, the product page is only parsed if its listing misses any of these `Product` fields
+LISTING_REQUIRED_FIELDS = ('name', 'price')
+# price units of the JSON-LD currency codes
+CURRENCY_SYMBOLS = {'GBP': '£', 'EUR': '€', 'USD': '$'}
+
+
+logger = logging.getLogger(__name__)
+
+class ScrapingException(Exception):
+    """Custom exception raised when the product parsing process fails"""
+
+def parse_description(text_raw: str) -> str:
+    """Keeps the first line of the product text as its (short) description"""
+    return text_raw.split('\n')[0]
+
+def parse_price(price_str: str) -> tuple[str, float]:
+    """
+    Splits the price string of a product into its unit and numeric value,
+    e.g., `'£5.99'` into `('£', 5.99)`
+
+    Returns
+    -------
+    price_unit, price: tuple[str, float]
+        The price is None if the string has no number
+    """
+    match = PRICE_STR_PATTERN.match(price_str)
+    if match:
+        price_unit, price = match.groups()
+        return price_unit, float(price)
+
+    # e.g., prices without pennies, such as `'£12'`
+    price_unit = price_str[:1]
+    match = PRICE_NUMBER_PATTERN.search(price_str)
+    return price_unit, float(match.group()) if match else None
+
+def parse_listing_elements(elements: dict[str, list[HtmlElement]], base_url: str) -> list[Product]:
+    """
+    Reads the products in a listing page from its `LISTING_SELECTORS` elements
+
+    Parameters
+    ----------
+    elements: dict[str, list[HtmlElement]]
+        The listing page elements, by `LISTING_SELECTORS` field
+    base_url: str
+        The listing page URL, to resolve relative hrefs
+
+    Returns
+    -------
+    products: list[Product]
+    """
+    return [
+        Product(
+            href = urljoin(base_url, element.attrs['href']) if element.attrs.get('href') else None,
+            name = element.text
+        )
+        for element in elements['products']
+    ]
+
+def _json_ld_products(items: list, base_url: str) -> dict[str, dict]:
+    """The JSON-LD `Product` items, including those of `ItemList`s, by resolved URL"""
+    products = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        if item.get('@type') == 'ItemList':
+            for list_item in item.get('itemListElement') or []:
+                if not isinstance(list_item, dict):
+                    continue
+                product = list_item.get('item') if isinstance(list_item.get('item'), dict) else list_item
+                url = product.get('url') or list_item.get('url')
+                if url:
+                    products[urljoin(base_url, url)] = product
+        elif item.get('@type') == 'Product' and item.get('url'):
+            products[urljoin(base_url, item['url'])] = item
+    return products
+
+def _fill_from_json_ld(product: Product, item: dict) -> Product:
+    """Fills the product attributes that are still missing from its JSON-LD `Product` item"""
+    offers = item.get('offers')
+    offer = (offers[0] if offers else {}) if isinstance(offers, list) else offers or {}
+    if product.price is None and offer.get('price') is not None:
+        product.price = float(offer['price'])
+        currency = offer.get('priceCurrency')
+        product.price_unit = CURRENCY_SYMBOLS.get(currency, currency)
+
+    rating = (item.get('aggregateRating') or {}).get('ratingValue')
+    if product.rating is None and rating is not None:
+        product.rating = str(rating)
+    if product.description is None and item.get('description'):
+        product.description = parse_description(item['description'])
+    if not product.name and item.get('name'):
+        product.name = item['name']
+    return product
+
+def parse_listing_details(html: str, base_url: str) -> list[Product]:
+    """
+    Reads the products in a listing page, as `parse_listing_elements`, with the details their
+    teasers have, i.e., the price and, if any, the rating, and, for the fields that are still
+    missing, e.g., the description, those in the structured data (JSON-LD) of the page
+
+    Parameters
+    ----------
+    html: str
+        The listing page HTML
+    base_url: str
+        The listing page URL, to resolve relative hrefs
+
+    Returns
+    -------
+    products: list[Product]
+    """
+    products = parse_listing_elements(extract_elements(html, LISTING_SELECTORS), base_url)
+
+    teasers = {}
+    for elements in extract_scoped_elements(html, (BY_CLASS_NAME, TEASER_CLASS_NAME), TEASER_SELECTORS):
+        if elements['link'] and elements['link'][0].attrs.get('href'):
+            teasers[urljoin(base_url, elements['link'][0].attrs['href'])] = elements
+    structured_data = _json_ld_products(extract_json_ld(html), base_url)
+
+    for product in products:
+        elements = teasers.get(product.href)
+        if elements is not None:
+            if elements['price'] and elements['price'][0].text:
+                product.price_unit, product.price = parse_price(elements['price'][0].text)
+            if elements['rating'] and elements['rating'][0].text:
+                product.rating = elements['rating'][0].text
+        if product.href in structured_data:
+            _fill_from_json_ld(product, structured_data[product.href])
+    return products
+
+def parse_product_elements(elements: dict[str, list[HtmlElement]], product: Product) -> Product:
+    """
+    Fills the product attributes, but the page size, from its `PRODUCT_SELECTORS` elements.
+    The rating is only set if its element has text, and the product ID if the rating widget
+    placeholder has it
+
+    Raises
+    ------
+    ScrapingException, if the page has no product title or price
+    """
+    if not elements['title']:
+        raise ScrapingException(f'Missing product title (id {PRODUCT_TITLE_ID!r}) in {product.href!r}')
+    if not elements['price']:
+        raise ScrapingException(f'Missing product price (class {PRODUCT_PRICE_STR_CLASS_NAME!r}) in {product.href!r}')
+
+    if elements['rating'] and elements['rating'][0].text:
+        product.rating = elements['rating'][0].text
+    if elements['rating_widget']:
+        product.product_id = elements['rating_widget'][0].attrs.get(RATING_PRODUCT_ID_ATTRIBUTE)
+
+    product.name = elements['title'][0].text
+
+    # some items do not have a description
+    if elements['text']:
+        product.description = parse_description(elements['text'][0].text)
+    else:
+        product.description = MISSING_DESCRIPTION
+
+    product.price_unit, product.price = parse_price(elements['price'][0].text)
+
+    return product
+
+class PageSize(NamedTuple):
+    """
+    Size of a page, in bytes, as read from the network layer: transferred, i.e., as sent
+    over the network (compressed), if known, and decoded, i.e., the HTML body
+    """
+    transfer_bytes: int | None
+    decoded_bytes: int
+
+def set_page_size(product: Product, page_size: PageSize) -> Product:
+    """Sets the page sizes of the product, in KB"""
+    product.page_size = page_size.decoded_bytes//1024
+    if page_size.transfer_bytes is not None:
+        product.transfer_size = page_size.transfer_bytes//1024
+    return product
+
+def canonical_href(href: str) -> str:
+    """
+    Canonical form of a product href, so that the same product listed in several categories,
+    e.g., with different tracking parameters, has a single key: lower case scheme and host,
+    without default port, fragment nor tracking parameters, and with sorted query parameters
+    """
+    scheme, netloc, path, query, _ = urlsplit(href)
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    host, _, port = netloc.rpartition(':')
+    if host and port.isdigit() and DEFAULT_PORTS.get(scheme) == int(port):
+        netloc = host
+    params = sorted(
+        (key, value) for key, value in parse_qsl(query, keep_blank_values = True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return urlunsplit((scheme, netloc, path or '/', urlencode(params), ''))
+
+def read_seed_file(fp: str) -> list[str]:
+    """Reads the category URLs of a seed file, i.e., one per line, skipping blank lines and `#` comments"""
+    with open(fp) as f_in:
+        lines = (line.strip() for line in f_in)
+        return [line for line in lines if line and not line.startswith('#')]
+
+def paging_url(url: str, index: int, size: int = PAGING_SIZE) -> str:
+    """Returns the `url` listing page URL with `size` products per page, at 0-based page `index`"""
+    scheme, netloc, path, query, fragment = urlsplit(url)
+    params = {
+        key: value for key, value in parse_qsl(query)
+        if key not in (PAGING_INDEX_PARAM, PAGING_SIZE_PARAM)
+    }
+    params.update({PAGING_INDEX_PARAM: index, PAGING_SIZE_PARAM: size})
+    return urlunsplit((scheme, netloc, path, urlencode(params), fragment))
+
+class BaseScraper:
+    """
+    Engine-agnostic part of the scrapers, which takes care of making the product parsing
+    resumable (through a persistent job queue, which several processes may share to parse
+    the products concurrently) and of writing the output. Subclasses implement
+    `find_products`, `_parse_product` and `_new_session`
+    """
+    def __init__(self, url: str | list[str] = None, page_cache: 'PageCache' = None, listing_only: bool = False):
+        """
+        Parameters
+        ----------
+        url: str or list[str], optional
+            The URL from where we extract the data, or the URLs of several categories
+            to crawl, whose products are parsed once, even if listed in several
+        page_cache: PageCache, optional
+            Cache the listing and product pages are read through
+        listing_only: bool, optional
+            Whether to build the product records from the listing pages, i.e., from their
+            teasers and structured data (see `parse_listing_details`), and only parse the
+            pages of the products whose listing misses any of `LISTING_REQUIRED_FIELDS`.
+            Their page size is unknown, and so is their rating or description, if the
+            listing misses them
+        """
+        self.urls = [url] if isinstance(url, str) else list(url or []) or [URL]
+        self.url = self.urls[0]
+        self.page_cache = page_cache
+        self.listing_only = listing_only
+
+        logger.debug('Creating tmp files folder')
+        self.tmp_dir = TMP_DATA_PATH
+        os.makedirs(self.tmp_dir, exist_ok = True)
+        self.jobs = JobQueue(os.path.join(self.tmp_dir, JOBS_FILE))
+        self.incremental_cache = None
+        self.node_urls = None
+        self.ratings_provider = None
+        # the incremental cache probes of the products whose rating is pending, by href
+        self._pending_probes = {}
+        # the job keys of the products given to `self.parse_products`
+        self._listed_keys = set()
+
+    def find_products(self) -> list[Product]:
+        """Finds the products in the initial URL and stores them in `Product` instances"""
+        raise NotImplementedError
+
+    def _parse_product(self, product: Product, session: Any = None, page: Any = None) -> dict:
+        """
+        Parses the given product to extract the necessary information, using the
+        `session` returned by `self._new_session` if given, and returns it as a dict.
+        `page` is the product page fetched by `self._probe_product`, if any, which is
+        parsed instead of fetching it again
+        """
+        raise NotImplementedError
+
+    def _probe_product(self, product: Product, session: Any = None) -> 'Probe':
+        """
+        Checks whether the product page changed since its record was cached in the incremental
+        cache, with a conditional request sent through this engine fetch path, as
+        `IncrementalCache.check` describes, using the `session` session if given
+        """
+        raise NotImplementedError
+
+    def _new_session(self) -> Any:
+        """Returns a new session for the `DriverPool` workers to parse products concurrently"""
+        raise NotImplementedError
+
+    def _listing_record(self, product: Product) -> dict | None:
+        """
+        The record of the given product built from its listing, in listing-only mode, or
+        None if the product page needs parsing, i.e., its listing misses any required field
+        """
+        if not self.listing_only or any(getattr(product, field) is None for field in LISTING_REQUIRED_FIELDS):
+            return None
+        if product.rating is None:
+            product.rating = float('nan')
+        METRICS.count(LISTING_RECORDS)
+        return product.as_dict()
+
+    def _parse_or_reuse_product(self, product: Product, session: Any = None) -> dict:
+        """
+        Parses the given product, as `self._parse_product`, unless its listing has its
+        record, in listing-only mode, or there is an incremental cache and the product
+        page has not changed since the cached record was parsed
+        """
+        with METRICS.timer('product'):
+            if (product_data := self._listing_record(product)) is not None:
+                return product_data
+            if self.incremental_cache is None:
+                return self._parse_product(product, session)
+
+            probe = self._probe_product(product, session)
+            if probe.unchanged:
+                logger.debug(f'Reusing the cached data of the unchanged product {product.name!r}')
+                return probe.record
+
+            # the page the probe fetched, if any, is parsed instead of fetched again
+            product_data = self._parse_product(product, session, page = probe.page)
+            probe.page = None
+            self._store_incremental(product, product_data, probe)
+            return product_data
+
+    def _rating_pending(self, product: Product) -> bool:
+        """Whether the rating of the parsed product is read in bulk by the ratings provider, once its batch is full"""
+        return self.ratings_provider is not None and product.rating is None and product.product_id is not None
+
+    def _store_incremental(self, product: Product, product_data: dict, probe: 'Probe') -> None:
+        """Caches the product record in the incremental cache, once its rating is joined, if pending"""
+        if self._rating_pending(product):
+            self._pending_probes[product.href] = probe
+        else:
+            self.incremental_cache.store(product.href, product_data, probe)
+
+    def _new_node_session(self, node_url: str) -> Any:
+        """Returns a new session to the node `node_url`, for the `NodePool` workers"""
+        raise NotImplementedError
+
+    def _is_node_error(self, error: Exception) -> bool:
+        """Whether the parsing error is due to the node, e.g., a connection error, rather than to the product"""
+        return isinstance(error, OSError)
+
+    def _find_products_in_page(self, url: str, session: Any) -> list[Product]:
+        """Finds the products in the listing page `url`, loading it with the `session` session"""
+        raise NotImplementedError
+
+    def _iter_listing_pages(self, paging_size: int, url: str = None) -> Iterator[list[Product]]:
+        """
+        Yields the new products of each listing page of the category `url`, which defaults
+        to the initial one, using a dedicated session so that listing does not interfere
+        with the parsing of products
+        """
+        category_url = url or self.url
+        session = self._new_session()
+        seen_hrefs = set()
+        try:
+            for index in count():
+                url = paging_url(category_url, index, paging_size)
+                logger.debug(f'Searching products in the listing page #{index + 1}')
+                products = self._find_products_in_page(url, session)
+
+                # past the last page, the site may return an empty page or the last one again
+                new_products = [product for product in products if product.href not in seen_hrefs]
+                if not new_products:
+                    break
+                seen_hrefs.update(product.href for product in new_products)
+                yield new_products
+
+                if len(products) < paging_size:
+                    break
+        finally:
+            (getattr(session, 'quit', None) or session.close)()
+
+    def iter_products(self, *, paginate: bool = False, paging_size: int = PAGING_SIZE) -> Iterator[Product]:
+        """
+        Streams the products in the initial URL, as `self.find_products`, or in all of its
+        listing pages, if `paginate`. In the latter, the next listing page is fetched in the 
+        background while the products in the current one are consumed (e.g., parsed by
+        `self.parse_products`), so that only a few pages are in memory at once
+
+        Parameters
+        ----------
+        paginate: bool, optional
+            Whether to go through all the listing pages
+        paging_size: int, optional
+            Number of products per listing page
+
+        Yields
+        ------
+        product: Product
+        """
+        # the run-wide index of the canonical hrefs, so that each product is yielded once
+        seen_hrefs = set()
+        n_products = 0
+        for category_url in self.urls:
+            for index, products in enumerate(self._iter_category_pages(category_url, paginate, paging_size)):
+                new_products = []
+                for product in products:
+                    product.category = category_url
+                    key = self._job_key(product)
+                    if key in seen_hrefs:
+                        METRICS.count(DUPLICATE_PRODUCTS)
+                        continue
+                    seen_hrefs.add(key)
+                    new_products.append(product)
+                self.jobs.add_memberships([(self._job_key(product), category_url) for product in products])
+
+                n_products += len(new_products)
+                self._n_products = n_products
+                if len(self.urls) > 1 or paginate:
+                    logger.info(
+                        f'Found {len(new_products)} new products (of {len(products)}) in the '
+                        f'listing page #{index + 1} of {category_url!r}'
+                    )
+                yield from new_products
+
+    def _iter_category_pages(self, url: str, paginate: bool, paging_size: int) -> Iterator[list[Product]]:
+        """
+        Yields the products of each listing page of the category `url`, i.e., of its first page,
+        unless `paginate`, in which case the next page is fetched in the background
+        """
+        if paginate:
+            yield from prefetch(self._iter_listing_pages(paging_size, url))
+        elif url == self.url:
+            # the initial page is loaded in this scraper session
+            yield self.find_products()
+        else:
+            session = self._new_session()
+            try:
+                yield self._find_products_in_page(url, session)
+            finally:
+                (getattr(session, 'quit', None) or session.close)()
+
+    def _job_key(self, product: Product) -> str:
+        """The key of the product in the job queue, i.e., its canonical href, as hrefs are unique, unlike names"""
+        return canonical_href(product.href) if product.href else product.name
+
+    def _write_categories(self, fp: str) -> None:
+        """
+        Writes the products listed in each category, by their canonical href, as recorded in
+        the job queue, so that the products listed in several categories are output once
+        """
+        with open(fp, 'w') as f_out:
+            json.dump(self.jobs.memberships(), f_out, indent = 2)
+        logger.info(f'Wrote the products of each category to {fp!r}')
+
+    def is_complete(self) -> bool:
+        """
+        Whether all the products of the job queue, which other processes may share, are parsed,
+        i.e., none is being parsed, e.g., by another process, none of the listed ones is pending
+        or failed, and there are at least as many as were listed. The pending and failed products
+        of previous runs that are no longer listed, which no process claims again, are ignored
+        """
+        return (
+            len(self.jobs) >= self._n_products
+            and not self.jobs.count(IN_PROGRESS)
+            and not any(key in self._listed_keys for key in self.jobs.keys(PENDING, FAILED))
+        )
+
+    def do_cleanup(self, force = False) -> None:
+        """Helper method to remove the job queue"""
+        n_parsed_products = len(self.jobs)
+        n_in_progress = self.jobs.count(IN_PROGRESS)
+
+        # because default item sorting is by relevance, the listed
+        # products may change between a failed execution and the
+        # resumed one, so we might end up with more products than
+        # the ones listed
+        if force or (n_parsed_products >= self._n_products and not n_in_progress):
+            logger.debug(f'Removing the job queue {self.jobs.path!r}')
+            self.jobs.remove()
+        elif n_in_progress:
+            logger.warning(f'Skipping cleanup, as other workers are parsing {n_in_progress} products.')
+        else:
+            logger.warning(
+                f'Skipping cleanup, as {n_parsed_products} of {self._n_products} products have been scraped. '
+                f'to force it, set `force = True`.'
+            )
+
+    def _iter_pending_products(self, products: Iterable[Product], steal: bool = False) -> Iterator[tuple[Product, str]]:
+        """
+        Yields `(product, key)` pairs for the given products that this process claims in
+        the job queue, i.e., skipping those already parsed, to make the process resumable,
+        and those other processes are parsing. If `steal`, it then yields the products
+        that other processes abandoned, e.g., because they crashed
+        """
+        for idx, product in enumerate(products):
+            idx += 1
+            if idx%10 == 0:
+                logger.info(f'Parsing product #{idx}')
+
+            key = self._job_key(product)
+            self._listed_keys.add(key)
+            if not self.jobs.claim(key, product.href, product.name):
+                logger.debug(f'skipping already parsed (or being parsed) product {product.name!r}')
+                continue
+
+            yield product, key
+
+        while steal and (job := self.jobs.claim_next()) is not None:
+            key, href, name = job
+            logger.debug(f'Taking over the abandoned product {name!r}')
+            yield Product(href = href, name = name), key
+
+    def _iter_parsed_products(
+        self, 
+        pending_products: Iterator[tuple[Product, str]], 
+        n_workers: int = 1
+    ) -> Iterator[tuple[Product, str, dict, Exception]]:
+        """
+        Parses the pending products, either sequentially in this scraper session,
+        concurrently in a `DriverPool` of `n_workers` sessions, or in a `NodePool`
+        of `n_workers` sessions per node, if `self.node_urls`, and yields 
+        `(product, key, product_data, error)` tuples as they finish
+
+        Note that the job queue is updated by the caller, i.e., from a single thread
+        """
+        if n_workers == 1 and not self.node_urls:
+            for product, key in pending_products:
+                logger.debug(f'Parsing product {product.name!r} data')
+                try:
+                    product_data, error = self._parse_or_reuse_product(product), None
+                except Exception as e:
+                    product_data, error = None, e
+                yield product, key, product_data, error
+            return
+
+        def parse(session, pending_product):
+            product, _ = pending_product
+            logger.debug(f'Parsing product {product.name!r} data')
+            return self._parse_or_reuse_product(product, session)
+
+        if self.node_urls:
+            logger.info(f'Parsing products with {n_workers} sessions in each of {len(self.node_urls)} nodes')
+            pool = NodePool(self._new_node_session, self.node_urls, n_workers, is_node_error = self._is_node_error)
+        else:
+            logger.info(f'Parsing products with a pool of {n_workers} sessions')
+            pool = DriverPool(self._new_session, n_workers)
+
+        with pool:
+            for (product, key), product_data, error in pool.imap_unordered(parse, pending_products):
+                yield product, key, product_data, error
+
+    def _parse_and_store(
+        self, 
+        products: Iterable[Product], 
+        writer: ProductsWriter, 
+        n_workers: int = 1,
+        steal: bool = False
+    ) -> dict[str, tuple[Product, str]]:
+        """
+        Parses the given products that have not been parsed yet, as claimed by
+        `self._iter_pending_products`, storing their data in the job queue and streaming
+        it to the output `writer`, and returns the failed ones as `{name: (product, error)}`
+        """
+        import time
+
+        failed_products = {}
+        # products whose rating is read in bulk, as `(product, key, product_data)`
+        pending_ratings = []
+        # the leases of the products waiting for their batch are renewed every half lease
+        renew_interval = self.jobs.lease_ttl/2
+        renew_at = None
+        pending_products = self._iter_pending_products(products, steal)
+        for product, key, product_data, error in self._iter_parsed_products(pending_products, n_workers):
+            if pending_ratings and time.monotonic() >= renew_at:
+                self.jobs.renew([key for _, key, _ in pending_ratings])
+                renew_at = time.monotonic() + renew_interval
+
+            if error is not None:
+                self._fail_product(product, key, error, failed_products)
+            elif self._rating_pending(product):
+                if not pending_ratings:
+                    renew_at = time.monotonic() + renew_interval
+                pending_ratings.append((product, key, product_data))
+                if len(pending_ratings) >= self.ratings_provider.batch_size:
+                    self._join_ratings(pending_ratings, writer, failed_products)
+                    pending_ratings = []
+            else:
+                self._store_product(key, product_data, writer)
+
+        if pending_ratings:
+            self._join_ratings(pending_ratings, writer, failed_products)
+        return failed_products
+
+    def _fail_product(self, product: Product, key: str, error: Exception, failed_products: dict) -> None:
+        """Records the failed product in the job queue, and in `failed_products`"""
+        e_str = f'{type(error).__name__}: {error}'
+        logger.error(
+            f'Unable to parse product {product.name!r} due to the '
+            f'following error: {e_str}'
+        )
+        failed_products[product.name] = (product, e_str)
+        self.jobs.fail(key, e_str)
+
+    def _store_product(self, key: str, product_data: dict, writer: ProductsWriter) -> None:
+        """Stores the product data in the job queue, and streams it to the output `writer`"""
+        logger.debug(f'Retrieved the following data: {product_data}')
+
+        logger.debug(f'Storing product data in the job queue')
+        if self.jobs.complete(key, product_data):
+            with METRICS.timer('output_write'):
+                writer.write(product_data)
+            self._written_keys.add(key)
+
+    def _join_ratings(
+        self, 
+        pending_ratings: list[tuple[Product, str, dict]], 
+        writer: ProductsWriter, 
+        failed_products: dict
+    ) -> None:
+        """
+        Reads the ratings of the pending products in bulk with the ratings provider, and stores
+        their records. If the ratings cannot be read, the products fail, to be parsed again
+        """
+        try:
+            ratings = self.ratings_provider.fetch([product.product_id for product, _, _ in pending_ratings])
+        except Exception as e:
+            for product, key, _ in pending_ratings:
+                self._pending_probes.pop(product.href, None)
+                self._fail_product(product, key, e, failed_products)
+            return
+
+        for product, key, product_data in pending_ratings:
+            product.rating = product_data['Rating'] = ratings[product.product_id]
+            probe = self._pending_probes.pop(product.href, None)
+            if probe is not None:
+                self.incremental_cache.store(product.href, product_data, probe)
+            self._store_product(key, product_data, writer)
+
+    def parse_products(
+        self, 
+        products: Iterable[Product], 
+        *,
+        output_path: str = None, 
+        output_file: str = None,
+        auto_remove: bool = True,
+        force_remove: bool = False,
+        n_workers: int = 1,
+        output_format: str = 'json',
+        incremental_cache: 'IncrementalCache' = None,
+        node_urls: list[str] = None,
+        append: bool = False,
+        ratings_provider: 'RatingsProvider' = None,
+        change_index: 'ChangeIndex' = None
+    ) -> None:
+        """
+        Extracts the target data from the given products and streams it to the output file,
+        i.e., the products are written as they are parsed.
+
+        This method can be resumed, meaning that if the extraction from any product fails,
+        you can call it again and it will iterate over the given products skipping those
+        already processed (i.e., those done in the job queue).
+
+        Several processes may parse the same products concurrently, e.g., from the same
+        listing, sharing the job queue: each product is parsed by the first process that
+        claims it, and the rest take over the products of a process that crashes once
+        its lease expires. Each process writes its own in-progress file, which it publishes
+        as the output file unless other processes are still parsing products of the queue,
+        i.e., the last one to finish publishes every product.
+
+        Parameters
+        ----------
+        products: list[Product] or iterable
+            Products to retrieve data from, as returned by `self.find_products`, or
+            streamed by `self.iter_products` (which are parsed while listed)
+        output_path: str, optional
+            Path where the output file is written
+        output_file: str, optional
+            Name of the output file
+        auto_remove: bool, optional
+            Whether to automatically do clean up when all products have been parsed
+        force_remove: bool = False
+            Whether to automatically do clean up when the process finishes, even if
+            there have been any errors when parsing products (not recommended)
+        n_workers: int, optional
+            Number of sessions that parse products concurrently. When greater 
+            than 1, a `DriverPool` of new sessions parses the products. default: 1
+        output_format: str, optional
+            Format of the output file, i.e., one of `_output.OUTPUT_WRITERS`. `json` 
+            writes a single JSON object, whereas `ndjson` writes a product per line
+            and the summary statistics in a separate file, as the tabular formats do,
+            i.e., `csv`, and the columnar `parquet` and `arrow` (which need `pyarrow`),
+            whose typed records also have the run timestamp. default: json
+        incremental_cache: IncrementalCache, optional
+            Cache of the products parsed in previous runs. If given, only the products
+            whose page changed since then (or whose record expired) are parsed again
+        node_urls: list[str], optional
+            Nodes to distribute the product parsing across, with `n_workers` sessions
+            each, e.g., selenium Grid executors. Products are pulled from a shared
+            queue, so faster nodes parse more, and the ones that fail due to a node
+            are given to another one. The results go to the same output file
+        append: bool, optional
+            Whether to add the output file to the history of runs, i.e., a folder named as
+            the output file, partitioned by run date (see `_output.history_fp`), instead of
+            overwriting it. The file is only added once all the products of the job queue are
+            parsed, so that resuming a failed run does not duplicate its products. default: False
+        ratings_provider: RatingsProvider, optional
+            Provider of the product ratings, which reads them in bulk, once a batch of
+            products is parsed, instead of waiting for the rating widget of each product
+            page. The records of a batch are stored once their ratings are read
+        change_index: ChangeIndex, optional
+            Index of the records of the previous run. If given, the products added, removed
+            and modified since then are written to a change feed next to the output file, i.e.,
+            `<name>_changes.json`, once all the products are parsed, by every process that shares
+            the job queue, and the index is updated
+        """
+        output_path = output_path or OUTPUT_PATH
+        output_file = output_file or os.path.splitext(OUTPUT_FILE)[0] + OUTPUT_EXTENSIONS[output_format]
+
+        self.incremental_cache = incremental_cache
+        self.node_urls = node_urls
+        self.ratings_provider = ratings_provider
+
+        n_parsed_products = len(self.jobs)
+        if n_parsed_products:
+            logger.debug(
+                f'Resuming extraction process. Found {n_parsed_products} products '
+                f'in the job queue {self.jobs.path!r}.'
+            )
+
+        run_timestamp = datetime.now(timezone.utc)
+        final_fp = os.path.join(output_path, output_file)
+        if append:
+            final_fp = history_fp(final_fp, run_timestamp)
+            os.makedirs(os.path.dirname(final_fp), exist_ok = True)
+        # other processes may share the job queue, and so the output file
+        out_fp = in_progress_fp(final_fp, self.jobs.owner)
+        logger.info(f'Writing output data to {out_fp!r}')
+        with open_products_writer(out_fp, output_format, run_timestamp) as writer:
+            # products parsed in previous executions, or by other processes
+            self._written_keys = set()
+            self._listed_keys = set()
+            for key, product_data in self.jobs.records():
+                writer.write(product_data)
+                self._written_keys.add(key)
+
+            # parse products, skipping the already parsed ones, and retry the failed ones.
+            # unlike calling this method again, retrying only the failed products also
+            # works when `products` is a stream, e.g., from `self.iter_products`
+            try:
+                failed_products = self._parse_and_store(products, writer, n_workers, steal = True)
+                for _ in range(1, PARSE_N_TRIES):
+                    if not failed_products:
+                        break
+                    logger.warning(f'Retrying the {len(failed_products)} products that failed')
+                    failed_products = self._parse_and_store(
+                        [product for product, _ in failed_products.values()], writer, n_workers
+                    )
+            finally:
+                # e.g., if interrupted, so that resuming does not wait for their leases to expire
+                n_released = self.jobs.release()
+                if n_released:
+                    logger.debug(f'Released {n_released} unfinished products in the job queue')
+            failed_products = {name: e_str for name, (_, e_str) in failed_products.items()}
+
+            # checked before the last records are read, so that a complete queue has them all
+            is_complete = self.is_complete()
+            # the processes that still parse products of the queue write the output once they finish
+            is_shared = bool(self.jobs.n_leased_by_others())
+            # products parsed meanwhile by other processes
+            for key, product_data in self.jobs.records():
+                if key not in self._written_keys:
+                    writer.write(product_data)
+                    self._written_keys.add(key)
+
+        if incremental_cache is not None:
+            logger.info(f'Reused the cached data of {incremental_cache.n_reused} unchanged products')
+            incremental_cache.close()
+
+        if append:
+            # a failed run is added to the history once resumed, so that its products are not duplicated
+            is_published = is_complete or not (failed_products or is_shared)
+        else:
+            # a failed run writes the products parsed so far, before raising
+            is_published = is_complete or bool(failed_products) or not is_shared
+        if is_published or force_remove:
+            move_output(out_fp, final_fp)
+            logger.info(
+                f'Added the output data to the history in {final_fp!r}' if append
+                else f'Wrote the output data to {final_fp!r}'
+            )
+        else:
+            remove_output(out_fp)
+            logger.info('Skipping the output file, as other processes are parsing products of the job queue')
+
+        # the feed compares the whole run, i.e., the products of the processes that share the
+        # queue too, so that the missing ones are not reported as removed, nor dropped from the index
+        if change_index is not None and is_complete:
+            from _changes import CHANGES_FILE_SUFFIX
+
+            changes_fp = os.path.join(output_path, os.path.splitext(output_file)[0] + CHANGES_FILE_SUFFIX)
+            change_index.write_feed(self.jobs.records(), changes_fp, run_timestamp)
+        elif change_index is not None:
+            logger.info('Skipping the change feed, as the products of the job queue are not all parsed yet')
+
+        if len(self.urls) > 1 and is_complete:
+            categories_fp = os.path.join(output_path, os.path.splitext(output_file)[0] + CATEGORIES_FILE_SUFFIX)
+            self._write_categories(categories_fp)
+
+        # print log for failed products, if any, and clean up
+        if failed_products:
+            import time
+
+            log_fp = FAILED_PRODUCTS_LOG_FP.format(time = int(time.time()))
+            # write failed
+            with open(log_fp, 'w') as f_out:
+                json.dump(failed_products, f_out)
+            
+            if force_remove:
+                logger.warning(
+                    'Removing temporary files even if the extraction process failed '
+                    'for some products (due to `force_remove = True`).')
+                self.do_cleanup(force = True)
+
+            error_msg = (
+                f'Scrapping process failed for {len(failed_products)} products. '
+                f'See error log {log_fp!r} for more info'
+            )
+            logger.error(error_msg)
+            raise ScrapingException(error_msg)
+        
+        elif auto_remove:
+            self.do_cleanup()
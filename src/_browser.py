@@ -0,0 +1,107 @@
+import logging
+import json
+import threading
+
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+
+
+# resources we never read: images, fonts and media, and third-party trackers and ads
+DEFAULT_BLOCKED_URL_PATTERNS = (
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm',
+    '*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*adservice.google.*', '*facebook.net*',
+    '*hotjar.com*', '*criteo.com*', '*criteo.net*', '*taboola.com*',
+    '*bat.bing.com*', '*analytics.tiktok.com*', '*pinterest.com*',
+    '*network.bazaarvoice.com*',
+)
+# resources the rating widget needs to render, which are never blocked
+RATING_WIDGET_URL_PATTERNS = (
+    '*apps.bazaarvoice.com*',
+    '*api.bazaarvoice.com*',
+)
+
+# Chrome preference value that blocks a content type
+_BLOCK_SETTING = 2
+
+# `eager` returns from `driver.get` once the HTML is parsed, without waiting for the images,
+# stylesheets and third-party scripts, as the JavaScript-rendered fields are waited for
+PAGE_LOAD_STRATEGIES = ('normal', 'eager')
+DEFAULT_PAGE_LOAD_STRATEGY = 'eager'
+
+# sessions are recycled after that many pages, as browsers leak memory over time
+DEFAULT_MAX_PAGES = 200
+
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BrowserProfile:
+    """
+    Lean browser profile, which skips loading the resources the scraper never reads, e.g.,
+    images, fonts, trackers and ads, so that pages load faster and sessions use less memory
+    """
+    block_images: bool = True
+    blocked_url_patterns: tuple[str, ...] = DEFAULT_BLOCKED_URL_PATTERNS
+    allowed_url_patterns: tuple[str, ...] = RATING_WIDGET_URL_PATTERNS
+    # the network usage is read from the performance log after each page, i.e., a round-trip
+    # to the browser per page, and so only if asked for
+    collect_stats: bool = False
+
+    @property
+    def effective_blocked_url_patterns(self) -> list[str]:
+        """The blocked URL patterns, but those that would block any allowed one"""
+        return [
+            pattern for pattern in self.blocked_url_patterns
+            if not any(fnmatchcase(allowed, pattern) for allowed in self.allowed_url_patterns)
+        ]
+
+    @property
+    def prefs(self) -> dict:
+        """Chrome preferences of the profile"""
+        if not self.block_images:
+            return {}
+        return {'profile.managed_default_content_settings.images': _BLOCK_SETTING}
+
+    @property
+    def arguments(self) -> list[str]:
+        """Chrome command line arguments of the profile"""
+        arguments = ['--disable-extensions', '--disable-background-networking']
+        if self.block_images:
+            arguments.append('--blink-settings=imagesEnabled=false')
+        return arguments
+
+@dataclass
+class NetworkStats:
+    """Network usage of the browser sessions, read from their performance logs"""
+    n_requests: int = 0
+    n_blocked: int = 0
+    transferred_bytes: int = 0
+    _lock: threading.Lock = field(default_factory = threading.Lock, repr = False, compare = False)
+
+    def add_performance_log(self, entries: list[dict]) -> None:
+        """Adds the network events of the given `driver.get_log('performance')` entries"""
+        n_requests = n_blocked = transferred_bytes = 0
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            method, params = message.get('method'), message.get('params', {})
+            if method == 'Network.requestWillBeSent':
+                n_requests += 1
+            elif method == 'Network.loadingFinished':
+                transferred_bytes += int(params.get('encodedDataLength', 0))
+            elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+                n_blocked += 1
+
+        # sessions of a `DriverPool` share the stats
+        with self._lock:
+            self.n_requests += n_requests
+            self.n_blocked += n_blocked
+            self.transferred_bytes += transferred_bytes
+
+    def summary(self) -> str:
+        return (
+            f'{self.n_requests} requests, {self.n_blocked} blocked, '
+            f'{self.transferred_bytes/1024**2:.1f} MB transferred'
+        )
@@ -0,0 +1,168 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from typing import NamedTuple
+
+from _base import CACHE_PATH, ScrapingException
+
+
+PAGE_CACHE_FILE = 'pages.sqlite'
+PAGE_CACHE_FP = os.path.join(CACHE_PATH, PAGE_CACHE_FILE)
+
+DEFAULT_MAX_BYTES = 512*1024**2 # compressed bytes
+
+# kinds of cached pages, which are not interchangeable for the same URL
+RAW_HTML = 'html'       # the body served by the site, e.g., to `BootsHttpScraper`
+RENDERED_DOM = 'dom'    # the page source after JavaScript ran, e.g., in `BootsPageScraper`
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    final_url TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (url, kind)
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+logger = logging.getLogger(__name__)
+
+class PageCacheMiss(ScrapingException):
+    """Raised in replay-only mode when a page is not in the cache"""
+
+class CachedPage(NamedTuple):
+    """A page read from the cache"""
+    html: str
+    final_url: str
+    fetched_at: float
+
+class PageCache:
+    """
+    On-disk cache of the pages loaded by the scrapers, keyed by URL, which stores their HTML
+    compressed with `zlib` in a SQLite database. The total (compressed) size is bounded by
+    `max_bytes`, evicting the least recently used pages first. In replay-only mode, pages
+    are only read from the cache, so a run needs no network, and misses raise `PageCacheMiss`
+    """
+    def __init__(self, path: str = None, *, max_bytes: int = DEFAULT_MAX_BYTES, replay_only: bool = False):
+        """
+        Parameters
+        ----------
+        path: str, optional
+            Path of the SQLite database, which is created if missing
+        max_bytes: int, optional
+            Maximum total size of the compressed pages, in bytes
+        replay_only: bool, optional
+            Whether to serve the pages from the cache only, i.e., without network
+        """
+        path = path or PAGE_CACHE_FP
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.replay_only = replay_only
+        self.n_hits = 0
+        self.n_misses = 0
+
+        # workers of a `DriverPool` share the connection
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread = False, isolation_level = None)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.executescript(_SCHEMA)
+        self._size = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM pages').fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    @property
+    def size(self) -> int:
+        """Total size of the compressed pages, in bytes"""
+        return self._size
+
+    def get(self, url: str, kind: str = RAW_HTML) -> CachedPage | None:
+        """
+        Returns the cached page of `url`, marking it as recently used, or None if missing
+
+        Raises
+        ------
+        PageCacheMiss, if the page is missing in replay-only mode
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT body, final_url, fetched_at FROM pages WHERE url = ? AND kind = ?', (url, kind)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    'UPDATE pages SET accessed_at = ? WHERE url = ? AND kind = ?', (time.time(), url, kind)
+                )
+                self.n_hits += 1
+            else:
+                self.n_misses += 1
+
+        if row is None:
+            if self.replay_only:
+                raise PageCacheMiss(f'Page {url!r} ({kind}) is not in the cache {self.path!r}')
+            return None
+
+        body, final_url, fetched_at = row
+        logger.debug(f'Loading page {url!r} ({kind}) from the cache')
+        return CachedPage(zlib.decompress(body).decode('utf-8'), final_url or url, fetched_at)
+
+    def put(self, url: str, html: str, kind: str = RAW_HTML, *, final_url: str = None) -> None:
+        """
+        Stores the page of `url`, i.e., its `html` and the URL it was served from after
+        redirects, `final_url`, and evicts the least recently used pages over budget
+        """
+        if self.replay_only:
+            return
+
+        body = zlib.compress(html.encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            old_row = self._conn.execute(
+                'SELECT size FROM pages WHERE url = ? AND kind = ?', (url, kind)
+            ).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, kind, body, len(body), final_url, now, now)
+            )
+            self._size += len(body) - (old_row[0] if old_row else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Deletes the least recently used pages until the cache is within budget. Called with the lock held"""
+        if self._size <= self.max_bytes:
+            return
+
+        # the rows are read lazily, through the `accessed_at` index, until enough bytes are freed,
+        # rather than the whole table, and deleted once the cursor is done
+        evicted = []
+        cursor = self._conn.execute('SELECT url, kind, size FROM pages ORDER BY accessed_at')
+        for url, kind, size in cursor:
+            if self._size <= self.max_bytes:
+                break
+            evicted.append((url, kind))
+            self._size -= size
+        cursor.close()
+        self._conn.executemany('DELETE FROM pages WHERE url = ? AND kind = ?', evicted)
+        logger.debug(f'Evicted {len(evicted)} pages from the cache')
+
+    def clear(self) -> None:
+        """Deletes all the cached pages"""
+        with self._lock:
+            self._conn.execute('DELETE FROM pages')
+            self._size = 0
+
+    def close(self) -> None:
+        """Closes the database"""
+        logger.info(f'Page cache: {self.n_hits} hits, {self.n_misses} misses, {self._size//1024} KB stored')
+        self._conn.close()
@@ -0,0 +1,122 @@
+import logging
+import os
+import hashlib
+import json
+import math
+
+from datetime import datetime, timezone
+from typing import Iterable
+
+from _base import CACHE_PATH
+
+
+CHANGE_INDEX_FILE = 'change_index.json'
+CHANGE_INDEX_FP = os.path.join(CACHE_PATH, CHANGE_INDEX_FILE)
+# change feed of each run, written next to the output file
+CHANGES_FILE_SUFFIX = '_changes.json'
+
+# fields of the product records that are compared, i.e., not the page sizes, which vary between loads
+CHANGE_FIELDS = ('Title', 'Price', 'Price_Unit', 'Short_Desc', 'Rating')
+
+
+logger = logging.getLogger(__name__)
+
+def record_digest(record: dict) -> str:
+    """Hash of the `CHANGE_FIELDS` of a product record, so that unchanged records are compared at once"""
+    values = json.dumps([record.get(name) for name in CHANGE_FIELDS], default = str)
+    return hashlib.blake2b(values.encode('utf-8'), digest_size = 16).hexdigest()
+
+def _same(old, new) -> bool:
+    # missing ratings are NaN, which is not equal to itself
+    if isinstance(old, float) and isinstance(new, float) and math.isnan(old) and math.isnan(new):
+        return True
+    return old == new
+
+def field_changes(old: dict, new: dict) -> dict[str, dict]:
+    """The `CHANGE_FIELDS` that differ between two records of a product, as `{field: {'Old': ..., 'New': ...}}`"""
+    return {
+        name: {'Old': old.get(name), 'New': new.get(name)}
+        for name in CHANGE_FIELDS if not _same(old.get(name), new.get(name))
+    }
+
+class ChangeIndex:
+    """
+    Index of the product records of the previous run, keyed as the job queue, i.e., by canonical
+    href, with the digest of each record, from which each run computes its change feed: the added,
+    removed and modified products, with the fields that changed. Since the unchanged records,
+    i.e., most of them, only compare their digests, the feed takes a single pass over the records
+    """
+    def __init__(self, path: str = None):
+        """
+        Parameters
+        ----------
+        path: str, optional
+            Path of the index file, which each run replaces with its own records
+        """
+        self.path = path or CHANGE_INDEX_FP
+        self.run_timestamp = None
+        self.records = {}   # (digest, record), by key
+        if os.path.isfile(self.path):
+            with open(self.path) as f_in:
+                index = json.load(f_in)
+            self.run_timestamp = index['run_timestamp']
+            self.records = {key: tuple(entry) for key, entry in index['records'].items()}
+
+    def diff(self, records: Iterable[tuple[str, dict]], run_timestamp: datetime = None) -> dict:
+        """
+        Returns the change feed of the given `(key, record)` pairs of a run since the indexed
+        run, and indexes them in place of the previous ones (call `self.save` to persist them)
+        """
+        run_timestamp = (run_timestamp or datetime.now(timezone.utc)).isoformat()
+        added, modified = [], []
+        new_records = {}
+        for key, record in records:
+            digest = record_digest(record)
+            new_records[key] = (digest, record)
+
+            previous = self.records.get(key)
+            if previous is None:
+                added.append({'Key': key, 'Record': record})
+            elif previous[0] != digest:
+                modified.append({'Key': key, 'Changes': field_changes(previous[1], record)})
+
+        removed = [{'Key': key, 'Record': record} for key, (_, record) in self.records.items() if key not in new_records]
+        feed = {
+            'Run_Timestamp': run_timestamp,
+            'Previous_Run_Timestamp': self.run_timestamp,
+            'Summary': {
+                'Added': len(added),
+                'Removed': len(removed),
+                'Modified': len(modified),
+                'Unchanged': len(new_records) - len(added) - len(modified),
+            },
+            'Added': added,
+            'Removed': removed,
+            'Modified': modified,
+        }
+
+        self.run_timestamp = run_timestamp
+        self.records = new_records
+        return feed
+
+    def save(self) -> None:
+        """Writes the index, replacing the previous one at once, so that a crash does not corrupt it"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok = True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f_out:
+            json.dump({'run_timestamp': self.run_timestamp, 'records': self.records}, f_out)
+        os.replace(tmp_path, self.path)
+
+    def write_feed(self, records: Iterable[tuple[str, dict]], fp: str, run_timestamp: datetime = None) -> dict:
+        """Writes the change feed of the given records to `fp`, as `self.diff`, and saves the index"""
+        feed = self.diff(records, run_timestamp)
+        with open(fp, 'w') as f_out:
+            json.dump(feed, f_out, indent = 2)
+        self.save()
+
+        summary = feed['Summary']
+        logger.info(
+            f'Wrote the change feed to {fp!r}: {summary["Added"]} added, '
+            f'{summary["Removed"]} removed and {summary["Modified"]} modified products'
+        )
+        return feed
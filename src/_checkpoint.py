@@ -0,0 +1,135 @@
+import logging
+import os
+import json
+
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+class CheckpointJournal:
+    """
+    Append-only JSON-Lines journal that stores one record per key, e.g., the data of each
+    parsed product, so that a process can be resumed after a failure or a crash. It keeps
+    an in-memory index with the offset of each key latest record, so checking whether a
+    key is stored takes no I/O, and reading all records is a single sequential read
+    """
+    def __init__(self, path: str, *, fsync: bool = True):
+        """
+        Parameters
+        ----------
+        path: str
+            Path of the journal file. It is created on the first append, if missing
+        fsync: bool, optional
+            Whether to flush each append to disk, so that it survives a crash of the
+            machine (not only of the process) at the cost of a disk write per append
+        """
+        self.path = path
+        self._fsync = fsync
+        self._file = None
+        self._index = {}
+        self._load()
+
+    def _load(self) -> None:
+        """Builds the index from the existing journal, dropping any partially written last line"""
+        if not os.path.isfile(self.path):
+            return
+
+        offset = 0
+        with open(self.path, 'rb') as f_in:
+            for line in f_in:
+                # a line without line break is an append interrupted by a crash
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    key = json.loads(line)['key']
+                except (ValueError, KeyError):
+                    break
+                self._index[key] = offset
+                offset += len(line)
+
+        if offset < os.path.getsize(self.path):
+            logger.warning(f'Dropping the corrupted tail of the checkpoint journal {self.path!r}')
+            with open(self.path, 'r+b') as f_out:
+                f_out.truncate(offset)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def append(self, key: str, record: dict) -> None:
+        """Stores the `record` of `key`, which replaces any previous record of the same key"""
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+
+        line = (json.dumps({'key': key, 'record': record}) + '\n').encode('utf-8')
+        offset = self._file.tell()
+        self._file.write(line)
+        self._file.flush()
+        if self._fsync:
+            os.fsync(self._file.fileno())
+
+        self._index[key] = offset
+
+    def get(self, key: str, default: dict = None) -> dict:
+        """Returns the latest record of `key`, reading just its line, or `default` if missing"""
+        if key not in self._index:
+            return default
+        if self._file is not None:
+            self._file.flush()
+
+        with open(self.path, 'rb') as f_in:
+            f_in.seek(self._index[key])
+            return json.loads(f_in.readline())['record']
+
+    def records(self) -> Iterator[dict]:
+        """Yields the latest record of each key, in the order they were appended"""
+        if self._file is not None:
+            self._file.flush()
+        if not self._index:
+            return
+
+        latest_offsets = set(self._index.values())
+        offset = 0
+        with open(self.path, 'rb') as f_in:
+            for line in f_in:
+                if offset in latest_offsets:
+                    yield json.loads(line)['record']
+                offset += len(line)
+
+    def compact(self) -> None:
+        """Rewrites the journal keeping only the latest record of each key"""
+        self.close()
+        if not self._index:
+            return
+
+        tmp_path = f'{self.path}.tmp'
+        index = {}
+        with open(self.path, 'rb') as f_in, open(tmp_path, 'wb') as f_out:
+            latest_offsets = set(self._index.values())
+            offset = 0
+            for line in f_in:
+                if offset in latest_offsets:
+                    index[json.loads(line)['key']] = f_out.tell()
+                    f_out.write(line)
+                offset += len(line)
+            f_out.flush()
+            os.fsync(f_out.fileno())
+
+        # atomic, so a crash leaves either the old or the new journal
+        os.replace(tmp_path, self.path)
+        self._index = index
+
+    def close(self) -> None:
+        """Closes the journal file, if open"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self) -> None:
+        """Deletes the journal file, and empties the index"""
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        self._index = {}
@@ -0,0 +1,301 @@
+import logging
+import queue
+import threading
+import time
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# seconds between checks of the pool state while waiting for work
+_POLL_INTERVAL = 0.1
+
+# a node is down after that many consecutive node errors
+MAX_NODE_FAILURES = 3
+# a node is slow if its latency is that many times the fastest node one
+SLOW_FACTOR = 3.0
+# weight of the latest latency in the (exponential moving) average
+LATENCY_SMOOTHING = 0.2
+
+class NoHealthyNodeError(Exception):
+    """Raised when every node is down, and there are items left"""
+
+class Node:
+    """Health and latency of a node, e.g., a selenium Grid executor, or a site mirror"""
+    def __init__(self, url: str):
+        self.url = url
+        self.alive = True
+        self.latency = None
+        self.n_done = 0
+        self.n_failed = 0
+        self.consecutive_failures = 0
+        self._lock = threading.Lock()
+
+    def record_success(self, elapsed: float) -> None:
+        """Records an item processed in `elapsed` seconds"""
+        with self._lock:
+            self.n_done += 1
+            self.consecutive_failures = 0
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency += LATENCY_SMOOTHING*(elapsed - self.latency)
+
+    def record_failure(self, max_failures: int = MAX_NODE_FAILURES) -> None:
+        """Records a node error, and marks the node as down after `max_failures` in a row"""
+        with self._lock:
+            self.n_failed += 1
+            self.consecutive_failures += 1
+            if self.alive and self.consecutive_failures >= max_failures:
+                logger.warning(f'Node {self.url!r} is down, after {self.consecutive_failures} errors in a row')
+                self.alive = False
+
+    def summary(self) -> str:
+        latency = f'{self.latency:.2f}s' if self.latency is not None else '-'
+        state = 'up' if self.alive else 'down'
+        return f'{self.url} ({state}): {self.n_done} done, {self.n_failed} node errors, {latency} latency'
+
+class _Job:
+    """An item, with the nodes where it failed due to a node error"""
+    __slots__ = ('item', 'failed_nodes')
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.failed_nodes = set()
+
+class NodePool:
+    """
+    Pool of sessions spread across several nodes, e.g., selenium Grid executors, that
+    concurrently applies a function to the items of a shared work queue, so that faster
+    nodes pull more items. Items that fail due to the node, rather than to the item, are
+    requeued for another node, and nodes that keep failing are taken out of the pool.
+    Slow nodes keep a single worker pulling items, so they do not hold the last ones
+    """
+    def __init__(
+        self,
+        session_factory: Callable[[str], Any],
+        node_urls: list[str],
+        workers_per_node: int = 1,
+        *,
+        is_node_error: Callable[[Exception], bool] = None,
+        queue_size: int = None,
+        max_node_failures: int = MAX_NODE_FAILURES,
+        slow_factor: float = SLOW_FACTOR
+    ):
+        """
+        Parameters
+        ----------
+        session_factory: function
+            Function that takes a node URL and returns a new session to that node.
+            Sessions are closed calling their `quit` method, or `close` if they have none
+        node_urls: list[str]
+            The URLs of the nodes
+        workers_per_node: int, optional
+            Number of sessions, i.e., of concurrent workers, per node
+        is_node_error: function, optional
+            Function that tells whether an exception is due to the node, e.g., a connection
+            error. default: `ConnectionError`, `TimeoutError` and other `OSError`s
+        queue_size: int, optional
+            Maximum number of items waiting in the work queue. default: twice the number
+            of workers
+        max_node_failures: int, optional
+            Consecutive node errors after which a node is down
+        slow_factor: float, optional
+            Latency, relative to the fastest node one, above which a node is slow
+        """
+        if not node_urls:
+            raise ValueError('There must be at least one node')
+        if workers_per_node < 1:
+            raise ValueError(f'The number of workers must be positive, got {workers_per_node}')
+
+        self._session_factory = session_factory
+        self.nodes = [Node(url) for url in node_urls]
+        self.workers_per_node = workers_per_node
+        self._is_node_error = is_node_error or (lambda e: isinstance(e, OSError))
+        self._queue_size = queue_size or 2*len(self.nodes)*workers_per_node
+        self._max_node_failures = max_node_failures
+        self._slow_factor = slow_factor
+        self._closed = threading.Event()
+        self.sessions = []  # (node, worker index, session)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self) -> None:
+        """Starts the sessions concurrently. Nodes whose sessions fail to start are down"""
+        if self.sessions:
+            return
+
+        slots = [(node, index) for node in self.nodes for index in range(self.workers_per_node)]
+        logger.debug(f'Starting {len(slots)} sessions across {len(self.nodes)} nodes')
+        with ThreadPoolExecutor(len(slots)) as executor:
+            futures = [executor.submit(self._session_factory, node.url) for node, _ in slots]
+
+        errors = []
+        for (node, index), future in zip(slots, futures):
+            if future.exception() is not None:
+                logger.warning(f'Unable to start a session in node {node.url!r}: {future.exception()}')
+                errors.append(future.exception())
+                node.alive = False
+            else:
+                self.sessions.append((node, index, future.result()))
+
+        if not any(node.alive for node in self.nodes):
+            self.close()
+            raise NoHealthyNodeError('Unable to start a session in any node') from errors[0]
+
+    def close(self) -> None:
+        """Stops the workers, if running, quits all sessions, and logs the nodes stats"""
+        self._closed.set()
+        for _, _, session in self.sessions:
+            close_session = getattr(session, 'quit', None) or session.close
+            try:
+                close_session()
+            except Exception as e:
+                logger.warning(f'Unable to close session due to {type(e).__name__}: {e}')
+        self.sessions = []
+
+        for node in self.nodes:
+            logger.info(f'Node {node.summary()}')
+
+    def _is_slow(self, node: Node) -> bool:
+        """Whether the node latency is `slow_factor` times the fastest node one"""
+        latencies = [n.latency for n in self.nodes if n.alive and n.latency is not None]
+        if node.latency is None or len(latencies) < 2:
+            return False
+        return node.latency > self._slow_factor*min(latencies)
+
+    def _has_other_node(self, job: _Job) -> bool:
+        """Whether there is an alive node where the job did not fail yet"""
+        return any(node.alive and node.url not in job.failed_nodes for node in self.nodes)
+
+    def _requeue(self, job: _Job) -> None:
+        """Gives the (in-flight) job back, for another node to take it"""
+        with self._lock:
+            self._requeued.append(job)
+
+    def _feed(self, items: Iterable) -> None:
+        """Feeder thread target, which moves `items` into the bounded work queue"""
+        try:
+            for item in items:
+                # counted before it is queued, so that the pool is never done while a worker holds it
+                with self._lock:
+                    self._n_unfinished += 1
+                while not self._closed.is_set():
+                    try:
+                        self._work_queue.put(_Job(item), timeout = _POLL_INTERVAL)
+                    except queue.Full:
+                        continue
+                    break
+                else:
+                    return
+        except Exception as e:
+            # surface errors from lazy iterables in the consumer thread
+            self._feed_error = e
+        finally:
+            self._fed.set()
+
+    def _next_job(self) -> _Job | None:
+        """The next requeued job, or else the next queued one, or None if there is none yet"""
+        with self._lock:
+            if self._requeued:
+                return self._requeued.popleft()
+        try:
+            return self._work_queue.get(timeout = _POLL_INTERVAL)
+        except queue.Empty:
+            return None
+
+    def _is_done(self) -> bool:
+        """Whether all the items were fed and processed"""
+        with self._lock:
+            return self._fed.is_set() and not self._n_unfinished
+
+    def _work(self, node: Node, index: int, session: Any, func: Callable) -> None:
+        """Worker thread target, which applies `func` to the queued items using its own `session`"""
+        try:
+            while not self._closed.is_set() and node.alive and not self._is_done():
+                # slow nodes keep a single worker, so that the rest of the nodes take most items
+                if index and self._is_slow(node):
+                    time.sleep(_POLL_INTERVAL)
+                    continue
+
+                job = self._next_job()
+                if job is None:
+                    continue
+                # leave the items that failed in this node to the rest
+                if node.url in job.failed_nodes and self._has_other_node(job):
+                    self._requeue(job)
+                    time.sleep(_POLL_INTERVAL)
+                    continue
+
+                start = time.monotonic()
+                try:
+                    result = func(session, job.item)
+                except Exception as e:
+                    if self._is_node_error(e):
+                        node.record_failure(self._max_node_failures)
+                        job.failed_nodes.add(node.url)
+                        # give the item to another node, unless it failed in all of them
+                        if self._has_other_node(job):
+                            logger.debug(f'Requeuing item due to a node error in {node.url!r}: {e}')
+                            self._requeue(job)
+                            continue
+                    self._result_queue.put((job.item, None, e))
+                else:
+                    node.record_success(time.monotonic() - start)
+                    self._result_queue.put((job.item, result, None))
+
+                with self._lock:
+                    self._n_unfinished -= 1
+        finally:
+            self._result_queue.put(None)
+
+    def imap_unordered(self, func: Callable[[Any, Any], Any], items: Iterable) -> Iterator[tuple[Any, Any, Exception]]:
+        """
+        Applies `func(session, item)` to every item in `items`, distributing
+        them across the nodes sessions, and yields the results as they finish,
+        as `DriverPool.imap_unordered`
+
+        Raises
+        ------
+        NoHealthyNodeError, if every node went down before all items were processed
+        """
+        self.start()
+        self._closed.clear()
+        self._fed = threading.Event()
+        self._feed_error = None
+        self._work_queue = queue.Queue(maxsize = self._queue_size)
+        self._result_queue = queue.Queue()
+        self._requeued = deque()
+        # items fed but not processed yet, i.e., queued, requeued or in flight
+        self._n_unfinished = 0
+        self._lock = threading.Lock()
+
+        threads = [threading.Thread(target = self._feed, args = (items,), daemon = True)]
+        threads += [
+            threading.Thread(target = self._work, args = (node, index, session, func), daemon = True)
+            for node, index, session in self.sessions
+        ]
+        for thread in threads:
+            thread.start()
+
+        n_running = len(self.sessions)
+        while n_running:
+            result = self._result_queue.get()
+            if result is None:
+                n_running -= 1
+            else:
+                yield result
+
+        if self._feed_error is not None:
+            raise self._feed_error
+        if not self._is_done():
+            # stop the feeder, which may be blocked on the work queue
+            self._closed.set()
+            raise NoHealthyNodeError('Every node is down, and there are items left')
@@ -1,11 +1,103 @@
 import logging
 import functools
+import random
+import threading
 import time
 import re
 
+from typing import Any
+
+from _metrics import METRICS, RETRIES, RETRIES_EXHAUSTED, RETRY_BUDGET_EXHAUSTED, FATAL_ERRORS, CIRCUIT_OPENS
+
 logger = logging.getLogger(__name__)
 
-def retry(func = None, *, exceptions = Exception, n_tries = 3, delay = 1, max_delay = 5, backoff = 1):
+# a run retries at most `ratio` of its calls, plus `min_retries`
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN_RETRIES = 10
+
+# a key, e.g., a host, is paused that many seconds after that many consecutive failures
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30 # in seconds
+
+class RetryBudget:
+    """
+    Budget of the retries of a run, shared by all the decorated functions that use it, so that
+    retries stay a fraction of the calls, i.e., at most `min_retries + ratio*n_calls`, instead
+    of multiplying the load when a site is failing
+    """
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_retries: int = RETRY_BUDGET_MIN_RETRIES):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.n_calls = 0
+        self.n_retries = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.n_calls += 1
+
+    def try_spend(self) -> bool:
+        """Spends a retry, if there is any left in the budget"""
+        with self._lock:
+            if self.n_retries >= self.min_retries + self.ratio*self.n_calls:
+                return False
+            self.n_retries += 1
+            return True
+
+class CircuitBreaker:
+    """
+    Circuit breaker that pauses the calls to a key, e.g., a host or an executor, for
+    `reset_timeout` seconds after `failure_threshold` consecutive failures, instead of
+    having every worker hammer it. After the pause, the next failure pauses it again,
+    whereas a success closes the circuit
+    """
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}     # consecutive failures, by key
+        self._opened_at = {}    # by key, while the circuit is open (or half open)
+        self._lock = threading.Lock()
+
+    def wait_time(self, key: Any) -> float:
+        """Seconds until calls to `key` resume, i.e., 0 if its circuit is closed"""
+        with self._lock:
+            opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return 0
+        return max(opened_at + self.reset_timeout - time.monotonic(), 0)
+
+    def record_success(self, key: Any) -> None:
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+
+    def record_failure(self, key: Any) -> None:
+        with self._lock:
+            n_failures = self._failures[key] = self._failures.get(key, 0) + 1
+            # a failure after the pause, i.e., while half open, opens the circuit again
+            if key not in self._opened_at and n_failures < self.failure_threshold:
+                return
+            self._opened_at[key] = time.monotonic()
+        logger.warning(f'Pausing the calls to {key!r} for {self.reset_timeout}s, after {n_failures} failures in a row')
+        METRICS.count(CIRCUIT_OPENS, key = str(key))
+
+# retry budget of the run, shared by the retries of all engines
+RETRY_BUDGET = RetryBudget()
+
+def retry(
+    func = None,
+    *,
+    exceptions = Exception,
+    n_tries = 3,
+    delay = 1,
+    max_delay = 5,
+    backoff = 1,
+    jitter = True,
+    is_retriable = None,
+    budget = None,
+    breaker = None,
+    breaker_key = None
+):
     """
     Decorator to re-execute a function `func` if it raises any error up to `n_tries` times.
     It can be used in either of the following ways
@@ -26,7 +118,7 @@ def retry(func = None, *, exceptions = Exception, n_tries = 3, delay = 1, max_de
     ----------
     func:
         the decorated function. one must NOT pass this parameter, but it is
-        needed for the decorator to accept optional parameters with no 
+        needed for the decorator to accept optional parameters with no
         parenthesis with its current construction
     exceptions: exception or tuple
         an exception or a tuple of exceptions to catch. default: Exception.
@@ -38,44 +130,183 @@ def retry(func = None, *, exceptions = Exception, n_tries = 3, delay = 1, max_de
         maximum value of delay between attemps. default: 5
     backoff: int or float
         multiplier applied to delay between attempts. default: 1 (no backoff)
-          
+    jitter: bool
+        whether to wait a random time between 0 and the delay ("full jitter"), so
+        that concurrent workers do not retry in sync. default: True
+    is_retriable: function, optional
+        function that tells whether a caught exception is worth retrying. those
+        that are not, e.g., a 404 response, are re-raised right away. default: all
+    budget: RetryBudget, optional
+        retry budget shared across functions, after which errors are re-raised right away
+    breaker: CircuitBreaker, optional
+        circuit breaker that pauses the calls to a key after consecutive failures
+    breaker_key: function, optional
+        function that takes the call arguments and returns its breaker key, e.g., its host
+
     Raises
     ------
     Exception
         the catched exception (one of `exeptions`), if it is still raised after
-        `n_tries` attemps 
+        `n_tries` attemps, if it is not retriable, or if the budget is exhausted
     """
     if func is None:
-        kwargs = dict(exceptions=exceptions, n_tries=n_tries, delay=delay, max_delay=max_delay, backoff=backoff)
+        kwargs = dict(
+            exceptions=exceptions, n_tries=n_tries, delay=delay, max_delay=max_delay, backoff=backoff,
+            jitter=jitter, is_retriable=is_retriable, budget=budget, breaker=breaker, breaker_key=breaker_key
+        )
         return functools.partial(retry, **kwargs)
 
+    policy = _RetryPolicy(func, n_tries, delay, max_delay, backoff, jitter, is_retriable, budget, breaker, breaker_key)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        key = policy.key(args, kwargs)
         n = 1
-        while n <= n_tries:
+        while True:
+            if wait_time := policy.wait_time(key):
+                time.sleep(wait_time)
             try:
-                return func(*args, **kwargs)
+                result = func(*args, **kwargs)
             except exceptions as e:
-                err = e # store the error, just in case it need to be re-raised
-                
-                # selenium exceptions are extremely verbose, but its stacktrace
-                # does not offer relevant information within the decorator
-                if 'selenium' in str(e.__class__):
-                    e_msg = f'{type(e).__name__}'
-                else:
-                    e_msg = f'{type(e).__name__}: {e}'
-
-                sleep_time = min(delay*(backoff**n), max_delay)
-                logger_msg = (
-                    f'execution of {func.__name__!r} failed on retry #{n} due to '
-                    f'{e_msg} ; retrying in {sleep_time} seconds'
-                )
-                logger.warning(re.sub(r'\s+', ' ', logger_msg))
-
+                sleep_time = policy.on_failure(key, n, e)
+                if sleep_time is None:
+                    raise
                 time.sleep(sleep_time)
-                
                 n += 1
-        logger.error(f"max retries reached during the execution of {func.__name__!r}.")
-        raise err # re-raise the error, to recover its traceback
-    
+            else:
+                policy.on_success(key)
+                return result
+
+    return wrapper
+
+def async_retry(
+    func = None,
+    *,
+    exceptions = Exception,
+    n_tries = 3,
+    delay = 1,
+    max_delay = 5,
+    backoff = 1,
+    jitter = True,
+    is_retriable = None,
+    budget = None,
+    breaker = None,
+    breaker_key = None
+):
+    """
+    Async-aware variant of `retry`, to decorate coroutine functions. It has the same
+    parameters and usage, but it waits between attempts (and while the circuit is
+    open) with `asyncio.sleep`, so that it does not block the event loop
+    ```
+        @async_retry(exceptions = aiohttp.ClientError, n_tries = 4)
+        async def dummy():
+            pass
+    ```
+    """
+    if func is None:
+        kwargs = dict(
+            exceptions=exceptions, n_tries=n_tries, delay=delay, max_delay=max_delay, backoff=backoff,
+            jitter=jitter, is_retriable=is_retriable, budget=budget, breaker=breaker, breaker_key=breaker_key
+        )
+        return functools.partial(async_retry, **kwargs)
+
+    import asyncio
+
+    policy = _RetryPolicy(func, n_tries, delay, max_delay, backoff, jitter, is_retriable, budget, breaker, breaker_key)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = policy.key(args, kwargs)
+        n = 1
+        while True:
+            if wait_time := policy.wait_time(key):
+                await asyncio.sleep(wait_time)
+            try:
+                result = await func(*args, **kwargs)
+            except exceptions as e:
+                sleep_time = policy.on_failure(key, n, e)
+                if sleep_time is None:
+                    raise
+                await asyncio.sleep(sleep_time)
+                n += 1
+            else:
+                policy.on_success(key)
+                return result
+
     return wrapper
+
+class _RetryPolicy:
+    """Decisions of `retry` and `async_retry`, which only differ in how they wait"""
+    def __init__(self, func, n_tries, delay, max_delay, backoff, jitter, is_retriable, budget, breaker, breaker_key):
+        self.func = func
+        self.n_tries = n_tries
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.is_retriable = is_retriable
+        self.budget = budget
+        self.breaker = breaker
+        self.breaker_key = breaker_key
+
+    def key(self, args: tuple, kwargs: dict) -> Any:
+        """Starts a call, spending it in the budget, if any, and returns its breaker key, if any"""
+        if self.budget is not None:
+            self.budget.record_call()
+        if self.breaker is None:
+            return None
+        return self.breaker_key(*args, **kwargs) if self.breaker_key is not None else self.func.__name__
+
+    def wait_time(self, key: Any) -> float:
+        """Seconds to wait before an attempt, i.e., while the circuit of `key` is open"""
+        return self.breaker.wait_time(key) if self.breaker is not None else 0
+
+    def on_success(self, key: Any) -> None:
+        if self.breaker is not None:
+            self.breaker.record_success(key)
+
+    def on_failure(self, key: Any, n: int, e: Exception) -> float | None:
+        """
+        Handles the failed attempt `n` due to `e`, and returns the time to wait before
+        the next one, or None if the error must be re-raised
+        """
+        name = self.func.__name__
+        if self.is_retriable is not None and not self.is_retriable(e):
+            logger.debug(f'execution of {name!r} failed due to the non-retriable {type(e).__name__}')
+            METRICS.count(FATAL_ERRORS, function = name)
+            return None
+
+        if self.breaker is not None:
+            self.breaker.record_failure(key)
+
+        if n >= self.n_tries:
+            logger.error(f"max retries reached during the execution of {name!r}.")
+            METRICS.count(RETRIES_EXHAUSTED, function = name)
+            return None
+        if self.budget is not None and not self.budget.try_spend():
+            logger.error(f"retry budget exhausted during the execution of {name!r}.")
+            METRICS.count(RETRY_BUDGET_EXHAUSTED, function = name)
+            return None
+
+        return _log_retry(self.func, n, e, self.delay, self.backoff, self.max_delay, self.jitter)
+
+def _log_retry(func, n, e, delay, backoff, max_delay, jitter = False):
+    """Logs the failed attempt `n` of `func` due to `e`, and returns the time to wait before the next one"""
+    # selenium exceptions are extremely verbose, but its stacktrace
+    # does not offer relevant information within the decorator
+    if 'selenium' in str(e.__class__):
+        e_msg = f'{type(e).__name__}'
+    else:
+        e_msg = f'{type(e).__name__}: {e}'
+
+    METRICS.count(RETRIES, function = func.__name__)
+
+    sleep_time = min(delay*(backoff**n), max_delay)
+    if jitter:
+        sleep_time = round(random.uniform(0, sleep_time), 3)
+    logger_msg = (
+        f'execution of {func.__name__!r} failed on retry #{n} due to '
+        f'{e_msg} ; retrying in {sleep_time} seconds'
+    )
+    logger.warning(re.sub(r'\s+', ' ', logger_msg))
+    return sleep_time
@@ -0,0 +1,239 @@
+import re
+import json
+import logging
+
+from collections import namedtuple
+from html.parser import HTMLParser
+
+# locator strategies, with the same values as `selenium.webdriver.common.by.By`
+# so that the selector specs can be shared with the selenium scraper
+BY_ID = 'id'
+BY_CLASS_NAME = 'class name'
+
+# elements without end tag
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+# elements that start in a new line when rendered
+BLOCK_ELEMENTS = {
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tr', 'ul'
+}
+# elements whose text is never rendered
+HIDDEN_ELEMENTS = {'head', 'noscript', 'script', 'style', 'template'}
+
+HtmlElement = namedtuple('HtmlElement', ['attrs', 'text'])
+
+JSON_LD_TYPE = 'application/ld+json'
+
+logger = logging.getLogger(__name__)
+
+def _matches(attrs: dict, by: str, value: str) -> bool:
+    """Whether an element with attributes `attrs` is located by the `(by, value)` selector"""
+    if by == BY_ID:
+        return attrs.get('id') == value
+    if by == BY_CLASS_NAME:
+        return value in (attrs.get('class') or '').split()
+    raise ValueError(f'Unsupported locator strategy {by!r}')
+
+def _is_hidden(tag: str, attrs: dict) -> bool:
+    """Whether the element is not rendered, judging by its tag and inline attributes"""
+    style = re.sub(r'\s+', '', attrs.get('style') or '').lower()
+    return tag in HIDDEN_ELEMENTS or 'hidden' in attrs or 'display:none' in style
+
+def _render_text(fragments: list[str]) -> str:
+    """
+    Joins the text fragments of an element the way `WebElement.text` does, i.e.,
+    with one line per block and with trimmed, non-empty lines
+    """
+    lines = (line.strip(' ') for line in ''.join(fragments).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+class _SelectorParser(HTMLParser):
+    """`HTMLParser` that collects the attributes and rendered text of the elements matching some selectors"""
+    def __init__(self, selectors: dict[str, tuple[str, str]], scope: str = None):
+        super().__init__(convert_charrefs = True)
+        self._selectors = selectors
+        self.elements = {field: [] for field in selectors}
+        # the index of the innermost `scope` element each element is within, if any
+        self._scope = scope
+        self.scopes = {field: [] for field in selectors}
+
+        self._stack = []        # open tags
+        self._captures = []     # [field, index, stack level, text fragments] of the open matched elements
+        self._hidden_level = None
+
+    def _current_scope(self) -> int | None:
+        for field, index, _, _ in reversed(self._captures):
+            if field == self._scope:
+                return index
+        return None
+
+    def _add_element(self, field: str, attrs: dict) -> None:
+        self.scopes[field].append(self._current_scope())
+        self.elements[field].append(HtmlElement(attrs, ''))
+
+    def _break_line(self):
+        for capture in self._captures:
+            capture[3].append('\n')
+
+    def _close_captures(self):
+        level = len(self._stack)
+        while self._captures and self._captures[-1][2] > level:
+            field, index, _, fragments = self._captures.pop()
+            attrs = self.elements[field][index].attrs
+            self.elements[field][index] = HtmlElement(attrs, _render_text(fragments))
+
+        if self._hidden_level is not None and self._hidden_level > level:
+            self._hidden_level = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in BLOCK_ELEMENTS or tag == 'br':
+            self._break_line()
+
+        if tag in VOID_ELEMENTS:
+            for field, (by, value) in self._selectors.items():
+                if _matches(attrs, by, value):
+                    self._add_element(field, attrs)
+            return
+
+        self._stack.append(tag)
+        if self._hidden_level is None and _is_hidden(tag, attrs):
+            self._hidden_level = len(self._stack)
+
+        for field, (by, value) in self._selectors.items():
+            if _matches(attrs, by, value):
+                # keep the document order, as nested elements are closed before their ancestors
+                self._add_element(field, attrs)
+                self._captures.append([field, len(self.elements[field]) - 1, len(self._stack), []])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # close implicitly the elements with optional end tag, e.g., `<li>` or `<p>`,
+        # and ignore stray end tags, the same way browsers do
+        if tag not in self._stack:
+            return
+        while self._stack.pop() != tag:
+            pass
+
+        if tag in BLOCK_ELEMENTS:
+            self._break_line()
+        self._close_captures()
+
+    def handle_data(self, data):
+        if self._hidden_level is not None:
+            return
+        # source whitespace is collapsed when rendered
+        data = re.sub(r'\s+', ' ', data)
+        for capture in self._captures:
+            capture[3].append(data)
+
+    def close(self):
+        super().close()
+        self._stack = []
+        self._close_captures()
+
+def extract_elements(html: str, selectors: dict[str, tuple[str, str]]) -> dict[str, list[HtmlElement]]:
+    """
+    Extracts the elements matching each of the given selectors from an HTML document,
+    without rendering it (so text hidden by stylesheets or built by JavaScript is missed)
+
+    Parameters
+    ----------
+    html: str
+        The HTML document
+    selectors: dict[str, tuple[str, str]]
+        The `(by, value)` selectors, e.g., `(BY_CLASS_NAME, 'price')`, by field name
+
+    Returns
+    -------
+    elements: dict[str, list[HtmlElement]]
+        For each field, the matched elements, in document order, as `(attrs, text)`
+        named tuples, where the text is rendered as `WebElement.text` does
+    """
+    parser = _SelectorParser(selectors)
+    parser.feed(html)
+    parser.close()
+    return parser.elements
+
+def extract_scoped_elements(
+    html: str,
+    scope: tuple[str, str],
+    selectors: dict[str, tuple[str, str]]
+) -> list[dict[str, list[HtmlElement]]]:
+    """
+    Extracts the elements matching each of the given selectors within each element matching
+    the `scope` selector, e.g., the fields of each teaser of a listing page, as `extract_elements`
+
+    Returns
+    -------
+    scoped_elements: list[dict[str, list[HtmlElement]]]
+        For each `scope` element, in document order, its elements by field name. Elements
+        within nested `scope` elements belong to the innermost one only
+    """
+    scope_field = object()
+    parser = _SelectorParser({scope_field: scope, **selectors}, scope = scope_field)
+    parser.feed(html)
+    parser.close()
+
+    scoped_elements = [{field: [] for field in selectors} for _ in parser.elements[scope_field]]
+    for field in selectors:
+        for element, index in zip(parser.elements[field], parser.scopes[field]):
+            if index is not None:
+                scoped_elements[index][field].append(element)
+    return scoped_elements
+
+class _JsonLdParser(HTMLParser):
+    """`HTMLParser` that collects the content of the JSON-LD scripts"""
+    def __init__(self):
+        super().__init__(convert_charrefs = False)
+        self.scripts = []
+        self._fragments = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'script' and (dict(attrs).get('type') or '').strip().lower() == JSON_LD_TYPE:
+            self._fragments = []
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self._fragments is not None:
+            self.scripts.append(''.join(self._fragments))
+            self._fragments = None
+
+    def handle_data(self, data):
+        if self._fragments is not None:
+            self._fragments.append(data)
+
+def extract_json_ld(html: str) -> list:
+    """
+    Extracts the structured data embedded in an HTML document as JSON-LD scripts, i.e.,
+    `<script type="application/ld+json">`. Scripts that are not valid JSON are skipped
+
+    Returns
+    -------
+    items: list
+        The JSON-LD items, flattening the top-level arrays and `@graph` arrays
+    """
+    parser = _JsonLdParser()
+    parser.feed(html)
+    parser.close()
+
+    items = []
+    for script in parser.scripts:
+        try:
+            data = json.loads(script)
+        except ValueError:
+            logger.debug('Skipping a JSON-LD script that is not valid JSON')
+            continue
+        for item in data if isinstance(data, list) else [data]:
+            if isinstance(item, dict) and isinstance(item.get('@graph'), list):
+                items.extend(item['@graph'])
+            else:
+                items.append(item)
+    return items
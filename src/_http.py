@@ -0,0 +1,371 @@
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit, urlunsplit
+
+from _product import Product
+from _decorator import RETRY_BUDGET, CircuitBreaker, retry
+from _metrics import METRICS, PAGE_BYTES
+from _html import extract_elements
+from _base import (
+    BaseScraper,
+    LISTING_SELECTORS,
+    PRODUCT_SELECTORS,
+    PageSize,
+    parse_listing_details,
+    parse_listing_elements,
+    parse_product_elements,
+    set_page_size
+)
+
+if TYPE_CHECKING:
+    from _cache import PageCache
+    from _scraper import BootsPageScraper
+    from _incremental import Probe
+
+
+# status codes worth retrying, i.e., transient errors of the site, and rate limiting
+RETRIABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+
+# the site hosts that keep failing are paused, for all workers
+HOST_BREAKER = CircuitBreaker()
+
+def is_retriable_http_error(e: Exception) -> bool:
+    """Whether a request error is transient, e.g., a connection error or a 503, unlike, e.g., a 404"""
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return e.response.status_code in RETRIABLE_STATUS_CODES
+    return True
+
+def is_node_http_error(e: Exception) -> bool:
+    """
+    Whether a request error is due to the mirror, i.e., it is unreachable, times out, or fails
+    (a 5xx), unlike, e.g., the 404 of a delisted product, which any mirror would serve
+    """
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    return isinstance(e, (requests.ConnectionError, requests.Timeout))
+
+HTTP_RETRY_POLICY = dict(
+    exceptions = requests.RequestException, 
+    backoff = 2, 
+    is_retriable = is_retriable_http_error, 
+    budget = RETRY_BUDGET, 
+    breaker = HOST_BREAKER
+)
+# retries the methods whose first argument is the requested URL
+HTTP_RETRY = retry(**HTTP_RETRY_POLICY, breaker_key = lambda self, url, *args, **kwargs: urlsplit(url).netloc)
+
+HTTP_TIMEOUT = 30 # in seconds
+
+# fallback browsers reading ratings at once, as the selenium container runs few sessions
+MAX_FALLBACK_BROWSERS = 2
+
+# the site serves a reduced page (or none) to clients that do not look like a browser
+HTTP_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    ),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-GB,en;q=0.9',
+}
+
+
+logger = logging.getLogger(__name__)
+
+def new_http_session(pool_size: int = 10) -> requests.Session:
+    """
+    Creates a `requests.Session` that keeps alive up to `pool_size` connections
+    per host, so consecutive requests to the site skip the TCP and TLS handshakes
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections = pool_size, pool_maxsize = pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(HTTP_HEADERS)
+    return session
+
+class MirrorAdapter(HTTPAdapter):
+    """
+    Transport adapter that sends the requests to a mirror of the site, e.g., a node of a
+    `NodePool`, i.e., replacing their scheme and host with the mirror ones, so that the
+    responses (and their URL) look as if they came from the site
+    """
+    def __init__(self, mirror_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.mirror_scheme, self.mirror_netloc, *_ = urlsplit(mirror_url)
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        scheme, netloc, path, query, fragment = urlsplit(request.url)
+        request.url = urlunsplit((self.mirror_scheme, self.mirror_netloc, path, query, fragment))
+        resp = super().send(request, **kwargs)
+
+        mirror_scheme, mirror_netloc, path, query, fragment = urlsplit(resp.url)
+        if (mirror_scheme, mirror_netloc) == (self.mirror_scheme, self.mirror_netloc):
+            resp.url = urlunsplit((scheme, netloc, path, query, fragment))
+        return resp
+
+@retry(**HTTP_RETRY_POLICY, breaker_key = lambda session, url, *args, **kwargs: urlsplit(url).netloc)
+def head_page(session: requests.Session, url: str, headers: dict = None) -> requests.Response:
+    """
+    HEADs the page `url` with the `session` session, e.g., with the headers of a conditional
+    request to check whether it changed, without downloading it
+    """
+    resp = session.head(url, headers = headers, timeout = HTTP_TIMEOUT, allow_redirects = True)
+    resp.raise_for_status()
+    return resp
+
+def decode_response(resp: requests.Response) -> str:
+    """
+    Returns the response body as text. Unlike `resp.text`, it falls back to UTF-8
+    (the site encoding) instead of guessing it when the headers declare no charset
+    """
+    if 'charset' not in resp.headers.get('Content-Type', '').lower():
+        resp.encoding = 'utf-8'
+    return resp.text
+
+def response_page_size(resp: requests.Response) -> PageSize:
+    """
+    The size of the response body, as transferred, i.e., its `Content-Length`, or else
+    the bytes read from the connection, and decoded, without copying the body
+    """
+    transfer_bytes = resp.headers.get('Content-Length')
+    if transfer_bytes is not None:
+        transfer_bytes = int(transfer_bytes)
+    elif hasattr(resp.raw, 'tell'):
+        transfer_bytes = resp.raw.tell()
+    return PageSize(transfer_bytes, len(resp.content))
+
+def parse_listing_html(html: str, base_url: str) -> list[Product]:
+    """
+    Parses the products in a listing page, the same way `BootsPageScraper.find_products` does
+
+    Parameters
+    ----------
+    html: str
+        The listing page HTML
+    base_url: str
+        The listing page URL, to resolve relative hrefs
+
+    Returns
+    -------
+    products: list[Product]
+    """
+    return parse_listing_elements(extract_elements(html, LISTING_SELECTORS), base_url)
+
+def parse_product_html(html: str, product: Product, page_size: PageSize = None) -> Product:
+    """
+    Fills the product attributes from its product page, the same way
+    `BootsPageScraper._parse_product` does. The rating is only set if it
+    is in the HTML, which is not the case when it is rendered by JavaScript.
+    The page size is `page_size`, if given, or else the (UTF-8) HTML size
+
+    Raises
+    ------
+    ScrapingException, if the page has no product title or price
+    """
+    parse_product_elements(extract_elements(html, PRODUCT_SELECTORS), product)
+    set_page_size(product, page_size or PageSize(None, len(html.encode('utf-8'))))
+    return product
+
+class BootsHttpScraper(BaseScraper):
+    """
+    Scraper that fetches the Boots - Sleep pages with plain HTTP requests, through keep-alive
+    sessions, and parses the server-rendered HTML. The only field that needs JavaScript, i.e.,
+    the rating, is read with a `BootsPageScraper` (lazily created) as a fallback, one per
+    worker that needs it at once, up to `MAX_FALLBACK_BROWSERS`, for which the rest wait
+    """
+    def __init__(
+        self,
+        *,
+        url: str | list[str] = None,
+        headless: bool = False,
+        driver_path: str = None,
+        rating_fallback: bool = True,
+        page_cache: 'PageCache' = None,
+        listing_only: bool = False
+    ):
+        """
+        Parameters
+        ----------
+        url: str or list[str], optional
+            The URL from where we extract the data, or the URLs of several categories to crawl
+        headless: bool, optional
+            Whether the fallback `BootsPageScraper` runs headless, i.e.,
+            without GUI, and within a running docker container
+        driver_path: str, optional
+            Path to the webdriver executable of the fallback `BootsPageScraper`
+        rating_fallback: bool, optional
+            Whether to read the ratings with a `BootsPageScraper`. If False,
+            the products rating is NaN, i.e., as if they had no rating
+        page_cache: PageCache, optional
+            Cache the pages are read through, which the fallback `BootsPageScraper` shares
+        listing_only: bool, optional
+            Whether to build the product records from the listing pages, and only parse
+            the pages of the products whose listing misses any required field, i.e.,
+            `BaseScraper` listing-only mode
+        """
+        super().__init__(url, page_cache, listing_only)
+        self.session = new_http_session()
+
+        self._headless = headless
+        self._driver_path = driver_path
+        self._rating_fallback = rating_fallback
+        self._browsers = []         # every fallback browser started, to quit them
+        self._idle_browsers = []    # the ones no worker is using
+        self._browser_lock = threading.Lock()
+        self._browser_slots = threading.BoundedSemaphore(MAX_FALLBACK_BROWSERS)
+
+    @HTTP_RETRY
+    def _get(self, url: str, session: requests.Session = None, headers: dict = None) -> requests.Response:
+        """Helper method that GETs the given URL, using this scraper session by default"""
+        resp = (session or self.session).get(url, headers = headers, timeout = HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return resp
+
+    def _get_cached_html(self, url: str) -> tuple[str, str, PageSize] | None:
+        """
+        Helper method that returns the page of the given URL in the page cache, if any, as
+        `self._get_html`. The size of cached pages is their HTML one, as they were not transferred
+        """
+        if self.page_cache is not None and (page := self.page_cache.get(url)) is not None:
+            return page.html, page.final_url, PageSize(None, len(page.html.encode('utf-8')))
+        return None
+
+    def _read_html(self, url: str, resp: requests.Response) -> tuple[str, str, PageSize]:
+        """Helper method that reads the page of the response to the given URL, as `self._get_html`, caching it"""
+        html = decode_response(resp)
+        if self.page_cache is not None:
+            self.page_cache.put(url, html, final_url = resp.url)
+        return html, resp.url, response_page_size(resp)
+
+    def _get_html(self, url: str, session: requests.Session = None) -> tuple[str, str, PageSize]:
+        """
+        Helper method that returns the HTML of the given URL, the URL it was served from,
+        after redirects, and its size, reading it through the page cache, if any
+        """
+        if (page := self._get_cached_html(url)) is not None:
+            return page
+        return self._read_html(url, self._get(url, session))
+
+    def _probe_product(self, product: Product, session: requests.Session = None) -> 'Probe':
+        """
+        Checks whether the product page changed since its record was cached, with a conditional
+        GET through the page cache, whose page, if it changed, is parsed without fetching it again
+        """
+        entry, headers = self.incremental_cache.request_headers(product.href)
+        if (page := self._get_cached_html(product.href)) is not None:
+            return self.incremental_cache.check(product.href, entry, 200, html = page[0], page = page)
+
+        resp = self._get(product.href, session, headers)
+        if resp.status_code == 304:
+            return self.incremental_cache.check(product.href, entry, 304, resp.headers)
+        page = self._read_html(product.href, resp)
+        return self.incremental_cache.check(product.href, entry, resp.status_code, resp.headers, page[0], page)
+
+    @METRICS.timed('find_products')
+    def find_products(self) -> list[Product]:
+        """
+        Finds the products in the initial URL and stores them in `Product` instances,
+        for later information retrieval
+
+        Returns
+        -------
+        products: list[Product]
+            list of products found, as `Product` instances
+        """
+        logger.debug(f'Searching products in the URL')
+
+        products = self._find_products_in_page(self.url, self.session)
+        self._n_products = len(products)
+        logger.info(f'Found {self._n_products} products')
+
+        return products
+
+    @METRICS.timed('listing_page')
+    def _find_products_in_page(self, url: str, session: requests.Session) -> list[Product]:
+        """Finds the products in the listing page `url`, requesting it with the `session` HTTP session"""
+        html, final_url, _ = self._get_html(url, session)
+        if self.listing_only:
+            return parse_listing_details(html, final_url)
+        return parse_listing_html(html, final_url)
+
+    def _new_session(self) -> requests.Session:
+        """Returns a new HTTP session for a `DriverPool` worker"""
+        return new_http_session(pool_size = 1)
+
+    def _new_node_session(self, node_url: str) -> requests.Session:
+        """Returns a new HTTP session that sends the requests to the mirror `node_url`, for a `NodePool` worker"""
+        session = new_http_session(pool_size = 1)
+        adapter = MirrorAdapter(node_url, pool_connections = 1, pool_maxsize = 1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _acquire_browser(self) -> 'BootsPageScraper':
+        """
+        Returns an idle fallback `BootsPageScraper`, or a new one if every one is in use, so
+        that there are as many as workers read ratings at once. Called holding a browser slot,
+        so that there are `MAX_FALLBACK_BROWSERS` at most
+        """
+        with self._browser_lock:
+            if self._idle_browsers:
+                return self._idle_browsers.pop()
+
+        # selenium is only needed (and imported) for the fallback
+        from _scraper import BootsPageScraper
+
+        logger.debug('Starting a rating fallback browser')
+        browser = BootsPageScraper(
+            url = self.url,
+            headless = self._headless,
+            driver_path = self._driver_path,
+            page_cache = self.page_cache
+        )
+        with self._browser_lock:
+            self._browsers.append(browser)
+        return browser
+
+    def _is_node_error(self, error: Exception) -> bool:
+        """Whether the parsing error is due to the mirror, rather than to the product, e.g., its page is gone"""
+        return is_node_http_error(error)
+
+    def _read_rating(self, product: Product):
+        """Reads the product rating loading its page in a fallback `BootsPageScraper`"""
+        if not self._rating_fallback:
+            return float('nan')
+
+        with self._browser_slots:
+            browser = self._acquire_browser()
+            try:
+                return browser._read_page_rating(product.href)
+            finally:
+                with self._browser_lock:
+                    self._idle_browsers.append(browser)
+
+    def _parse_product(self, product: Product, session: requests.Session = None, page: tuple = None):
+        """
+        Parse the given product to extract the necessary information, using
+        the `session` HTTP session, which defaults to this scraper one, unless
+        its `page` was already fetched, e.g., by `self._probe_product`
+        """
+        with METRICS.timer('fetch'):
+            html, _, page_size = page or self._get_html(product.href, session)
+        with METRICS.timer('extraction'):
+            parse_product_html(html, product, page_size)
+        METRICS.observe(PAGE_BYTES, page_size.decoded_bytes)
+
+        # unless the ratings provider reads it in bulk
+        if product.rating is None and not self._rating_pending(product):
+            product.rating = self._read_rating(product)
+
+        return product.as_dict()
+
+    def quit(self) -> None:
+        """Closes the HTTP session and the fallback browsers, if any"""
+        self.session.close()
+        for browser in self._browsers:
+            browser.quit()
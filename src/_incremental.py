@@ -0,0 +1,126 @@
+import logging
+import os
+import hashlib
+import threading
+import time
+
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+from _base import CACHE_PATH
+from _checkpoint import CheckpointJournal
+
+
+INCREMENTAL_CACHE_FILE = 'incremental.jsonl'
+INCREMENTAL_CACHE_FP = os.path.join(CACHE_PATH, INCREMENTAL_CACHE_FILE)
+
+DEFAULT_TTL = 7*24*3600 # in seconds
+
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Probe:
+    """
+    Result of checking whether a product page changed since its last parsing, with
+    the page the check fetched, if any, for the engine to parse it without fetching it again
+    """
+    unchanged: bool
+    record: dict = None
+    validators: dict = field(default_factory = dict)
+    page: Any = None
+
+def content_hash(body: bytes) -> str:
+    """Hash of a page body, to detect changes when the server sends no validators"""
+    return hashlib.sha256(body).hexdigest()
+
+class IncrementalCache:
+    """
+    Persistent cache of the product records of previous runs, keyed by `Product.href`, with
+    the HTTP validators (`ETag`, `Last-Modified`) or the content hash of their product page.
+    Product pages are first checked with a cheap conditional request, and only the ones
+    that changed, or whose record is older than the TTL, need to be fully parsed again.
+
+    The engines send the conditional requests, through their own fetch path (page cache,
+    retries, rate limits, mirrors), with the `request_headers` of each page, and `check`
+    their response, whose page they parse if it changed, i.e., each page is fetched once
+    """
+    def __init__(self, path: str = None, *, ttl: float = DEFAULT_TTL):
+        """
+        Parameters
+        ----------
+        path: str, optional
+            Path of the cache file (a `CheckpointJournal`)
+        ttl: int or float, optional
+            Seconds after which a record is parsed again, even if its page did not
+            change, e.g., to catch changes in the (JavaScript-rendered) rating
+        """
+        path = path or INCREMENTAL_CACHE_FP
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        self.ttl = ttl
+        self.journal = CheckpointJournal(path, fsync = False)
+        self.n_reused = 0
+        # workers probe and store concurrently
+        self._lock = threading.Lock()
+
+    def request_headers(self, href: str) -> tuple[dict | None, dict]:
+        """
+        Returns the cached entry of `href`, unless it expired, and the headers of the
+        conditional request for its page, i.e., with the stored validators, if any
+        """
+        with self._lock:
+            entry = self.journal.get(href)
+
+        headers = {}
+        if entry is not None:
+            if time.time() - entry['parsed_at'] > self.ttl:
+                logger.debug(f'Cached record of {href!r} expired')
+                entry = None
+            else:
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+        return entry, headers
+
+    def check(
+        self,
+        href: str,
+        entry: dict | None,
+        status_code: int,
+        headers: Mapping = None,
+        html: str = None,
+        page: Any = None
+    ) -> Probe:
+        """
+        Checks whether the page of `href` changed since its cached `entry` was parsed, from
+        the response to the conditional request of `self.request_headers`: it did not if the
+        response is a 304, or if its `html`, if read (e.g., unlike HEAD responses), has the
+        cached content hash. `page` is the page the engine fetched, if any, for it to parse
+        """
+        headers = headers or {}
+        validators = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_hash': content_hash(html.encode('utf-8')) if html is not None else None,
+        }
+        if entry is not None and (
+            status_code == 304 or
+            (validators['content_hash'] and validators['content_hash'] == entry.get('content_hash'))
+        ):
+            with self._lock:
+                self.n_reused += 1
+            return Probe(unchanged = True, record = entry['record'], validators = validators)
+
+        return Probe(unchanged = False, validators = validators, page = page)
+
+    def store(self, href: str, record: dict, probe: Probe) -> None:
+        """Caches the freshly parsed `record` of `href`, with the validators of its `probe`"""
+        entry = {'record': record, 'parsed_at': time.time(), **probe.validators}
+        with self._lock:
+            self.journal.append(href, entry)
+
+    def close(self) -> None:
+        """Compacts the cache file, dropping the outdated records"""
+        self.journal.compact()
@@ -0,0 +1,284 @@
+import logging
+import os
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from contextlib import contextmanager
+from typing import Iterator
+
+
+# states of a job
+PENDING = 'pending'
+IN_PROGRESS = 'in_progress'
+DONE = 'done'
+FAILED = 'failed'
+
+# seconds a worker owns a claimed job, after which another worker may take it over
+DEFAULT_LEASE_TTL = 5*60
+
+# seconds a connection waits for another process to release the database lock
+_BUSY_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    href TEXT,
+    name TEXT,
+    state TEXT NOT NULL,
+    owner TEXT,
+    lease_expires_at REAL,
+    n_attempts INTEGER NOT NULL DEFAULT 0,
+    record TEXT,
+    error TEXT,
+    done_seq INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS memberships (
+    key TEXT NOT NULL,
+    category TEXT NOT NULL,
+    PRIMARY KEY (key, category)
+);
+"""
+
+# jobs a worker may claim: new, failed, or whose owner let the lease expire, e.g., it crashed
+_CLAIMABLE = f"(state IN ('{PENDING}', '{FAILED}') OR (state = '{IN_PROGRESS}' AND lease_expires_at < ?))"
+# jobs a worker may take over without listing them: new, or whose lease expired. failed ones are retried when listed
+_ABANDONED = f"(state = '{PENDING}' OR (state = '{IN_PROGRESS}' AND lease_expires_at < ?))"
+
+
+logger = logging.getLogger(__name__)
+
+class JobQueue:
+    """
+    Persistent queue of the products to parse, keyed by `Product.href`, in a SQLite
+    database that several worker processes can share. Each job is pending, in progress,
+    done (with the product record) or failed, and workers claim jobs atomically, with
+    a lease, so a job is never parsed twice at once, and the jobs of a crashed worker
+    are taken over once their lease expires
+    """
+    def __init__(self, path: str, *, lease_ttl: float = DEFAULT_LEASE_TTL, owner: str = None):
+        """
+        Parameters
+        ----------
+        path: str
+            Path of the SQLite database, which is created if missing
+        lease_ttl: int or float, optional
+            Seconds a claimed job belongs to this worker. It should be longer
+            than parsing a product takes, including its retries
+        owner: str, optional
+            Identifier of this worker. default: unique per process
+        """
+        self.path = path
+        self.lease_ttl = lease_ttl
+        self.owner = owner or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+        # the workers of a `DriverPool` share the connection
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """Opens the database lazily, so that a queue is only created if used"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                self.path, timeout = _BUSY_TIMEOUT, check_same_thread = False, isolation_level = None
+            )
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Write transaction, which takes the database lock upfront, so that claims are atomic across processes"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, params).fetchall()
+
+    def count(self, state: str = DONE) -> int:
+        """Number of jobs in the given state"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return 0
+        return self._query('SELECT COUNT(*) FROM jobs WHERE state = ?', (state,))[0][0]
+
+    def keys(self, *states: str) -> list[str]:
+        """Keys of the jobs in any of the given states"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return []
+        placeholders = ', '.join('?'*len(states))
+        return [key for key, in self._query(f'SELECT key FROM jobs WHERE state IN ({placeholders})', states)]
+
+    def n_leased_by_others(self) -> int:
+        """Number of jobs other workers are processing, i.e., whose lease did not expire yet"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return 0
+        return self._query(
+            'SELECT COUNT(*) FROM jobs WHERE state = ? AND owner != ? AND lease_expires_at >= ?',
+            (IN_PROGRESS, self.owner, time.time())
+        )[0][0]
+
+    def __len__(self) -> int:
+        """Number of done jobs"""
+        return self.count(DONE)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether the job of `key` is done"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return False
+        return bool(self._query('SELECT 1 FROM jobs WHERE key = ? AND state = ?', (key, DONE)))
+
+    def claim(self, key: str, href: str = None, name: str = None) -> bool:
+        """
+        Adds the job of `key` as pending, if new, and claims it for this worker,
+        unless it is done, or another worker holds its lease
+
+        Returns
+        -------
+        claimed: bool
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO jobs (key, href, name, state) VALUES (?, ?, ?, ?)',
+                (key, href, name, PENDING)
+            )
+            cursor = conn.execute(
+                f'UPDATE jobs SET state = ?, owner = ?, lease_expires_at = ?, n_attempts = n_attempts + 1 '
+                f'WHERE key = ? AND {_CLAIMABLE}',
+                (IN_PROGRESS, self.owner, now + self.lease_ttl, key, now)
+            )
+            return cursor.rowcount == 1
+
+    def claim_next(self) -> tuple[str, str, str] | None:
+        """
+        Claims any abandoned job, i.e., pending, or whose lease expired, e.g., because
+        the worker that claimed it crashed, for this worker
+
+        Returns
+        -------
+        key, href, name: tuple[str, str, str]
+            The claimed job, or None if there is none
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                f'SELECT key, href, name FROM jobs WHERE {_ABANDONED} ORDER BY n_attempts LIMIT 1', (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                'UPDATE jobs SET state = ?, owner = ?, lease_expires_at = ?, n_attempts = n_attempts + 1 WHERE key = ?',
+                (IN_PROGRESS, self.owner, now + self.lease_ttl, row[0])
+            )
+            return row
+
+    def complete(self, key: str, record: dict) -> bool:
+        """
+        Stores the `record` of a job claimed by this worker, and marks it as done
+
+        Returns
+        -------
+        completed: bool
+            False if this worker lost the job, i.e., its lease expired and
+            another worker took it over, in which case the record is dropped
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET state = ?, record = ?, error = NULL, lease_expires_at = NULL, '
+                'done_seq = (SELECT COALESCE(MAX(done_seq), 0) + 1 FROM jobs) '
+                'WHERE key = ? AND state = ? AND owner = ?',
+                (DONE, json.dumps(record), key, IN_PROGRESS, self.owner)
+            )
+        if cursor.rowcount != 1:
+            logger.warning(f'Dropping the record of {key!r}, as its lease expired and another worker took it')
+            return False
+        return True
+
+    def renew(self, keys: list[str]) -> int:
+        """
+        Extends the leases of the given jobs claimed by this worker, e.g., whose records wait
+        for the rest of a batch, so that no other worker takes them over meanwhile
+
+        Returns
+        -------
+        n_renewed: int
+        """
+        lease_expires_at = time.time() + self.lease_ttl
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                'UPDATE jobs SET lease_expires_at = ? WHERE key = ? AND state = ? AND owner = ?',
+                [(lease_expires_at, key, IN_PROGRESS, self.owner) for key in keys]
+            )
+        return cursor.rowcount
+
+    def fail(self, key: str, error: str) -> None:
+        """Marks a job claimed by this worker as failed, which any worker may claim again"""
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, owner = NULL, lease_expires_at = NULL '
+                'WHERE key = ? AND state = ? AND owner = ?',
+                (FAILED, error, key, IN_PROGRESS, self.owner)
+            )
+
+    def release(self) -> int:
+        """
+        Gives back the jobs this worker claimed but did not finish, e.g., when it is
+        interrupted, so that any worker can claim them right away
+
+        Returns
+        -------
+        n_released: int
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET state = ?, owner = NULL, lease_expires_at = NULL WHERE state = ? AND owner = ?',
+                (PENDING, IN_PROGRESS, self.owner)
+            )
+        return cursor.rowcount
+
+    def add_memberships(self, memberships: list[tuple[str, str]]) -> None:
+        """Records the categories each job was listed in, as `(key, category)` pairs"""
+        with self._transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO memberships (key, category) VALUES (?, ?)', memberships)
+
+    def memberships(self) -> dict[str, list[str]]:
+        """The keys of the jobs listed in each category, by category"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return {}
+        memberships = {}
+        for key, category in self._query('SELECT key, category FROM memberships ORDER BY category, key'):
+            memberships.setdefault(category, []).append(key)
+        return memberships
+
+    def records(self) -> Iterator[tuple[str, dict]]:
+        """Yields the `(key, record)` pairs of the done jobs, in the order they were done"""
+        if self._conn is None and not os.path.isfile(self.path):
+            return
+        for key, record in self._query('SELECT key, record FROM jobs WHERE state = ? ORDER BY done_seq', (DONE,)):
+            yield key, json.loads(record)
+
+    def close(self) -> None:
+        """Closes the database, if open"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def remove(self) -> None:
+        """Deletes the database"""
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.isfile(self.path + suffix):
+                os.remove(self.path + suffix)
@@ -0,0 +1,211 @@
+import logging
+import functools
+import json
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+# metric names, prefixed by `PREFIX` when exported
+STAGE_SECONDS = 'stage_seconds'
+PAGE_BYTES = 'page_bytes'
+RETRIES = 'retries_total'
+TIMEOUTS = 'timeouts_total'
+RETRIES_EXHAUSTED = 'retries_exhausted_total'
+RETRY_BUDGET_EXHAUSTED = 'retry_budget_exhausted_total'
+FATAL_ERRORS = 'fatal_errors_total'
+CIRCUIT_OPENS = 'circuit_opens_total'
+LISTING_RECORDS = 'listing_records_total'
+DUPLICATE_PRODUCTS = 'duplicate_products_total'
+
+PREFIX = 'boots_scraper'
+
+# upper bounds of the histogram buckets, by metric name
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+BYTES_BUCKETS = tuple(2**i*1024 for i in range(4, 14)) # 16 KB to 8 MB
+BUCKETS = {STAGE_SECONDS: SECONDS_BUCKETS, PAGE_BYTES: BYTES_BUCKETS}
+
+METRICS_FORMATS = ('json', 'prometheus')
+
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    """
+    Distribution of the observed values in fixed buckets, as Prometheus histograms,
+    so that it takes constant memory regardless of the number of values
+    """
+    def __init__(self, buckets: tuple[float, ...] = SECONDS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # the last count is the one of the values above the last bucket
+        self.bucket_counts = [0]*(len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+        self.max = float('nan')
+
+    def observe(self, value: float) -> None:
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.bucket_counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.count == 1 else max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        return self.sum/self.count if self.count else float('nan')
+
+    def quantile(self, q: float) -> float:
+        """Estimates the `q` quantile, interpolating within its bucket, as Prometheus `histogram_quantile`"""
+        if not self.count:
+            return float('nan')
+
+        rank = q*self.count
+        cumulative = 0
+        for index, n in enumerate(self.bucket_counts):
+            if cumulative + n >= rank and n:
+                lower = self.buckets[index - 1] if index else 0.
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower)*(rank - cumulative)/n, self.max)
+            cumulative += n
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.mean,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': self.max,
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'], self.bucket_counts)),
+        }
+
+def _label_str(labels: tuple[tuple[str, str], ...]) -> str:
+    """Prometheus label set, e.g., `{stage="navigation"}`, or an empty string if there are no labels"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+class Metrics:
+    """
+    Thread-safe registry of the run metrics, i.e., histograms, e.g., of the latency of each
+    stage (driver start, navigation, rating wait, etc.), and counters, e.g., of retries
+    and timeouts, which is printed as a summary, and exported as JSON or Prometheus text
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}    # by (name, labels)
+        self.counters = {}      # by (name, labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Adds `value` to the histogram `name` with the given labels"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(BUCKETS.get(name, SECONDS_BUCKETS))
+            histogram.observe(value)
+
+    def count(self, name: str, n: int = 1, **labels: str) -> None:
+        """Adds `n` to the counter `name` with the given labels"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Context manager that observes the seconds its block takes, even if it raises, in `STAGE_SECONDS`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - start, stage = stage)
+
+    def timed(self, stage: str) -> Callable:
+        """Decorator that times the decorated function as the stage `stage`, as `self.timer`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), **histogram.as_dict()}
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), indent = 2)
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            # the samples of a metric are contiguous, as they are sorted by name
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                name = f'{PREFIX}_{name}'
+                if f'# TYPE {name} histogram' not in lines:
+                    lines.append(f'# TYPE {name} histogram')
+                cumulative = 0
+                for bound, n in zip([*map(str, histogram.buckets), '+Inf'], histogram.bucket_counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{_label_str(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_label_str(labels)} {histogram.sum}')
+                lines.append(f'{name}_count{_label_str(labels)} {histogram.count}')
+
+            for (name, labels), value in sorted(self.counters.items()):
+                name = f'{PREFIX}_{name}'
+                if f'# TYPE {name} counter' not in lines:
+                    lines.append(f'# TYPE {name} counter')
+                lines.append(f'{name}{_label_str(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        """Human readable summary, with the latency of each stage, and the counters"""
+        lines = []
+        with self._lock:
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                label = ','.join(value for _, value in labels) or name
+                if name == STAGE_SECONDS:
+                    lines.append(
+                        f'{label:<24} n={histogram.count:<6} mean={histogram.mean:.3f}s '
+                        f'p50={histogram.quantile(0.5):.3f}s p95={histogram.quantile(0.95):.3f}s '
+                        f'max={histogram.max:.3f}s total={histogram.sum:.1f}s'
+                    )
+                else:
+                    lines.append(
+                        f'{label:<24} n={histogram.count:<6} mean={histogram.mean/1024:.0f}KB '
+                        f'p95={histogram.quantile(0.95)/1024:.0f}KB max={histogram.max/1024:.0f}KB'
+                    )
+            for (name, labels), value in sorted(self.counters.items()):
+                label = ','.join(value for _, value in labels)
+                lines.append(f'{name}{f" ({label})" if label else ""}: {value}')
+        return '\n'.join(lines)
+
+    def export(self, path: str, format: str = 'json') -> None:
+        """Writes the metrics to `path`, in one of `METRICS_FORMATS`"""
+        if format not in METRICS_FORMATS:
+            raise ValueError(f'Unknown metrics format {format!r}. Choose one of {METRICS_FORMATS}')
+        with open(path, 'w') as f_out:
+            f_out.write(self.to_json() if format == 'json' else self.to_prometheus())
+        logger.info(f'Wrote the run metrics to {path!r}')
+
+# metrics of the run, which the instrumented stages record
+METRICS = Metrics()
@@ -0,0 +1,311 @@
+import logging
+import os
+import re
+import csv
+import json
+
+from datetime import datetime, timezone
+
+from _stats import PriceStats, to_number
+
+# columns of the tabular formats, i.e., the `Product.as_dict()` keys and the run timestamp, and their types
+OUTPUT_COLUMNS = {
+    'Title': str,
+    'Price': float,
+    'Price_Unit': str,
+    'Short_Desc': str,
+    'Rating': float,
+    'Page_Size_KB': int,
+    'Page_Transfer_KB': int,
+    'Run_Timestamp': datetime,
+}
+# records buffered by the columnar writers before they write them as a batch (a Parquet row group)
+COLUMNAR_BATCH_SIZE = 1024
+# partition folders of the history files, e.g., `run_date=2024-01-31`, as hive partitions
+HISTORY_PARTITION = 'run_date'
+
+logger = logging.getLogger(__name__)
+
+class ProductsWriter:
+    """
+    Base class of the output writers, which stream the product records to a file as they
+    come (flushing each one, so the file is usable while the run is going), and compute
+    the output summary on the fly, so the records are never held in memory
+    """
+    def __init__(self, fp: str, run_timestamp: datetime = None):
+        """
+        Parameters
+        ----------
+        fp: str
+            Path of the output file
+        run_timestamp: datetime, optional
+            Time of the run, which the tabular formats add to each record. default: now (UTC)
+        """
+        self.fp = fp
+        self.run_timestamp = run_timestamp or datetime.now(timezone.utc)
+        self.n_products = 0
+        self.price_stats = PriceStats()
+        self._file = self._open(fp)
+
+    def _open(self, fp: str):
+        return open(fp, 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, record: dict) -> None:
+        raise NotImplementedError
+
+    def _write_summary(self, summary: dict) -> None:
+        raise NotImplementedError
+
+    def write(self, record: dict) -> None:
+        """Writes a product record, i.e., a `Product.as_dict()` output"""
+        self._write(record)
+        self._file.flush()
+
+        self.n_products += 1
+        self.price_stats.add(record.get('Price'))
+
+    def summary(self) -> dict:
+        """The summary statistics of the products written so far"""
+        return self.price_stats.summary()
+
+    def close(self) -> None:
+        """Writes the summary and closes the file"""
+        if self._file.closed:
+            return
+        self._write_summary(self.summary())
+        self._file.close()
+
+class JsonProductsWriter(ProductsWriter):
+    """
+    Writes a JSON object with the product records in `Products` and the summary statistics,
+    byte-identical to a single `json.dump`, but streaming the `Products` array
+    """
+    def __init__(self, fp: str, run_timestamp: datetime = None):
+        super().__init__(fp, run_timestamp)
+        self._file.write('{"Products": [')
+
+    def _write(self, record: dict) -> None:
+        if self.n_products:
+            self._file.write(', ')
+        self._file.write(json.dumps(record))
+
+    def _write_summary(self, summary: dict) -> None:
+        self._file.write(']')
+        for key, value in summary.items():
+            self._file.write(f', {json.dumps(key)}: {json.dumps(value)}')
+        self._file.write('}')
+
+class NdjsonProductsWriter(ProductsWriter):
+    """
+    Writes one product record per line (NDJSON), so that every complete line can be read
+    while the run is going. The summary statistics are written to a `<name>_summary.json`
+    file next to it
+    """
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + '\n')
+
+    def _write_summary(self, summary: dict) -> None:
+        _write_summary_file(self.fp, summary)
+
+class CsvProductsWriter(ProductsWriter):
+    """
+    Writes the product records as CSV rows of `OUTPUT_COLUMNS`, with plain numbers, e.g.,
+    ratings as floats, and missing values as empty fields. The summary statistics are
+    written to a `<name>_summary.json` file next to it, as `NdjsonProductsWriter` does
+    """
+    def __init__(self, fp: str, run_timestamp: datetime = None):
+        super().__init__(fp, run_timestamp)
+        self._csv = csv.writer(self._file)
+        self._csv.writerow(OUTPUT_COLUMNS)
+
+    def _open(self, fp: str):
+        return open(fp, 'w', newline = '', encoding = 'utf-8')
+
+    def _write(self, record: dict) -> None:
+        row = to_typed_row(record, self.run_timestamp)
+        row['Run_Timestamp'] = row['Run_Timestamp'].isoformat()
+        self._csv.writerow('' if value is None else value for value in row.values())
+
+    def _write_summary(self, summary: dict) -> None:
+        _write_summary_file(self.fp, summary)
+
+class ColumnarProductsWriter(ProductsWriter):
+    """
+    Base class of the columnar writers, i.e., Parquet and Arrow IPC, which need `pyarrow`.
+    The records are typed as `OUTPUT_COLUMNS`, and written in batches of `COLUMNAR_BATCH_SIZE`,
+    so, unlike the rest of formats, the file is only complete once the writer is closed.
+    The summary statistics are written to a `<name>_summary.json` file next to it
+    """
+    def __init__(self, fp: str, run_timestamp: datetime = None):
+        self._pa = import_pyarrow()
+        self.schema = arrow_schema()
+        self._batch = []
+        super().__init__(fp, run_timestamp)
+        self._writer = self._new_writer(self._file)
+
+    def _open(self, fp: str):
+        return open(fp, 'wb')
+
+    def _new_writer(self, sink):
+        raise NotImplementedError
+
+    def _write(self, record: dict) -> None:
+        self._batch.append(to_typed_row(record, self.run_timestamp))
+        if len(self._batch) >= COLUMNAR_BATCH_SIZE:
+            self._write_batch()
+
+    def _write_batch(self) -> None:
+        if self._batch:
+            self._writer.write_batch(self._pa.RecordBatch.from_pylist(self._batch, schema = self.schema))
+            self._batch = []
+
+    def _write_summary(self, summary: dict) -> None:
+        self._write_batch()
+        self._writer.close()
+        _write_summary_file(self.fp, summary)
+
+class ParquetProductsWriter(ColumnarProductsWriter):
+    """Writes the product records as a Parquet file, with a row group per batch"""
+    def _new_writer(self, sink):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(sink, self.schema)
+
+class ArrowProductsWriter(ColumnarProductsWriter):
+    """
+    Writes the product records as an Arrow IPC (Feather v2) file, which can be
+    memory-mapped, e.g., with `pyarrow.ipc.open_file(pyarrow.memory_map(fp))`
+    """
+    def _new_writer(self, sink):
+        return self._pa.ipc.new_file(sink, self.schema)
+
+def summary_fp(fp: str) -> str:
+    """Path of the `<name>_summary.json` file of the output file `fp`, for the formats that write one"""
+    return f'{os.path.splitext(fp)[0]}_summary.json'
+
+def _write_summary_file(fp: str, summary: dict) -> None:
+    with open(summary_fp(fp), 'w') as f_out:
+        json.dump(summary, f_out)
+
+def to_typed_row(record: dict, run_timestamp: datetime) -> dict:
+    """The product record, i.e., a `Product.as_dict()` output, as a row of `OUTPUT_COLUMNS`"""
+    row = {}
+    for column, column_type in OUTPUT_COLUMNS.items():
+        value = record.get(column)
+        if column_type is float:
+            # e.g., a rating string, or None if it is missing (including NaN), or not a number
+            value = to_number(value)
+        elif column_type is int and value is not None:
+            value = int(value)
+        row[column] = value
+    row['Run_Timestamp'] = run_timestamp
+    return row
+
+def import_pyarrow():
+    """Imports `pyarrow`, which only the columnar formats need, hence it is optional"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('The `parquet` and `arrow` output formats need `pyarrow`, e.g., `pip install pyarrow`')
+    return pyarrow
+
+def arrow_schema():
+    """The Arrow schema of `OUTPUT_COLUMNS`"""
+    pa = import_pyarrow()
+    types = {str: pa.string(), float: pa.float64(), int: pa.int64(), datetime: pa.timestamp('us', tz = 'UTC')}
+    return pa.schema([(column, types[column_type]) for column, column_type in OUTPUT_COLUMNS.items()])
+
+OUTPUT_WRITERS = {
+    'json': JsonProductsWriter,
+    'ndjson': NdjsonProductsWriter,
+    'csv': CsvProductsWriter,
+    'parquet': ParquetProductsWriter,
+    'arrow': ArrowProductsWriter,
+}
+OUTPUT_EXTENSIONS = {
+    'json': '.json',
+    'ndjson': '.ndjson',
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+def open_products_writer(fp: str, output_format: str = 'json', run_timestamp: datetime = None) -> ProductsWriter:
+    """Returns the writer of the given output format, i.e., one of `OUTPUT_WRITERS`"""
+    try:
+        writer_class = OUTPUT_WRITERS[output_format]
+    except KeyError:
+        raise ValueError(f'Unknown output format {output_format!r}. Choose one of {list(OUTPUT_WRITERS)}')
+    return writer_class(fp, run_timestamp)
+
+def history_fp(fp: str, run_timestamp: datetime) -> str:
+    """
+    Path of the output file `fp` of the run at `run_timestamp` in its history, i.e., the
+    folder named as `fp` (without extension), partitioned by run date. For instance,
+    `output/sleep_products.parquet` is written to
+    `output/sleep_products/run_date=2024-01-31/sleep_products_20240131T080000.parquet`
+    """
+    root, extension = os.path.splitext(fp)
+    name = os.path.basename(root)
+    return os.path.join(
+        root,
+        f'{HISTORY_PARTITION}={run_timestamp:%Y-%m-%d}',
+        f'{name}_{run_timestamp:%Y%m%dT%H%M%S}{extension}'
+    )
+
+def in_progress_fp(fp: str, owner: str = None) -> str:
+    """
+    Path where the output file `fp` is written while its run is going, i.e., prefixed
+    by an underscore, so that `load_history` ignores it until `move_output` commits it,
+    and tagged with the `owner` process, if any, so that the processes that share a job
+    queue do not overwrite each other's file
+    """
+    name = os.path.basename(fp)
+    if owner is not None:
+        root, extension = os.path.splitext(name)
+        tag = re.sub(r'[^\w-]', '-', owner)
+        name = f'{root}.{tag}{extension}'
+    return os.path.join(os.path.dirname(fp), f'_{name}')
+
+def move_output(src_fp: str, dst_fp: str) -> None:
+    """Moves the output file `src_fp`, and its summary file, if any, to `dst_fp`"""
+    os.replace(src_fp, dst_fp)
+    if os.path.exists(summary_fp(src_fp)):
+        os.replace(summary_fp(src_fp), summary_fp(dst_fp))
+
+def remove_output(fp: str) -> None:
+    """Removes the output file `fp`, and its summary file, if any"""
+    for output_fp in (fp, summary_fp(fp)):
+        if os.path.exists(output_fp):
+            os.remove(output_fp)
+
+def load_history(path: str, output_format: str = 'parquet'):
+    """
+    Loads the output history at `path`, i.e., the folder of the partitioned runs of a tabular
+    output format, as a `pyarrow.dataset.Dataset` with a `run_date` partition column. Filtering
+    on it, e.g., `dataset.to_table(filter = pyarrow.dataset.field('run_date') >= '2024-01-01')`,
+    only reads the matching runs, and the `arrow` files are memory-mapped
+    """
+    if output_format not in ('csv', 'parquet', 'arrow'):
+        raise ValueError(f'The history of the {output_format!r} output format cannot be loaded as a dataset')
+    import_pyarrow()
+    import glob
+    import pyarrow.csv
+    import pyarrow.dataset as ds
+
+    if output_format == 'csv':
+        # the CSV fields have no types, so they are read as those of the columnar formats
+        column_types = {field.name: field.type for field in arrow_schema()}
+        file_format = ds.CsvFileFormat(convert_options = pyarrow.csv.ConvertOptions(column_types = column_types))
+    else:
+        file_format = 'ipc' if output_format == 'arrow' else output_format
+
+    # only the output files, i.e., neither their summary files nor those of the runs in progress
+    fps = sorted(glob.glob(os.path.join(path, f'{HISTORY_PARTITION}=*', f'[!_]*{OUTPUT_EXTENSIONS[output_format]}')))
+    return ds.dataset(fps, format = file_format, partitioning = 'hive', partition_base_dir = path)
@@ -0,0 +1,208 @@
+import logging
+import queue
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+# sentinel that signals the end of the work (or result) stream
+_STOP = object()
+
+# seconds between checks of the pool `closed` flag while blocked on a queue
+_POLL_INTERVAL = 0.5
+
+def _put(q: queue.Queue, item: Any, closed: threading.Event) -> bool:
+    """Blocking put that gives up (returning False) if `closed` is set meanwhile"""
+    while not closed.is_set():
+        try:
+            q.put(item, timeout = _POLL_INTERVAL)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+class DriverPool:
+    """
+    Pool of sessions (e.g., `ChromeDriverWrapper` instances), each one
+    owned by a worker thread, that concurrently applies a function to the items
+    pulled from a bounded work queue
+    """
+    def __init__(self, session_factory: Callable[[], Any], n_workers: int, *, queue_size: int = None):
+        """
+        Parameters
+        ----------
+        session_factory: function
+            Function with no arguments that returns a new session, e.g.,
+            a `ChromeDriverWrapper` instance or a `requests.Session`. Sessions
+            are closed calling their `quit` method, or `close` if they have none
+        n_workers: int
+            Number of sessions, i.e., of concurrent workers
+        queue_size: int, optional
+            Maximum number of items waiting in the work queue. default: twice
+            the number of workers, which keeps every worker busy without
+            materializing the whole input
+        """
+        if n_workers < 1:
+            raise ValueError(f'The number of workers must be positive, got {n_workers}')
+
+        self._session_factory = session_factory
+        self.n_workers = n_workers
+        self._queue_size = queue_size or 2*n_workers
+        self._closed = threading.Event()
+        self.sessions = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self) -> None:
+        """Starts the sessions concurrently, as starting a browser is slow"""
+        if self.sessions:
+            return
+
+        logger.debug(f'Starting {self.n_workers} driver sessions')
+        with ThreadPoolExecutor(self.n_workers) as executor:
+            futures = [executor.submit(self._session_factory) for _ in range(self.n_workers)]
+
+        errors = [future.exception() for future in futures if future.exception()]
+        self.sessions = [future.result() for future in futures if not future.exception()]
+        if errors:
+            # do not leak the sessions that did start
+            self.close()
+            raise errors[0]
+
+    def close(self) -> None:
+        """Stops the workers, if running, and quits all sessions"""
+        self._closed.set()
+        for session in self.sessions:
+            # WebDriver sessions quit, whereas HTTP sessions close
+            close_session = getattr(session, 'quit', None) or session.close
+            try:
+                close_session()
+            except Exception as e:
+                logger.warning(f'Unable to close session due to {type(e).__name__}: {e}')
+        self.sessions = []
+
+    def _feed(self, items: Iterable, work_queue: queue.Queue) -> None:
+        """Feeder thread target, which moves `items` into the bounded work queue"""
+        try:
+            for item in items:
+                if not _put(work_queue, item, self._closed):
+                    return
+        except Exception as e:
+            # surface errors from lazy iterables in the consumer thread
+            self._feed_error = e
+        finally:
+            for _ in self.sessions:
+                _put(work_queue, _STOP, self._closed)
+
+    def _work(self, session: Any, func: Callable, work_queue: queue.Queue, result_queue: queue.Queue) -> None:
+        """Worker thread target, which applies `func` to the queued items using its own `session`"""
+        while not self._closed.is_set():
+            try:
+                item = work_queue.get(timeout = _POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _STOP:
+                break
+
+            try:
+                result = func(session, item)
+            except Exception as e:
+                result_queue.put((item, None, e))
+            else:
+                result_queue.put((item, result, None))
+        result_queue.put(_STOP)
+
+    def imap_unordered(self, func: Callable[[Any, Any], Any], items: Iterable) -> Iterator[tuple[Any, Any, Exception]]:
+        """
+        Applies `func(session, item)` to every item in `items`, distributing
+        them across the pool sessions, and yields the results as they finish
+
+        Parameters
+        ----------
+        func: function
+            Function that takes a session and an item
+        items: iterable
+            The items to process. It is consumed lazily
+
+        Yields
+        ------
+        item, result, error: tuple
+            The processed item, the value returned by `func` (None if it failed),
+            and the raised exception (None if it succeeded)
+        """
+        self.start()
+        self._closed.clear()
+        self._feed_error = None
+
+        work_queue = queue.Queue(maxsize = self._queue_size)
+        result_queue = queue.Queue()
+
+        threads = [threading.Thread(target = self._feed, args = (items, work_queue), daemon = True)]
+        threads += [
+            threading.Thread(target = self._work, args = (session, func, work_queue, result_queue), daemon = True)
+            for session in self.sessions
+        ]
+        for thread in threads:
+            thread.start()
+
+        n_running = len(self.sessions)
+        while n_running:
+            result = result_queue.get()
+            if result is _STOP:
+                n_running -= 1
+            else:
+                yield result
+
+        if self._feed_error is not None:
+            raise self._feed_error
+
+def prefetch(items: Iterable, buffer_size: int = 1) -> Iterator:
+    """
+    Iterates over `items` in a background thread, which keeps up to `buffer_size`
+    items ready in advance, so that producing the next items overlaps with
+    consuming the current ones
+
+    Parameters
+    ----------
+    items: iterable
+        The items to prefetch, e.g., a generator of slow-to-fetch pages
+    buffer_size: int, optional
+        Maximum number of items fetched in advance. default: 1
+
+    Yields
+    ------
+    item:
+        The items, in the same order
+    """
+    buffer = queue.Queue(maxsize = buffer_size)
+    closed = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for item in items:
+                if not _put(buffer, item, closed):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(buffer, _STOP, closed)
+
+    thread = threading.Thread(target = produce, daemon = True)
+    thread.start()
+    try:
+        while (item := buffer.get()) is not _STOP:
+            yield item
+    finally:
+        # let the producer stop if the consumer does not exhaust the items
+        closed.set()
+
+    if errors:
+        raise errors[0]
@@ -14,6 +14,11 @@ class Product:
     description: str = None
     rating: float = None
     page_size: int = None
+    transfer_size: int = None
+    # the Bazaarvoice ID of the product, to read its rating in bulk, if any
+    product_id: str = None
+    # the URL of the category (listing) the product was found in
+    category: str = None
 
     def as_dict(self):
         """Represents the product attributes as a dict"""
@@ -23,5 +28,6 @@ class Product:
             'Price_Unit': self.price_unit,
             'Short_Desc': self.description,
             'Rating': self.rating,
-            'Page_Size_KB': self.page_size
+            'Page_Size_KB': self.page_size,
+            'Page_Transfer_KB': self.transfer_size
         }
\ No newline at end of file
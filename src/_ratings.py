@@ -0,0 +1,90 @@
+import logging
+import math
+import threading
+
+import requests
+from urllib.parse import urlencode
+
+from _metrics import METRICS
+from _http import HTTP_RETRY, HTTP_TIMEOUT, new_http_session
+
+
+# statistics endpoint of the Bazaarvoice Conversations API, i.e., the reviews backend the rating widget calls
+RATINGS_API_URL = 'https://api.bazaarvoice.com/data/statistics.json'
+RATINGS_API_VERSION = '5.4'
+# the API filters up to 100 product IDs per request
+RATINGS_BATCH_SIZE = 100
+
+
+logger = logging.getLogger(__name__)
+
+class RatingsProvider:
+    """
+    Reads the product ratings in bulk from the Bazaarvoice statistics API, i.e., the backend
+    the rating widget of the product pages calls, with one request per `batch_size` products,
+    instead of waiting for the widget to render in each product page. Products are identified
+    by their Bazaarvoice ID, i.e., the `data-bv-product-id` of their rating widget placeholder
+    """
+    def __init__(self, passkey: str, *, api_url: str = None, batch_size: int = RATINGS_BATCH_SIZE):
+        """
+        Parameters
+        ----------
+        passkey: str
+            The API key of the site, i.e., the one its rating widget uses
+        api_url: str, optional
+            The statistics endpoint, e.g., a stub server for the tests. default: `RATINGS_API_URL`
+        batch_size: int, optional
+            Maximum number of products per request
+        """
+        self.passkey = passkey
+        self.api_url = api_url or RATINGS_API_URL
+        self.batch_size = batch_size
+        self.session = new_http_session(pool_size = 1)
+        self._lock = threading.Lock()
+
+    @HTTP_RETRY
+    def _get(self, url: str, session: requests.Session = None) -> requests.Response:
+        """Helper method that GETs the given URL, using this provider session by default"""
+        resp = (session or self.session).get(url, timeout = HTTP_TIMEOUT)
+        resp.raise_for_status()
+        return resp
+
+    def _fetch_batch(self, product_ids: list[str]) -> dict[str, float | str]:
+        """Helper method that requests the ratings of up to `self.batch_size` products"""
+        query = urlencode({
+            'apiversion': RATINGS_API_VERSION,
+            'passkey': self.passkey,
+            'stats': 'Reviews',
+            'filter': f'productid:eq:{",".join(product_ids)}',
+            'limit': len(product_ids),
+        })
+        with METRICS.timer('ratings_batch'):
+            data = self._get(f'{self.api_url}?{query}').json()
+        if data.get('HasErrors'):
+            raise ValueError(f'The ratings request failed with the errors {data.get("Errors")}')
+
+        ratings = {}
+        for result in data.get('Results') or []:
+            statistics = result.get('ProductStatistics') or {}
+            reviews = statistics.get('ReviewStatistics') or {}
+            rating = reviews.get('AverageOverallRating')
+            # formatted as the widget renders it, e.g., `'4.5'`
+            ratings[statistics.get('ProductId')] = f'{rating:.1f}' if rating is not None and reviews.get('TotalReviewCount') else math.nan
+        return ratings
+
+    def fetch(self, product_ids: list[str]) -> dict[str, float | str]:
+        """
+        Returns the ratings of the given products, by product ID, as the rating widget renders
+        them, e.g., `'4.5'`, or NaN for the products without reviews (or unknown to the API)
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        ratings = {}
+        with self._lock:
+            for start in range(0, len(product_ids), self.batch_size):
+                batch = product_ids[start:start + self.batch_size]
+                logger.debug(f'Requesting the ratings of {len(batch)} products')
+                ratings.update(self._fetch_batch(batch))
+        return {product_id: ratings.get(product_id, math.nan) for product_id in product_ids}
+
+    def close(self) -> None:
+        self.session.close()
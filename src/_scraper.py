@@ -1,62 +1,139 @@
-  
 import logging
-import os
-import sys
-import json
-import re
-from pandas import to_numeric
+import threading
+
+import urllib3
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    SessionNotCreatedException,
+    NoSuchElementException, 
+    StaleElementReferenceException, 
+    TimeoutException, 
+    WebDriverException
+)
 
-from typing import Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 from _product import Product
-from _decorator import retry
-
-
-RETRY = retry(exceptions = (NoSuchElementException, TimeoutException), backoff = 2)
+from _decorator import RETRY_BUDGET, retry
+from _metrics import METRICS, PAGE_BYTES, TIMEOUTS
+from _html import HtmlElement
+from _browser import BrowserProfile, NetworkStats, PAGE_LOAD_STRATEGIES, DEFAULT_PAGE_LOAD_STRATEGY
+from _base import (
+    BaseScraper, 
+    PRODUCT_ELEMENT_CLASS_NAME,
+    PRODUCT_RATING_CLASS_NAME,
+    RATING_PLACEHOLDER_SELECTOR,
+    RATING_PRODUCT_ID_ATTRIBUTE,
+    PRODUCT_SELECTORS,
+    PageSize,
+    parse_listing_details,
+    parse_listing_elements,
+    parse_product_elements,
+    set_page_size
+)
+from _cache import RENDERED_DOM
+
+if TYPE_CHECKING:
+    import requests
+
+    from _cache import PageCache
+    from _incremental import Probe
+    from _sessions import SessionManager
+
+
+RETRY = retry(exceptions = (NoSuchElementException, TimeoutException), backoff = 2, budget = RETRY_BUDGET)
+
+# errors due to the executor, rather than to the page, e.g., in a `NodePool`
+NODE_ERRORS = (OSError, urllib3.exceptions.HTTPError, InvalidSessionIdException, SessionNotCreatedException)
 
 DOCKER_EXECUTOR_URL = 'http://127.0.0.1:4444'
 
-URL = 'https://www.boots.com/health-pharmacy/medicines-treatments/sleep'
-
-ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-DATA_PATH = os.path.join(ROOT_DIR, 'data')
-LOG_PATH = os.path.join(ROOT_DIR, 'log')
-OUTPUT_PATH = os.path.join(DATA_PATH, 'output')
-TMP_DATA_PATH = os.path.join(DATA_PATH, 'tmp')
+# we wait at most 10s for the remote command executor, probing it every 0.05s at first
+REMOTE_EXECUTOR_TIMEOUT = 10 # in seconds
+READINESS_PROBE_INTERVAL = 0.05 # in seconds
 
-OUTPUT_FILE = 'sleep_products.json'
-OUTPUT_FP = os.path.join(OUTPUT_PATH, OUTPUT_FILE)
+# Chrome DevTools Protocol command, which the Grid forwards to the browser
+CDP_COMMAND = 'executeCdpCommand'
+CDP_COMMAND_URL = '/session/$sessionId/goog/cdp/execute'
 
-FAILED_PRODUCTS_LOG_FILE = 'failed_products_{time}.txt'
-FAILED_PRODUCTS_LOG_FP = os.path.join(LOG_PATH, FAILED_PRODUCTS_LOG_FILE)
+WAIT_POLL_FREQUENCY = 0.1 # in seconds
+RATING_TIMEOUT = 15 # in seconds
 
 ACCEPT_COOKIES_BUTTON_ID = 'onetrust-pc-btn-handler'
 ACCEPT_RECOMMENDED_COOKIES_BUTTON_ID = 'accept-recommended-btn-handler'
 
-PRODUCT_ELEMENT_CLASS_NAME = 'oct-teaser__title-link'
-
-PRODUCT_TITLE_ID = 'estore_product_title'
-PRODUCT_RATING_CLASS_NAME = 'bv_avgRating_component_container'
-PRODUCT_TEXT_CLASS_NAME = 'product_text'
-PRODUCT_PRICE_STR_CLASS_NAME = 'price'
-
-PRICE_STR_PATTERN = re.compile(r'(\D)(\d+\.\d{2})')
-
+# reads the rating of the product page in a single round-trip per poll: `{rating: text}` once the rating element
+# of class `arguments[0]` is displayed, `{rating: null}` if the product has no rating, i.e., the widget loaded
+# into its placeholder `arguments[1]` without one, or there is no placeholder in the fully loaded page, and
+# null while the widget is loading. The placeholder is served empty, so it only has elements once loaded
+_READ_RATING_SCRIPT = """
+const rating = Array.from(document.getElementsByClassName(arguments[0])).find(el => el.getClientRects().length);
+if (rating) return {rating: rating.innerText.trim()};
+const placeholder = document.querySelector(arguments[1]);
+if (placeholder ? placeholder.childElementCount : document.readyState === 'complete') return {rating: null};
+return null;
+"""
+
+# attributes read along with the elements text
+EXTRACTED_ATTRIBUTES = [RATING_PRODUCT_ID_ATTRIBUTE]
+
+# reads the `[text, href, attrs]` of the elements of each `(by, value)` selector in `arguments[0]`,
+# and the page size if `arguments[1]`. `innerText` is the rendered text, as `WebElement.text`, `href`
+# the resolved URL, as `WebElement.get_attribute('href')`, and `attrs` the attributes in `arguments[2]`
+# the element has, e.g., the product ID of the rating widget placeholder. The page size is read from the
+# navigation timing entry, i.e., from the network layer, except for pages written from the page
+# cache, which were not navigated to, and whose (UTF-8) size is measured in the browser
+_EXTRACT_ELEMENTS_SCRIPT = """
+const elements = {};
+for (const [name, [by, value]] of Object.entries(arguments[0])) {
+    let found;
+    if (by === 'id') {
+        found = [document.getElementById(value)].filter(Boolean);
+    } else if (by === 'class name') {
+        found = Array.from(document.getElementsByClassName(value));
+    } else {
+        throw new Error(`Unsupported locator strategy ${by}`);
+    }
+    elements[name] = found.map(el => [
+        el.innerText.trim(),
+        el.hasAttribute('href') ? (el.href || el.getAttribute('href')) : null,
+        Object.fromEntries(arguments[2].filter(attr => el.hasAttribute(attr)).map(attr => [attr, el.getAttribute(attr)]))
+    ]);
+}
+let pageSize = null;
+if (arguments[1]) {
+    const [navigation] = performance.getEntriesByType('navigation');
+    if (navigation && navigation.decodedBodySize) {
+        pageSize = {transfer: navigation.transferSize, decoded: navigation.decodedBodySize};
+    } else {
+        pageSize = {transfer: null, decoded: new Blob([document.documentElement.outerHTML]).size};
+    }
+}
+return {elements: elements, page_size: pageSize};
+"""
+
+# replaces the (blank) page with the given HTML, as if it were served
+_WRITE_DOCUMENT_SCRIPT = 'document.open(); document.write(arguments[0]); document.close();'
 
 logger = logging.getLogger(__name__)
 
-class ScrapingException(Exception):
-    """Custom exception raised when the product parsing process fails"""
-
 class ChromeDriverWrapper:
     """Convenience wrapper around the selenium `ChromeDriver` web driver"""
-    def __init__(self, headless: bool = False, driver_path: str = None):
+    def __init__(
+        self, 
+        headless: bool = False, 
+        driver_path: str = None, 
+        page_load_strategy: str = DEFAULT_PAGE_LOAD_STRATEGY,
+        profile: BrowserProfile = None,
+        network_stats: NetworkStats = None,
+        session_manager: 'SessionManager' = None,
+        remote_executor_url: str = None
+    ):
         """
         Parameters
         ----------
@@ -65,33 +142,74 @@ class ChromeDriverWrapper:
             and within a running docker container.
         driver_path: str, optional
             Path to the webdriver executable
+        page_load_strategy: str, optional
+            When `driver.get` returns, i.e., one of `PAGE_LOAD_STRATEGIES`.
+            `normal` waits for the whole page to load, and `eager` only
+            for the HTML to be parsed. default: eager
+        profile: BrowserProfile, optional
+            Lean profile with the resources the browser skips loading.
+            default: None, i.e., Chrome loads every resource
+        network_stats: NetworkStats, optional
+            Stats where the network usage of the session is added, if
+            the `profile` collects them. default: a new `NetworkStats`
+        session_manager: SessionManager, optional
+            Manager the (warm) WebDriver session is acquired from, and
+            released to on `quit`. default: None, i.e., a new session
+        remote_executor_url: str, optional
+            URL of the selenium Grid executor, if `headless`.
+            default: `DOCKER_EXECUTOR_URL`
         """
-        self._remote_executor_url = DOCKER_EXECUTOR_URL
-        self.driver = self._init_driver(headless, driver_path)
+        if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+            raise ValueError(f'Unknown page load strategy {page_load_strategy!r}. Choose one of {PAGE_LOAD_STRATEGIES}')
+
+        self._remote_executor_url = remote_executor_url or DOCKER_EXECUTOR_URL
+        self._headless = headless
+        self._driver_path = driver_path
+        self._page_load_strategy = page_load_strategy
+        self._profile = profile
+        if profile is not None and profile.collect_stats:
+            self.network_stats = network_stats if network_stats is not None else NetworkStats()
+        else:
+            self.network_stats = None
+
+        self._session_manager = session_manager
+        # pages loaded in the session, so that the manager recycles it after a while
+        self.n_pages = 0
+
+        if session_manager is not None:
+            self.driver = session_manager.acquire(self)
+        else:
+            self.driver = self._start_driver()
     
-    def _wait_for_remote_executor(self):
+    @METRICS.timed('remote_executor_wait')
+    def _wait_for_remote_executor(self, timeout: int | float = REMOTE_EXECUTOR_TIMEOUT):
         """
-        Helper method that waits until the selenium Docker backend is ready.
-        Note the Docker backend must be ran beforehand.
+        Helper method that waits until the selenium Docker backend is ready, probing
+        its `/status` endpoint with increasing intervals, so that a ready backend
+        costs a single request. Note the Docker backend must be ran beforehand.
         """
         import requests
         import time
 
-        # we wait at most 10s for the remote command executor
-        for _ in range(5):
+        deadline = time.monotonic() + timeout
+        interval = READINESS_PROBE_INTERVAL
+        while True:
             try:
-                resp = requests.head(self._remote_executor_url)
+                resp = requests.get(f'{self._remote_executor_url}/status', timeout = 1)
                 resp.raise_for_status()
-            except requests.ConnectionError:
-                logger.debug('Waiting for the command executor to be up and ready.')
-                time.sleep(2)
-            else:
-                break
-        else:
-            raise requests.ConnectionError(
-                '`selenium` Docker command executor is not running. '
-                'Did you ran `make run` or `make docker-run`?'
-            )
+                if resp.json().get('value', {}).get('ready'):
+                    return
+            except (requests.RequestException, ValueError):
+                pass
+
+            if time.monotonic() >= deadline:
+                raise requests.ConnectionError(
+                    '`selenium` Docker command executor is not running. '
+                    'Did you ran `make run` or `make docker-run`?'
+                )
+            logger.debug('Waiting for the command executor to be up and ready.')
+            time.sleep(interval)
+            interval = min(2*interval, 1)
 
     def _init_driver(self, headless, driver_path):
         """Instantiate the Chrome WebDriver with the given options"""
@@ -99,6 +217,8 @@ class ChromeDriverWrapper:
             options = webdriver.ChromeOptions()
             options.add_argument('--ignore-ssl-errors=yes')
             options.add_argument('--ignore-certificate-errors')
+            options.page_load_strategy = self._page_load_strategy
+            self._add_profile_options(options)
 
             self._wait_for_remote_executor()
             return webdriver.Remote(
@@ -111,8 +231,81 @@ class ChromeDriverWrapper:
             options = webdriver.ChromeOptions()
             # silence DevTools log msg
             options.add_experimental_option('excludeSwitches', ['enable-logging'])
+            options.page_load_strategy = self._page_load_strategy
+            self._add_profile_options(options)
 
             return webdriver.Chrome(service = service, options = options)
+
+    @METRICS.timed('driver_start')
+    def _start_driver(self) -> webdriver.Remote:
+        """Starts a new WebDriver session, with the lean profile, if any"""
+        self.driver = self._init_driver(self._headless, self._driver_path)
+        if self._profile is not None:
+            self._apply_profile(self._profile)
+        return self.driver
+
+    def _add_profile_options(self, options: webdriver.ChromeOptions) -> None:
+        """Adds the Chrome options of the lean profile, if any"""
+        if self._profile is None:
+            return
+
+        for argument in self._profile.arguments:
+            options.add_argument(argument)
+        if self._profile.prefs:
+            options.add_experimental_option('prefs', self._profile.prefs)
+        if self.network_stats is not None:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    def _execute_cdp(self, cmd: str, params: dict = None) -> dict:
+        """
+        Executes a Chrome DevTools Protocol command, either in a local Chrome or
+        in a remote one, through the Grid `goog/cdp/execute` endpoint
+        """
+        executor = self.driver.command_executor
+        # unlike `webdriver.Chrome`, `webdriver.Remote` does not register the command
+        if executor._commands.get(CDP_COMMAND) is None:
+            executor.add_command(CDP_COMMAND, 'POST', CDP_COMMAND_URL)
+        return self.driver.execute_cdp_cmd(cmd, params or {})
+
+    def _apply_profile(self, profile: BrowserProfile) -> None:
+        """Blocks the URL patterns of the lean profile in this session"""
+        blocked_url_patterns = profile.effective_blocked_url_patterns
+        logger.debug(f'Blocking {len(blocked_url_patterns)} URL patterns')
+        self._execute_cdp('Network.enable')
+        self._execute_cdp('Network.setBlockedURLs', {'urls': blocked_url_patterns})
+
+    def collect_network_stats(self) -> None:
+        """Adds the network events logged since the last call to `self.network_stats`, if any"""
+        if self.network_stats is not None:
+            self.network_stats.add_performance_log(self.driver.get_log('performance'))
+
+    def recycle_session_if_due(self) -> None:
+        """
+        Swaps the WebDriver session for another one of the session manager, if any, once it
+        loaded `max_pages` pages, rather than only when the wrapper quits, i.e., the session
+        is recycled during the run, however many pages the wrapper loads
+        """
+        manager = self._session_manager
+        if manager is None or not manager.is_due(self.driver, self.n_pages):
+            return
+
+        # the network events of the session are collected by `_load_page` beforehand
+        manager.release(self.driver, self.n_pages)
+        self.n_pages = 0
+        self.driver = manager.acquire(self)
+
+    def quit(self) -> None:
+        """Closes the browser and ends the WebDriver session"""
+        try:
+            self.collect_network_stats()
+        except WebDriverException as e:
+            logger.debug(f'Unable to read the network usage of the session: {e}')
+
+        if self._session_manager is not None:
+            self._session_manager.release(self.driver, self.n_pages)
+            self.n_pages = 0
+        else:
+            self.driver.quit()
     
     def _wait_until(self, condition: Callable, *, timeout: int | float = 10):
         """
@@ -145,6 +338,86 @@ class ChromeDriverWrapper:
         """
         return WebDriverWait(self.driver, timeout).until(condition)
 
+    def _extract_elements(
+        self, 
+        selectors: dict[str, tuple[str, str]], 
+        *, 
+        page_size: bool = False
+    ) -> tuple[dict[str, list[HtmlElement]], PageSize | None]:
+        """
+        Reads the text, href and `EXTRACTED_ATTRIBUTES` of the elements located by the given selectors, and
+        optionally the page size, in a single `execute_script` round-trip, instead
+        of one `find_element` and one `.text` round-trip per element. The page size
+        comes from the network layer, so the page source is never serialized
+
+        Parameters
+        ----------
+        selectors: dict[str, tuple[str, str]]
+            The `(by, value)` selectors, e.g., `(By.CLASS_NAME, 'price')`, by field name.
+            Only `By.ID` and `By.CLASS_NAME` are supported
+        page_size: bool, optional
+            Whether to also read the transferred and decoded sizes of the page
+
+        Returns
+        -------
+        elements: dict[str, list[HtmlElement]]
+            The located elements, in document order, by field name, as `_html.extract_elements`
+        page_size: PageSize or None
+            The size of the page, if `page_size`
+        """
+        result = self.driver.execute_script(_EXTRACT_ELEMENTS_SCRIPT, selectors, page_size, EXTRACTED_ATTRIBUTES)
+        elements = {
+            name: [HtmlElement(attrs = {'href': href, **attrs}, text = text) for text, href, attrs in found]
+            for name, found in result['elements'].items()
+        }
+        if result['page_size'] is None:
+            return elements, None
+        return elements, PageSize(result['page_size']['transfer'], result['page_size']['decoded'])
+
+    def _wait_until_any(
+        self, 
+        conditions: dict[str, Callable], 
+        *, 
+        timeout: int | float = 10, 
+        poll_frequency: float = WAIT_POLL_FREQUENCY
+    ) -> tuple[str, Any]:
+        """
+        Convenience method that waits until any of the given conditions is fulfilled,
+        checking them in order at each poll, e.g., to tell apart a missing element from
+        one that has not loaded yet without waiting for the whole timeout
+        
+        Parameters
+        ----------
+        conditions: dict[str, function]
+            Conditions, as in `self._wait_until`, by name
+        timeout: int or float, optional
+            Time to wait before raising TimeoutException, in seconds
+        poll_frequency: float, optional
+            Time between polls, in seconds
+        
+        Returns
+        -------
+        name: str
+            Name of the first fulfilled condition
+        result: Any
+            Its result, e.g., a WebElement
+        
+        Raises
+        ------
+        TimeoutException, if no condition is fulfilled before `timeout` seconds
+        """
+        def any_condition(driver):
+            for name, condition in conditions.items():
+                try:
+                    result = condition(driver)
+                except (NoSuchElementException, StaleElementReferenceException):
+                    result = None
+                if result:
+                    return name, result
+            return False
+
+        return WebDriverWait(self.driver, timeout, poll_frequency = poll_frequency).until(any_condition)
+
     def _wait_until_clickable(self, by: str, value: str, *, timeout: int | float = 10):
         """
         Convenience method that uses `self._wait_until` to wait until an element
@@ -171,14 +444,26 @@ class ChromeDriverWrapper:
         """
         return self._wait_until(condition = EC.element_to_be_clickable((by, value)), timeout = timeout)
 
-class BootsPageScraper(ChromeDriverWrapper):
+class BootsPageScraper(ChromeDriverWrapper, BaseScraper):
     """Main class. It uses `selenium` webdrivers to extracts the target data from the Boots - Sleep page"""
-    def __init__(self, *, url: str = None, headless: bool = False, driver_path: str = None, auto_accept_cookies = True):
+    def __init__(
+        self, 
+        *, 
+        url: str | list[str] = None, 
+        headless: bool = False, 
+        driver_path: str = None, 
+        auto_accept_cookies = True,
+        page_cache: 'PageCache' = None,
+        page_load_strategy: str = DEFAULT_PAGE_LOAD_STRATEGY,
+        profile: BrowserProfile = None,
+        session_manager: 'SessionManager' = None,
+        listing_only: bool = False
+    ):
         """
         Parameters
         ----------
-        url: str, optional
-            The URL from where we extract the data
+        url: str or list[str], optional
+            The URL from where we extract the data, or the URLs of several categories to crawl
         headless: bool, optional
             Whether to run headless, i.e., without GUI,
             and within a running docker container
@@ -187,26 +472,80 @@ class BootsPageScraper(ChromeDriverWrapper):
         auto_accept_cookies: bool, optional
             Whether the webdriver should automatically accept the 
             recommended cookies when the page loads
+        page_cache: PageCache, optional
+            Cache of the rendered pages. Cached pages are loaded in the browser
+            from their stored HTML, instead of from the site
+        page_load_strategy: str, optional
+            When `driver.get` returns, i.e., one of `PAGE_LOAD_STRATEGIES`
+        profile: BrowserProfile, optional
+            Lean profile with the resources the browser skips loading, shared by the
+            `DriverPool` sessions, which add their network usage to `self.network_stats`
+        session_manager: SessionManager, optional
+            Manager of warm WebDriver sessions, shared by the `DriverPool` sessions.
+            Its sessions skip the consent banner, once it has been dismissed
+        listing_only: bool, optional
+            Whether to build the product records from the listing pages, and only parse
+            the pages of the products whose listing misses any required field, i.e.,
+            `BaseScraper` listing-only mode
         """
-        super().__init__(headless, driver_path)
+        ChromeDriverWrapper.__init__(
+            self, 
+            headless, 
+            driver_path, 
+            page_load_strategy, 
+            profile, 
+            session_manager = session_manager
+        )
+        BaseScraper.__init__(self, url, page_cache, listing_only)
 
         # load the given URL, or the default one
-        url = url or URL
-        logger.debug(f'Navigating to {url!r}')
-        self.driver.get(url)
+        logger.debug(f'Navigating to {self.url!r}')
+        from_cache = self._load_page(self.url)
 
-        logger.debug('Creating tmp files folder')
-        self.tmp_dir = TMP_DATA_PATH
-        os.makedirs(self.tmp_dir, exist_ok = True)
-
-        if auto_accept_cookies:
+        # warm sessions already dismissed the consent banner
+        manager = self._session_manager
+        if auto_accept_cookies and not from_cache and not (manager is not None and manager.has_consent(self.driver)):
             try:
                 logger.debug('Auto-accepting cookies')
                 self.accept_cookies()
             except Exception as e:
                 # we might not get the prompt to accept the cookies
                 pass
+            else:
+                if manager is not None:
+                    manager.save_cookies(self.driver)
     
+    def _load_page(self, url: str, wrapper: ChromeDriverWrapper = None) -> bool:
+        """
+        Loads the given URL in the `wrapper` WebDriver session, which defaults to this
+        scraper one, writing its HTML into a blank page if it is in the page cache
+
+        Returns
+        -------
+        from_cache: bool
+            Whether the page was loaded from the page cache, i.e., it needs no storing
+        """
+        wrapper = wrapper or self
+        # the events of the previous page are complete by now
+        wrapper.collect_network_stats()
+        wrapper.recycle_session_if_due()
+        wrapper.n_pages += 1
+
+        page = self.page_cache.get(url, RENDERED_DOM) if self.page_cache is not None else None
+        if page is None:
+            wrapper.driver.get(url)
+            return False
+
+        wrapper.driver.get('about:blank')
+        wrapper.driver.execute_script(_WRITE_DOCUMENT_SCRIPT, page.html)
+        return True
+
+    def _store_page(self, url: str, wrapper: ChromeDriverWrapper = None) -> None:
+        """Stores the page rendered in the `wrapper` WebDriver session in the page cache, if any"""
+        if self.page_cache is not None:
+            wrapper = wrapper or self
+            self.page_cache.put(url, wrapper.driver.page_source, RENDERED_DOM, final_url = wrapper.driver.current_url)
+
     @RETRY
     def _accept_cookies(self):
         """Helper method to auto-accept cookies"""
@@ -217,20 +556,37 @@ class BootsPageScraper(ChromeDriverWrapper):
         """Helper method to auto-accept the recommended cookies"""
         self._wait_until_clickable(By.ID, ACCEPT_RECOMMENDED_COOKIES_BUTTON_ID).click()
 
+    @METRICS.timed('accept_cookies')
     def accept_cookies(self) -> None:
         """Helper method to auto-accept cookies"""
         self._accept_cookies()
         self._accept_recommended_cookies()
 
     @RETRY
-    def _find_product_elements(self, product_elements_class_name: str):
+    def _find_product_elements(self, product_elements_class_name: str, wrapper: ChromeDriverWrapper = None) -> list[HtmlElement]:
         """
         Helper method to find the product elements in the URL according to
-        their class name `product_elements_class_name`
+        their class name `product_elements_class_name`, in the `wrapper`
+        WebDriver session, which defaults to this scraper one. They are read
+        in a single round-trip, once the first one is clickable
+        """
+        wrapper = wrapper or self
+        wrapper._wait_until_clickable(By.CLASS_NAME, product_elements_class_name)
+        elements, _ = wrapper._extract_elements({'products': (By.CLASS_NAME, product_elements_class_name)})
+        return elements['products']
+
+    def _read_products(self, product_elements: list[HtmlElement], wrapper: ChromeDriverWrapper = None) -> list[Product]:
+        """
+        Helper method to read the name and href of the given product elements, or, in
+        listing-only mode, the products with their details, from the page source of the
+        listing loaded in the `wrapper` WebDriver session, which defaults to this scraper one
         """
-        self._wait_until_clickable(By.CLASS_NAME, product_elements_class_name)
-        return self.driver.find_elements(By.CLASS_NAME, product_elements_class_name)
+        if self.listing_only:
+            wrapper = wrapper or self
+            return parse_listing_details(wrapper.driver.page_source, wrapper.driver.current_url)
+        return parse_listing_elements({'products': product_elements}, self.url)
 
+    @METRICS.timed('find_products')
     def find_products(
         self, 
         product_elements_class_name: str = PRODUCT_ELEMENT_CLASS_NAME
@@ -255,201 +611,158 @@ class BootsPageScraper(ChromeDriverWrapper):
         self._n_products = len(product_elements)
         logger.info(f'Found {self._n_products} products')
 
-        products = []
-        for product in product_elements:
-            try:
-                name = product.text
-            except:
-                logger.error(f'Unable to get product name')
-                name = ''
-                
-            try:
-                href = product.get_attribute('href')
-            except NoSuchElementException:
-                logger.error(f'Unable to get product {name!r} href')
-                href = None
-
-            products.append(Product(href = href, name = name))
+        return self._read_products(product_elements)
 
-        return products
+    @METRICS.timed('listing_page')
+    def _find_products_in_page(self, url: str, wrapper: ChromeDriverWrapper) -> list[Product]:
+        """Finds the products in the listing page `url`, loading it in the `wrapper` WebDriver session"""
+        from_cache = self._load_page(url, wrapper)
+        try:
+            product_elements = self._find_product_elements(PRODUCT_ELEMENT_CLASS_NAME, wrapper)
+        except TimeoutException:
+            # pages past the last one have no products
+            METRICS.count(TIMEOUTS, stage = 'listing_page')
+            return []
+        if not from_cache:
+            self._store_page(url, wrapper)
+        return self._read_products(product_elements, wrapper)
     
-    def _parse_product(self, product: Product):
-        """Parse the given product to extract the necessary information"""
-        # navigate to the product page
-        self.driver.get(product.href)
+    def _new_session(self) -> ChromeDriverWrapper:
+        """Returns a new WebDriver session, with the same backend (local or Docker) as this scraper"""
+        return ChromeDriverWrapper(
+            headless = self._headless, 
+            driver_path = self._driver_path, 
+            page_load_strategy = self._page_load_strategy,
+            profile = self._profile,
+            network_stats = self.network_stats,
+            session_manager = self._session_manager
+        )
+
+    def _new_node_session(self, node_url: str) -> ChromeDriverWrapper:
+        """Returns a new WebDriver session in the selenium Grid executor `node_url`, for a `NodePool` worker"""
+        return ChromeDriverWrapper(
+            headless = True, 
+            page_load_strategy = self._page_load_strategy,
+            profile = self._profile,
+            network_stats = self.network_stats,
+            session_manager = self._session_manager,
+            remote_executor_url = node_url
+        )
+
+    def _is_node_error(self, error: Exception) -> bool:
+        """Whether the parsing error is due to the executor, e.g., it is unreachable, or lost the session"""
+        return isinstance(error, NODE_ERRORS)
+
+    def _read_rating(self, wrapper: ChromeDriverWrapper = None):
+        """
+        Reads the rating of the product page loaded in the `wrapper` WebDriver session,
+        which defaults to this scraper one
+        """
+        wrapper = wrapper or self
 
-        # extract data
-        # rating is one of the latest elements to show, and there are some products that have none
+        # rating is one of the latest elements to show, and there are some products that have none,
+        # which we tell as soon as the rating widget loads without it
         try:
-            rating_element = self._wait_until_clickable(By.CLASS_NAME, PRODUCT_RATING_CLASS_NAME, timeout = 15)
+            _, result = wrapper._wait_until_any(
+                {
+                    'rating': lambda driver: driver.execute_script(
+                        _READ_RATING_SCRIPT, 
+                        PRODUCT_RATING_CLASS_NAME, 
+                        RATING_PLACEHOLDER_SELECTOR
+                    ),
+                },
+                timeout = RATING_TIMEOUT
+            )
         except TimeoutException:
-            # we assume 15 seconds is enough time for the page to load,
+            # we assume 15 seconds is enough time for the widget to load,
             # thus `TimeoutException` means the product has no rating
-            import numpy as np
-            product.rating = np.NaN
-        else:
-            product.rating = rating_element.text
-
-        # name is rendered from the beginning (even before than JS)
-        product.name = self.driver.find_element(By.ID, PRODUCT_TITLE_ID).text
-            
-        # some items do not have a description
-        try:
-            text_raw = self.driver.find_element(By.CLASS_NAME, PRODUCT_TEXT_CLASS_NAME).text
-        except NoSuchElementException:
-            product.description = 'Missing product description.'
-        else:
-            product.description = text_raw.split('\n')[0]
-
-        # split price and unit; we could store it as float, but it does not make
-        # a difference if saving the data as JSON
-        price_str = self.driver.find_element(By.CLASS_NAME, PRODUCT_PRICE_STR_CLASS_NAME).text
+            METRICS.count(TIMEOUTS, stage = 'rating_wait')
+            return float('nan')
+
+        if result['rating'] is None:
+            return float('nan')
+        return result['rating']
+
+    def _read_page_rating(self, url: str):
+        """Reads the rating of the product page `url`, loading it through the page cache"""
+        from_cache = self._load_page(url)
+        rating = self._read_rating()
+        if not from_cache:
+            self._store_page(url)
+        return rating
+
+    def parse_products(self, *args, **kwargs) -> None:
+        """
+        Same as `BaseScraper.parse_products`, which also logs the network usage of the browser,
+        if collected. The product pages are probed with an HTTP session, given an incremental cache
+        """
+        # the probe sessions of the workers, each in its own thread, as `requests` sessions are not thread-safe
+        self._probe_sessions = threading.local()
+        self._all_probe_sessions = []
         try:
-            product.price_unit, product.price = PRICE_STR_PATTERN.match(price_str).groups()
-        except:
-            product.price_unit = price_str[0]
-            product.price = price_str[1:]
-
-        # note that `sys.getsizeof` might not give the exact size of the HTML page,
-        # as it also includes additional overhead from Python's object management
-        product.page_size = sys.getsizeof(self.driver.page_source.encode('utf-8'))//1024 # in KB
-
-        return product.as_dict()
-    
-    def do_cleanup(self, force = False) -> None:
-        """Helper method to remove the temporary files"""
-        n_parsed_files = len(os.listdir(self.tmp_dir))
-
-        # because default item sorting is by relevance, the listed
-        # products may change between a failed execution and the
-        # resumed one, so we might end up with more products than
-        # the ones listed
-        if force or (n_parsed_files >= self._n_products):
-            import shutil
-
-            logger.debug(f'Removing tmp files from {self.tmp_dir!r}')
-            shutil.rmtree(self.tmp_dir)
-        else:
-            logger.warning(
-                f'Skipping cleanup, as {n_parsed_files} of {self._n_products} products have been scraped. '
-                f'to force it, set `force = True`.'
-            )
-
-    @retry(exceptions = ScrapingException, n_tries = 2)
-    def parse_products(
-        self, 
-        products: list[Product], 
-        *,
-        output_path: str = None, 
-        output_file: str = None,
-        auto_remove: bool = True,
-        force_remove: bool = False
-    ) -> None:
+            BaseScraper.parse_products(self, *args, **kwargs)
+        finally:
+            for session in self._all_probe_sessions:
+                session.close()
+        if self.network_stats is not None:
+            self.collect_network_stats()
+            logger.info(f'Browser network usage: {self.network_stats.summary()}')
+
+    def _probe_session(self) -> 'requests.Session':
+        """The HTTP session of the calling worker thread, which probes the product pages"""
+        session = getattr(self._probe_sessions, 'session', None)
+        if session is None:
+            # `requests` is only needed (and imported) for the probes
+            from _http import new_http_session
+
+            session = self._probe_sessions.session = new_http_session(pool_size = 1)
+            # `list.append` is atomic, i.e., safe across the worker threads
+            self._all_probe_sessions.append(session)
+        return session
+
+    def _probe_product(self, product: Product, wrapper: ChromeDriverWrapper = None) -> 'Probe':
         """
-        Extracts the target data from the given products and stores it as a JSON file.
-
-        This method can be resumed, meaning that if the extraction from any product fails,
-        you can call it again and it will iterate over the given products skipping those
-        already processed (i.e., those present in the tmp folder).
+        Checks whether the product page changed since its record was cached, with a conditional
+        HEAD request, i.e., without downloading the page, which the browser loads anyway. In
+        replay mode, i.e., without network, the pages are as cached, so they have not changed
+        """
+        from _http import head_page
 
-        Parameters
-        ----------
-        products: list[Product]
-            List of products to retrieve data from, as returned by `self.find_products` 
-        output_path: str, optional
-            Path where the output file is written
-        output_file: str, optional
-            Name of the output file
-        auto_remove: bool, optional
-            Whether to automatically do clean up when all products have been parsed
-        force_remove: bool = False
-            Whether to automatically do clean up when the process finishes, even if
-            there have been any errors when parsing products (not recommended)
-        """
-        output_path = output_path or OUTPUT_PATH
-        output_file = output_file or OUTPUT_FILE
-
-        current_files = os.listdir(self.tmp_dir)
-        if current_files:
-            logger.debug(
-                f'Resuming extraction process. Found {len(current_files)} files '
-                f'in {self.tmp_dir!r} folder.'
-            )
+        entry, headers = self.incremental_cache.request_headers(product.href)
+        if self.page_cache is not None and self.page_cache.replay_only:
+            return self.incremental_cache.check(product.href, entry, 304 if entry is not None else 200)
 
-        # parse products
-        failed_products = {}
-        for idx, product in enumerate(products):
-            idx += 1
-            if idx%10 == 0:
-                logger.info(f'Parsing product #{idx}')
+        resp = head_page(self._probe_session(), product.href, headers)
+        return self.incremental_cache.check(product.href, entry, resp.status_code, resp.headers)
 
-            if product.name:
-                tmp_product_name = re.sub(r'[\W]+', '_', product.name).lower()
-            else:
-                import uuid
-                tmp_product_name = uuid.uuid4()
-                
-            tmp_fp = os.path.join(self.tmp_dir, f'{tmp_product_name}.json')
+    def _parse_product(self, product: Product, wrapper: ChromeDriverWrapper = None, page: Any = None):
+        """
+        Parse the given product to extract the necessary information. The page is
+        loaded in the `wrapper` WebDriver session, which defaults to this scraper
+        one, so that products can be parsed concurrently in a `DriverPool`. `page`
+        is unused, as `self._probe_product` does not download the product pages
+        """
+        wrapper = wrapper or self
 
-            # skip already parsed products (to make the process resumable)
-            if os.path.isfile(tmp_fp):
-                logger.debug(f'skipping already parsed product {product.name!r}')
-                continue
+        # navigate to the product page
+        with METRICS.timer('navigation'):
+            from_cache = self._load_page(product.href, wrapper)
+
+        # the server-rendered fields, and the page size, are read in a single round-trip
+        with METRICS.timer('extraction'):
+            elements, page_size = wrapper._extract_elements(PRODUCT_SELECTORS, page_size = True)
+            parse_product_elements(elements, product)
+        set_page_size(product, page_size)
+        METRICS.observe(PAGE_BYTES, page_size.decoded_bytes)
+
+        # rating is the only field rendered by JavaScript, so we wait for it,
+        # unless the ratings provider reads it in bulk, from its product ID
+        if not self._rating_pending(product):
+            with METRICS.timer('rating_wait'):
+                product.rating = self._read_rating(wrapper)
+
+        # the page is fully rendered, unless its rating is read in bulk
+        if not from_cache:
+            self._store_page(product.href, wrapper)
 
-            try:
-                logger.debug(f'Parsing product {product.name!r} data')
-                product_data = self._parse_product(product)
-            except Exception as e:
-                e_str = f'{type(e).__name__}: {e}'
-                logger.error(
-                    f'Unable to parse product {product.name!r} due to the '
-                    f'following error: {e_str}'
-                )
-                failed_products[product.name] = e_str
-            else:
-                logger.debug(f'Retrieved the following data: {product_data}')
-
-                logger.debug(f'Storing product data in the temp file {tmp_fp!r}')
-                with open(tmp_fp, 'w') as f_out:
-                    json.dump(product_data, f_out)
-
-        # read from tmp files
-        parsed_products = []
-        for file in os.listdir(self.tmp_dir):
-            tmp_fp = os.path.join(self.tmp_dir, file)
-            with open(tmp_fp) as f_in:
-                parsed_products.append(json.load(f_in))
-        
-        # store final data
-        median_product_price = to_numeric([product['Price'] for product in parsed_products]).mean().round(2)
-        curated_product_data = {'Products': parsed_products, 'Median': median_product_price}
-
-        out_fp = os.path.join(output_path, output_file)
-        logger.info(f'Writing output data to {out_fp!r}')
-        with open(out_fp, 'w') as f_out:
-            json.dump(curated_product_data, f_out)
-
-        # print log for failed products, if any, and clean up
-        if failed_products:
-            import time
-
-            log_fp = FAILED_PRODUCTS_LOG_FP.format(time = int(time.time()))
-            # write failed
-            with open(log_fp, 'w') as f_out:
-                json.dump(failed_products, f_out)
-            
-            if force_remove:
-                logger.warning(
-                    'Removing temporary files even if the extraction process failed '
-                    'for some products (due to `force_remove = True`).')
-                self.do_cleanup(force = True)
-
-            error_msg = (
-                f'Scrapping process failed for {len(failed_products)} products. '
-                f'See error log {log_fp!r} for more info'
-            )
-            logger.error(error_msg)
-            raise ScrapingException(error_msg)
-        
-        elif auto_remove:
-            self.do_cleanup()
+        return product.as_dict()
@@ -0,0 +1,247 @@
+import logging
+import os
+import json
+import threading
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+import _base
+from _browser import DEFAULT_MAX_PAGES
+
+if TYPE_CHECKING:
+    from _scraper import ChromeDriverWrapper
+
+
+SESSIONS_FILE = 'sessions.json'
+COOKIES_FILE = 'cookies.json'
+
+# OneTrust cookie set once the consent banner is dismissed
+CONSENT_COOKIE_NAME = 'OptanonAlertBoxClosed'
+
+# cheap page of the site, which we load to restore its cookies
+COOKIES_PAGE = '/robots.txt'
+
+
+logger = logging.getLogger(__name__)
+
+class _AttachedRemote(webdriver.Remote):
+    """`webdriver.Remote` that attaches to an existing session, instead of starting a new one"""
+    def __init__(self, command_executor: str, session_id: str, options: webdriver.ChromeOptions):
+        self._attached_session_id = session_id
+        super().__init__(command_executor = command_executor, options = options)
+
+    def start_session(self, capabilities: dict) -> None:
+        self.session_id = self._attached_session_id
+        self.caps = {'browserName': 'chrome'}
+
+def is_healthy(driver: webdriver.Remote) -> bool:
+    """Whether the WebDriver session still responds"""
+    try:
+        driver.execute_script('return 1')
+    # e.g., a `WebDriverException`, or a connection error if the executor is gone
+    except Exception:
+        return False
+    return True
+
+class SessionManager:
+    """
+    Keeps warm WebDriver sessions around, so that scrape jobs skip starting a browser and
+    dismissing the consent banner: sessions quit by a `ChromeDriverWrapper` are parked
+    instead, and handed to the next one, until they have loaded `max_pages` pages.
+
+    The accepted cookies are persisted, and restored in new sessions. Remote sessions
+    (i.e., in the selenium Grid) also outlive the process, if `keep_alive`: they are
+    persisted on `close`, and reattached by the next run, unless the Grid timed them out
+    """
+    def __init__(
+        self,
+        *,
+        max_pages: int = DEFAULT_MAX_PAGES,
+        keep_alive: bool = True,
+        state_path: str = None,
+        site_url: str = None
+    ):
+        """
+        Parameters
+        ----------
+        max_pages: int, optional
+            Pages a session loads before it is recycled, i.e., quit and replaced
+        keep_alive: bool, optional
+            Whether the remote sessions outlive the process, to be reattached by the next run
+        state_path: str, optional
+            Folder of the persisted sessions and cookies. default: `_base.TMP_DATA_PATH`
+        site_url: str, optional
+            URL of the site whose cookies are restored. default: `_base.URL`
+        """
+        if max_pages < 1:
+            raise ValueError(f'The maximum number of pages must be positive, got {max_pages}')
+
+        self.max_pages = max_pages
+        self.keep_alive = keep_alive
+        state_path = state_path or _base.TMP_DATA_PATH
+        os.makedirs(state_path, exist_ok = True)
+        self.sessions_fp = os.path.join(state_path, SESSIONS_FILE)
+        self.cookies_fp = os.path.join(state_path, COOKIES_FILE)
+        scheme, netloc, *_ = urlsplit(site_url or _base.URL)
+        self._cookies_url = f'{scheme}://{netloc}{COOKIES_PAGE}'
+
+        self._lock = threading.Lock()
+        self._idle = []         # parked drivers, the most recently used last
+        self._sessions = {}     # pages loaded, and executor URL (None if local), by session id
+        self._persisted = self._load_sessions()
+        self.n_started = self.n_reused = self.n_recycled = 0
+
+    def _load_sessions(self) -> list[dict]:
+        """Reads the remote sessions persisted by a previous run, if any"""
+        if not os.path.isfile(self.sessions_fp):
+            return []
+        with open(self.sessions_fp) as f_in:
+            sessions = json.load(f_in)
+        os.remove(self.sessions_fp)
+        return sessions
+
+    def _attach(self, session: dict) -> webdriver.Remote | None:
+        """Reattaches a persisted remote session, if it is still alive"""
+        try:
+            driver = _AttachedRemote(session['executor_url'], session['session_id'], webdriver.ChromeOptions())
+        except WebDriverException:
+            return None
+        return driver if is_healthy(driver) else None
+
+    def _take_idle(self, executor_url: str | None) -> webdriver.Remote | None:
+        """Removes the most recently used parked driver of the executor, if any, from the parked ones"""
+        with self._lock:
+            for driver in reversed(self._idle):
+                if self._sessions.get(driver.session_id, {}).get('executor_url') == executor_url:
+                    self._idle.remove(driver)
+                    return driver
+        return None
+
+    def _take_persisted(self, executor_url: str | None) -> dict | None:
+        """Removes a persisted session of the executor, if any, from the persisted ones"""
+        with self._lock:
+            for session in self._persisted:
+                if session['executor_url'] == executor_url:
+                    self._persisted.remove(session)
+                    return session
+        return None
+
+    def acquire(self, wrapper: 'ChromeDriverWrapper') -> webdriver.Remote:
+        """
+        Returns a warm driver for `wrapper`, either a parked one, a reattached remote
+        one, or a new one, started by `wrapper._start_driver`, with the cookies restored
+        """
+        executor_url = wrapper._remote_executor_url if wrapper._headless else None
+        # the candidates are taken under the lock, but probed outside of it, since each
+        # probe is a round-trip to the (Grid) browser, which would stall the other workers
+        while (driver := self._take_idle(executor_url)) is not None:
+            if is_healthy(driver):
+                with self._lock:
+                    self.n_reused += 1
+                return driver
+            with self._lock:
+                self._sessions.pop(driver.session_id, None)
+
+        while (session := self._take_persisted(executor_url)) is not None:
+            driver = self._attach(session)
+            if driver is not None:
+                logger.debug(f'Reattached the remote session {driver.session_id!r}')
+                with self._lock:
+                    self._sessions[driver.session_id] = {'n_pages': session['n_pages'], 'executor_url': session['executor_url']}
+                    self.n_reused += 1
+                return driver
+
+        driver = wrapper._start_driver()
+        self.restore_cookies(driver)
+        with self._lock:
+            self._sessions[driver.session_id] = {'n_pages': 0, 'executor_url': executor_url}
+            self.n_started += 1
+        return driver
+
+    def release(self, driver: webdriver.Remote, n_pages: int = 0) -> None:
+        """
+        Takes back a driver that loaded `n_pages` more pages, which is parked for the
+        next `acquire`, unless it has to be recycled, or no longer responds
+        """
+        with self._lock:
+            session = self._sessions.setdefault(driver.session_id, {'n_pages': 0, 'executor_url': None})
+            session['n_pages'] += n_pages
+            n_pages = session['n_pages']
+
+        # probed outside of the lock, as in `acquire`
+        if n_pages < self.max_pages and is_healthy(driver):
+            with self._lock:
+                self._idle.append(driver)
+            return
+        with self._lock:
+            self._sessions.pop(driver.session_id, None)
+            self.n_recycled += 1
+
+        logger.debug(f'Recycling the session {driver.session_id!r}, after {n_pages} pages')
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            logger.debug(f'Unable to quit the session: {e}')
+
+    def is_due(self, driver: webdriver.Remote, n_pages: int = 0) -> bool:
+        """Whether a driver that loaded `n_pages` more pages than it was acquired with has to be recycled"""
+        with self._lock:
+            return self._sessions.get(driver.session_id, {}).get('n_pages', 0) + n_pages >= self.max_pages
+
+    def has_consent(self, driver: webdriver.Remote) -> bool:
+        """Whether the consent banner was dismissed in the driver session"""
+        try:
+            return driver.get_cookie(CONSENT_COOKIE_NAME) is not None
+        except WebDriverException:
+            return False
+
+    def save_cookies(self, driver: webdriver.Remote) -> None:
+        """Persists the cookies of the driver session, e.g., once the consent banner is dismissed"""
+        with open(self.cookies_fp, 'w') as f_out:
+            json.dump(driver.get_cookies(), f_out)
+
+    def restore_cookies(self, driver: webdriver.Remote) -> None:
+        """Adds the persisted cookies, if any, to a new driver session"""
+        if not os.path.isfile(self.cookies_fp):
+            return
+        with open(self.cookies_fp) as f_in:
+            cookies = json.load(f_in)
+
+        # cookies can only be added to the site that is loaded
+        driver.get(self._cookies_url)
+        for cookie in cookies:
+            try:
+                driver.add_cookie(cookie)
+            except WebDriverException as e:
+                logger.debug(f'Unable to restore the cookie {cookie.get("name")!r}: {e}')
+
+    def close(self) -> None:
+        """
+        Persists the parked remote sessions, if `keep_alive`, for the next run to reattach
+        them, and quits the rest of them
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+            # the persisted sessions that were not reattached are still alive, too
+            persisted, self._persisted = self._persisted, []
+
+        for driver in idle:
+            session = self._sessions.pop(driver.session_id, {})
+            if self.keep_alive and session.get('executor_url'):
+                persisted.append({'session_id': driver.session_id, **session})
+                continue
+            try:
+                driver.quit()
+            except WebDriverException as e:
+                logger.debug(f'Unable to quit the session: {e}')
+
+        if persisted:
+            with open(self.sessions_fp, 'w') as f_out:
+                json.dump(persisted, f_out)
+        logger.info(
+            f'Sessions: {self.n_started} started, {self.n_reused} reused, {self.n_recycled} recycled, '
+            f'{len(persisted)} kept alive'
+        )
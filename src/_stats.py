@@ -0,0 +1,74 @@
+import logging
+import statistics
+
+from array import array
+
+logger = logging.getLogger(__name__)
+
+def to_number(value) -> float:
+    """
+    Converts a price (or any numeric string) to float, returning None if it is not a
+    number. Products parsed by older versions, e.g., in a checkpoint journal, store
+    their prices as strings
+    """
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        logger.debug(f'Skipping non-numeric value {value!r}')
+        return None
+    # NaN is a float, but not a price
+    return None if value != value else value
+
+class RunningMean:
+    """Online mean, which takes constant memory regardless of the number of values"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+
+    def add(self, value) -> None:
+        """Adds a value, which may be a numeric string. Non-numeric values are skipped"""
+        value = to_number(value)
+        if value is None:
+            return
+        self.count += 1
+        self.total += value
+
+    @property
+    def value(self) -> float:
+        """The mean of the values added so far, NaN if none"""
+        return self.total/self.count if self.count else float('nan')
+
+class PriceStats:
+    """
+    Summary statistics of the product prices. The median needs all values, so they are
+    kept in a compact array of doubles (8 bytes each) instead of a list of floats
+    """
+    def __init__(self):
+        self._values = array('d')
+        self._mean = RunningMean()
+
+    def add(self, value) -> None:
+        """Adds a price, which may be a numeric string. Non-numeric values are skipped"""
+        value = to_number(value)
+        if value is None:
+            return
+        self._values.append(value)
+        self._mean.add(value)
+
+    @property
+    def count(self) -> int:
+        return self._mean.count
+
+    @property
+    def mean(self) -> float:
+        """The mean price, NaN if there are no prices"""
+        return self._mean.value
+
+    @property
+    def median(self) -> float:
+        """The median price, NaN if there are no prices"""
+        return statistics.median(self._values) if self._values else float('nan')
+
+    def summary(self, ndigits: int = 2) -> dict:
+        """The statistics, rounded to `ndigits` decimals, as the output summary"""
+        return {'Median': round(self.median, ndigits), 'Mean': round(self.mean, ndigits)}
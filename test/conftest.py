@@ -1,6 +1,162 @@
+import pytest
+
+import os
+import json
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
 def pytest_addoption(parser):
     """
-    Config function that parses the `headless` argument that we pass to
-    `BootsPageScraper` during the tests setup.
+    Config function that parses the `headless` and page cache arguments
+    that we pass to `BootsPageScraper` during the tests setup.
     """
-    parser.addoption("--headless", action = 'store_true')
\ No newline at end of file
+    parser.addoption("--headless", action = 'store_true')
+    parser.addoption(
+        "--page-cache", 
+        default = None, 
+        help = 'Path of a page cache (SQLite) the `BootsPageScraper` tests read the pages through'
+    )
+    parser.addoption(
+        "--replay", 
+        action = 'store_true', 
+        help = 'Whether to load the pages from the `--page-cache` only, i.e., without network'
+    )
+    parser.addoption("--benchmark", action = 'store_true', help = 'Whether to run the offline benchmarks')
+    parser.addoption(
+        "--benchmark-engines", 
+        default = 'http,async', 
+        help = 'Comma-separated engines the benchmarks run, e.g., `selenium,http,async`'
+    )
+    parser.addoption(
+        "--benchmark-workers", 
+        default = '1,4,16', 
+        help = 'Comma-separated numbers of workers the benchmarks run each engine with'
+    )
+    parser.addoption(
+        "--benchmark-products", 
+        default = 200, 
+        type = int, 
+        help = 'Number of products in the benchmark listing page'
+    )
+    parser.addoption(
+        "--benchmark-delay", 
+        default = 0.05, 
+        type = float, 
+        help = 'Latency injected in each response of the benchmark server, in seconds'
+    )
+    parser.addoption(
+        "--benchmark-output", 
+        default = None, 
+        help = 'JSON file where the benchmark results are saved. default: `data/benchmarks/benchmark_{time}.json`'
+    )
+
+class FixtureRequestHandler(SimpleHTTPRequestHandler):
+    """
+    Request handler that serves the recorded pages, e.g., in `FIXTURES_DIR`, without logging each
+    request, after `delay` seconds, i.e., the injected latency
+    """
+    delay = 0
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+class RatingsRequestHandler(BaseHTTPRequestHandler):
+    """
+    Stub of the Bazaarvoice statistics API, which answers with the review statistics of the
+    requested products in `statistics`, and records the product IDs of each request in `requests`
+    """
+    statistics = {}
+    requests = None
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        product_ids = query['filter'][0].split(':eq:', 1)[1].split(',')
+        self.requests.append(product_ids)
+
+        results = [
+            {'ProductStatistics': {'ProductId': product_id, 'ReviewStatistics': self.statistics[product_id]}}
+            for product_id in product_ids if product_id in self.statistics
+        ]
+        body = json.dumps({'HasErrors': False, 'Errors': [], 'Results': results}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve_fixtures(delay: float = 0, directory: str = FIXTURES_DIR) -> ThreadingHTTPServer:
+    """
+    Starts a local HTTP server, in a background thread, that serves the recorded pages
+    in `directory` with `delay` latency
+    """
+    handler = partial(type('DelayedRequestHandler', (FixtureRequestHandler,), {'delay': delay}), directory = directory)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+    return server
+
+@pytest.fixture(scope = 'session')
+def fixture_server():
+    """
+    Serves the recorded HTML pages in `FIXTURES_DIR` from a local HTTP server,
+    which stands in for the Boots website, and returns its base URL
+    """
+    server = serve_fixtures()
+
+    yield f'http://127.0.0.1:{server.server_port}'
+
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def start_fixture_server():
+    """
+    Returns a function that starts another server of the recorded pages, with the given
+    latency, and returns its base URL, e.g., to stand in for several nodes or mirrors
+    """
+    servers = []
+
+    def start(delay: float = 0, directory: str = FIXTURES_DIR) -> str:
+        server = serve_fixtures(delay, directory)
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def ratings_server():
+    """
+    Serves a stub of the Bazaarvoice statistics API, with the review statistics in
+    `FIXTURES_DIR/ratings.json`, and returns its endpoint and the list of the
+    product IDs of each request it gets
+    """
+    with open(os.path.join(FIXTURES_DIR, 'ratings.json')) as f_in:
+        statistics = json.load(f_in)
+    requests = []
+    handler = type('StubRatingsRequestHandler', (RatingsRequestHandler,), {'statistics': statistics, 'requests': requests})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target = server.serve_forever, daemon = True)
+    thread.start()
+
+    yield f'http://127.0.0.1:{server.server_port}/data/statistics.json', requests
+
+    server.shutdown()
+    server.server_close()
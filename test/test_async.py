@@ -0,0 +1,76 @@
+import pytest
+
+import asyncio
+import json
+import time
+import _base
+from _async import AsyncBootsScraper, HostLimiter, TokenBucket
+from _decorator import async_retry
+
+
+def test_token_bucket_rate():
+    """Check the bucket allows the initial burst, and then `rate` acquisitions per second"""
+    async def acquire_all(bucket, n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    bucket = TokenBucket(rate = 50, capacity = 5)
+    start = time.monotonic()
+    asyncio.run(acquire_all(bucket, 15))
+    elapsed = time.monotonic() - start
+
+    # 5 tokens from the burst, and 10 more at 50 per second
+    assert 0.15 <= elapsed < 1
+
+def test_host_limiter_concurrency():
+    """Check the requests in flight to a host never exceed `max_concurrency`"""
+    in_flight = {'a': 0, 'b': 0}
+    max_in_flight = {'a': 0, 'b': 0}
+
+    async def request(limiter, host):
+        async with limiter.limit(f'http://{host}/page'):
+            in_flight[host] += 1
+            max_in_flight[host] = max(max_in_flight[host], in_flight[host])
+            await asyncio.sleep(0.01)
+            in_flight[host] -= 1
+
+    async def run():
+        limiter = HostLimiter(rate = 1000, max_concurrency = 3)
+        await asyncio.gather(*(request(limiter, host) for host in 'ab' for _ in range(10)))
+
+    asyncio.run(run())
+    assert max_in_flight == {'a': 3, 'b': 3}
+
+def test_async_retry():
+    """Check the coroutine is retried until it succeeds, and the error is re-raised after `n_tries`"""
+    calls = []
+
+    @async_retry(exceptions = ValueError, n_tries = 3, delay = 0)
+    async def flaky(n_failures):
+        calls.append(n_failures)
+        if len(calls) <= n_failures:
+            raise ValueError('boom')
+        return 'ok'
+
+    assert asyncio.run(flaky(2)) == 'ok'
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(flaky(3))
+    assert len(calls) == 3
+
+@pytest.mark.parametrize('n_workers', [1, 10])
+def test_parse_products(fixture_server, tmp_path, monkeypatch, n_workers):
+    """Check the `AsyncBootsScraper` output against the recorded pages"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    scraper = AsyncBootsScraper(url = f'{fixture_server}/listing.html', rating_fallback = False, rate = 100)
+
+    products = scraper.find_products()
+    scraper.parse_products(products, output_path = str(tmp_path), n_workers = n_workers)
+    scraper.quit()
+
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+
+    assert {product['Title'] for product in output['Products']} == {product.name for product in products}
+    assert all(product['Page_Transfer_KB'] == product['Page_Size_KB'] for product in output['Products'])
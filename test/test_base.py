@@ -0,0 +1,298 @@
+import pytest
+
+import os
+import json
+import _base
+from _base import BaseScraper, ScrapingException, canonical_href, paging_url, read_seed_file
+from _jobs import JobQueue
+from _product import Product
+
+
+N_PRODUCTS = 10
+
+class StubSession:
+    def close(self):
+        pass
+
+class StubScraper(BaseScraper):
+    """`BaseScraper` over a fake catalogue, whose listing returns the last page past the end"""
+    def __init__(self, n_products = N_PRODUCTS, failures = None, listing_only = False):
+        super().__init__('https://example.com/sleep', listing_only = listing_only)
+        self.catalogue = [Product(href = f'https://example.com/p{i}', name = f'Product {i}') for i in range(n_products)]
+        self.failures = failures or {}
+        self.listed_pages = []
+        self.events = []
+
+    def _new_session(self):
+        return StubSession()
+
+    def _find_products_in_page(self, url, session):
+        index = int(url.split(f'{_base.PAGING_INDEX_PARAM}=')[1].split('&')[0])
+        size = int(url.split(f'{_base.PAGING_SIZE_PARAM}=')[1].split('&')[0])
+        last_index = (len(self.catalogue) - 1)//size
+        index = min(index, last_index)
+
+        self.listed_pages.append(index)
+        self.events.append(('list', index))
+        return [Product(href = p.href, name = p.name) for p in self.catalogue[index*size:(index + 1)*size]]
+
+    def _parse_product(self, product, session = None):
+        self.events.append(('parse', product.name))
+        if self.failures.get(product.name, 0) > 0:
+            self.failures[product.name] -= 1
+            raise ValueError('boom')
+        return {'Title': product.name, 'Price': '1.00'}
+
+class MultiCategoryScraper(StubScraper):
+    """`StubScraper` over several categories, each listing some products of the catalogue, in a single page"""
+    def __init__(self, categories):
+        super().__init__()
+        BaseScraper.__init__(self, list(categories))
+        self.categories = categories
+
+    def find_products(self):
+        return self._find_products_in_page(self.url, self._new_session())
+
+    def _find_products_in_page(self, url, session):
+        category = url.split('?')[0]
+        self.events.append(('list', category))
+        # the same product may be listed with tracking parameters
+        return [
+            Product(href = f'{self.catalogue[i].href}?utm_source={category}', name = self.catalogue[i].name)
+            for i in self.categories[category]
+        ]
+
+@pytest.fixture(autouse = True)
+def tmp_data_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    monkeypatch.setattr(_base, 'FAILED_PRODUCTS_LOG_FP', str(tmp_path / 'failed_{time}.txt'))
+
+def test_paging_url():
+    """Check the paging parameters are set, replacing the existing ones"""
+    url = paging_url('https://example.com/sleep?sort=price&paging.index=5', 2, 24)
+    assert url == 'https://example.com/sleep?sort=price&paging.index=2&paging.size=24'
+
+@pytest.mark.parametrize('n_products', [9, 10, 11])
+def test_iter_products_paginates(n_products):
+    """Check all products are listed once, and listing stops at the last page"""
+    scraper = StubScraper(n_products)
+    products = list(scraper.iter_products(paginate = True, paging_size = 5))
+
+    assert [p.href for p in products] == [p.href for p in scraper.catalogue]
+    assert scraper._n_products == n_products
+    # a full last page needs one more (repeated) page to know it is the last
+    assert len(scraper.listed_pages) <= (n_products - 1)//5 + 2
+
+def test_products_parsed_while_listed(tmp_path):
+    """Check parsing starts before the whole catalogue is listed"""
+    scraper = StubScraper(30)
+    products = scraper.iter_products(paginate = True, paging_size = 5)
+    scraper.parse_products(products, output_path = str(tmp_path))
+
+    first_parse = scraper.events.index(('parse', 'Product 0'))
+    last_list = max(i for i, event in enumerate(scraper.events) if event[0] == 'list')
+    assert first_parse < last_list
+
+def test_parse_products_retries_failed_stream(tmp_path):
+    """Check the failed products of a stream are retried, and the output has them all"""
+    scraper = StubScraper(failures = {'Product 3': 1})
+    products = scraper.iter_products(paginate = True, paging_size = 4)
+    scraper.parse_products(products, output_path = str(tmp_path))
+
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert len(output['Products']) == N_PRODUCTS
+
+def test_parse_products_fails_after_retries(tmp_path):
+    """Check a product failing in every try raises `ScrapingException`"""
+    scraper = StubScraper(failures = {'Product 3': _base.PARSE_N_TRIES})
+    products = scraper.iter_products(paginate = True, paging_size = 4)
+    with pytest.raises(ScrapingException):
+        scraper.parse_products(products, output_path = str(tmp_path))
+
+def test_parse_products_resumes(tmp_path):
+    """Check a resumed run only parses the products that failed, and the output has them all"""
+    scraper = StubScraper(failures = {'Product 3': _base.PARSE_N_TRIES})
+    scraper._n_products = N_PRODUCTS
+    with pytest.raises(ScrapingException):
+        scraper.parse_products(scraper.catalogue, output_path = str(tmp_path))
+
+    scraper.events = []
+    scraper.parse_products(scraper.catalogue, output_path = str(tmp_path))
+    assert scraper.events == [('parse', 'Product 3')]
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert len(output['Products']) == N_PRODUCTS
+    assert not os.path.exists(scraper.jobs.path)
+
+def test_parse_products_takes_over_abandoned_products(tmp_path):
+    """Check the products another process claimed, and abandoned, are parsed too"""
+    scraper = StubScraper()
+    scraper._n_products = N_PRODUCTS
+    crashed = JobQueue(scraper.jobs.path, lease_ttl = 0)
+    for product in scraper.catalogue[:3]:
+        crashed.claim(product.href, product.href, product.name)
+
+    scraper.parse_products(scraper.catalogue[3:], output_path = str(tmp_path))
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert len(output['Products']) == N_PRODUCTS
+
+def test_parse_products_appends_to_history(tmp_path):
+    """Check a failed run is not added to the history, whereas the resumed one is, once"""
+    scraper = StubScraper(failures = {'Product 3': _base.PARSE_N_TRIES})
+    scraper._n_products = N_PRODUCTS
+    with pytest.raises(ScrapingException):
+        scraper.parse_products(scraper.catalogue, output_path = str(tmp_path), output_format = 'csv', append = True)
+
+    history_path = tmp_path / 'sleep_products'
+    assert not list(history_path.rglob('*.csv'))
+
+    scraper.parse_products(scraper.catalogue, output_path = str(tmp_path), output_format = 'csv', append = True)
+    [fp] = history_path.rglob('*.csv')
+    assert fp.parent.name.startswith('run_date=')
+    assert len(fp.read_text().splitlines()) == N_PRODUCTS + 1
+
+def test_parse_products_shared_queue_output(tmp_path):
+    """Check only the process that completes a shared job queue writes the output file, with every product"""
+    first, second = StubScraper(), StubScraper()
+    first._n_products = second._n_products = N_PRODUCTS
+    product = first.catalogue[0]
+    other = JobQueue(first.jobs.path, owner = 'other')
+    other.claim(first._job_key(product), product.href, product.name)
+
+    second.parse_products(second.catalogue[1:], output_path = str(tmp_path), auto_remove = False)
+    assert os.listdir(tmp_path) == ['tmp']
+
+    # e.g., the other process is interrupted, and this one resumes its product
+    other.release()
+    first.parse_products([product], output_path = str(tmp_path))
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert len(output['Products']) == N_PRODUCTS
+
+def test_failed_run_writes_output(tmp_path):
+    """Check a failed run writes the products parsed so far, and the next one, whose listing no longer has the failed product, all of them"""
+    scraper = StubScraper(failures = {'Product 3': _base.PARSE_N_TRIES})
+    scraper._n_products = N_PRODUCTS
+    with pytest.raises(ScrapingException):
+        scraper.parse_products(scraper.catalogue, output_path = str(tmp_path))
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        assert len(json.load(f_in)['Products']) == N_PRODUCTS - 1
+
+    # e.g., the failed product is delisted
+    products = [product for product in scraper.catalogue if product.name != 'Product 3']
+    scraper = StubScraper()
+    scraper._n_products = len(products)
+    scraper.parse_products(products, output_path = str(tmp_path))
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        assert len(json.load(f_in)['Products']) == N_PRODUCTS - 1
+    assert not os.path.exists(scraper.jobs.path)
+
+def test_listing_only_parses_incomplete_products(tmp_path):
+    """Check only the pages of the products whose listing misses the price are parsed, in listing-only mode"""
+    scraper = StubScraper(listing_only = True)
+    scraper._n_products = N_PRODUCTS
+    for product in scraper.catalogue[1:]:
+        product.price_unit, product.price = '£', 2.
+
+    scraper.parse_products(scraper.catalogue, output_path = str(tmp_path))
+    assert scraper.events == [('parse', 'Product 0')]
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert len(output['Products']) == N_PRODUCTS
+    assert [product['Price'] for product in output['Products']].count(2.) == N_PRODUCTS - 1
+
+def test_canonical_href():
+    """Check the host, default port, fragment and tracking parameters do not change the canonical href"""
+    href = canonical_href('HTTPS://Example.com:443/p1?utm_source=a&b=2&a=1&gclid=x#reviews')
+    assert href == 'https://example.com/p1?a=1&b=2'
+    assert canonical_href('https://example.com:8080/p1') == 'https://example.com:8080/p1'
+
+def test_read_seed_file(tmp_path):
+    """Check blank lines and comments are skipped"""
+    fp = tmp_path / 'seeds.txt'
+    fp.write_text('# sleep\nhttps://example.com/sleep\n\n  https://example.com/relax  \n')
+    assert read_seed_file(str(fp)) == ['https://example.com/sleep', 'https://example.com/relax']
+
+@pytest.mark.parametrize('paginate', [False, True])
+def test_multi_category_crawl_parses_products_once(tmp_path, paginate):
+    """Check the products listed in several categories are parsed once, and recorded in each category"""
+    categories = {
+        'https://example.com/sleep': [0, 1, 2, 3],
+        'https://example.com/relax': [2, 3, 4],
+        'https://example.com/night': [0, 5],
+    }
+    scraper = MultiCategoryScraper(categories)
+    products = scraper.iter_products(paginate = paginate, paging_size = 10)
+    scraper.parse_products(products, output_path = str(tmp_path))
+
+    parsed = [name for event, name in scraper.events if event == 'parse']
+    assert sorted(parsed) == [f'Product {i}' for i in range(6)]
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        assert len(json.load(f_in)['Products']) == 6
+
+    with open(tmp_path / f'sleep_products{_base.CATEGORIES_FILE_SUFFIX}') as f_in:
+        memberships = json.load(f_in)
+    assert memberships == {
+        category: sorted(f'https://example.com/p{i}' for i in indices) for category, indices in categories.items()
+    }
+
+def test_parse_products_writes_change_feed(tmp_path):
+    """Check each complete run writes its changes since the previous one"""
+    from _changes import ChangeIndex
+
+    index_fp = str(tmp_path / 'index.json')
+    scraper = StubScraper()
+    scraper._n_products = N_PRODUCTS
+    scraper.parse_products(scraper.catalogue, output_path = str(tmp_path), change_index = ChangeIndex(index_fp))
+
+    scraper = StubScraper(n_products = N_PRODUCTS - 1)
+    scraper._n_products = N_PRODUCTS - 1
+    scraper.parse_products(scraper.catalogue, output_path = str(tmp_path), change_index = ChangeIndex(index_fp))
+    with open(tmp_path / 'sleep_products_changes.json') as f_in:
+        feed = json.load(f_in)
+    assert feed['Summary'] == {'Added': 0, 'Removed': 1, 'Modified': 0, 'Unchanged': N_PRODUCTS - 1}
+    assert feed['Removed'][0]['Key'] == f'https://example.com/p{N_PRODUCTS - 1}'
+
+def test_change_feed_waits_for_shared_queue(tmp_path):
+    """Check a process does not write the change feed while another one is parsing products of the queue"""
+    from _changes import ChangeIndex
+
+    index_fp = str(tmp_path / 'index.json')
+    scraper = StubScraper()
+    scraper._n_products = N_PRODUCTS
+    other = JobQueue(scraper.jobs.path, owner = 'other')
+    other.claim(scraper.catalogue[0].href, scraper.catalogue[0].href, scraper.catalogue[0].name)
+
+    scraper.parse_products(
+        scraper.catalogue[1:], output_path = str(tmp_path), auto_remove = False, change_index = ChangeIndex(index_fp)
+    )
+    assert not (tmp_path / 'sleep_products_changes.json').exists()
+    assert not os.path.exists(index_fp)
+
+def test_pending_ratings_keep_their_leases(tmp_path):
+    """Check the products waiting for their ratings batch are not taken over by another process"""
+    import time
+
+    class StubRatingsProvider:
+        batch_size = N_PRODUCTS
+
+        def fetch(self, product_ids):
+            taken_over.append(other.claim_next())
+            return {product_id: '4.5' for product_id in product_ids}
+
+    class SlowScraper(StubScraper):
+        def _parse_product(self, product, session = None, page = None):
+            time.sleep(0.03)
+            return super()._parse_product(product, session)
+
+    taken_over = []
+    scraper = SlowScraper()
+    scraper._n_products = N_PRODUCTS
+    scraper.jobs.lease_ttl = 0.1
+    other = JobQueue(scraper.jobs.path)
+    products = [Product(href = p.href, name = p.name, product_id = str(i)) for i, p in enumerate(scraper.catalogue)]
+
+    scraper.parse_products(products, output_path = str(tmp_path), ratings_provider = StubRatingsProvider())
+    assert taken_over == [None]
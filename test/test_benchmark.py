@@ -0,0 +1,181 @@
+import pytest
+
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+from conftest import FIXTURES_DIR
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+BENCHMARKS_PATH = os.path.join(ROOT_DIR, 'data', 'benchmarks')
+
+# recorded product pages the benchmark listing cycles through, including the pathological
+# ones: no rating nor description, a rating rendered by the server, and odd price strings
+PRODUCT_PAGES = ('product_1.html', 'product_2.html', 'product_3.html', 'product_4.html', 'product_5.html')
+# a heavy page, i.e., the first one padded with an inline script of that many bytes
+LARGE_PAGE_BYTES = 512*1024
+
+ENGINE_MODULES = {'selenium': '_scraper', 'http': '_http', 'async': '_async'}
+
+# runs the CLI, with its temporary files in `sys.argv[1]`, so that the benchmarks do not touch the real ones
+_RUN_CLI = (
+    'import runpy, sys, _base; '
+    '_base.TMP_DATA_PATH = sys.argv.pop(1); '
+    f'runpy.run_path({SRC_DIR!r}, run_name = "__main__")'
+)
+
+
+logger = logging.getLogger(__name__)
+
+pytestmark = pytest.mark.skipif('not config.getoption("--benchmark")', reason = 'needs the `--benchmark` option')
+
+def _option_list(config, name: str) -> list[str]:
+    return [value.strip() for value in config.getoption(name).split(',') if value.strip()]
+
+def pytest_generate_tests(metafunc):
+    """Parametrizes the benchmark with every `--benchmark-engines` and `--benchmark-workers` combination"""
+    if {'engine', 'n_workers'} <= set(metafunc.fixturenames):
+        config = metafunc.config
+        metafunc.parametrize('engine', _option_list(config, '--benchmark-engines'))
+        metafunc.parametrize('n_workers', [int(n) for n in _option_list(config, '--benchmark-workers')])
+
+@pytest.fixture(scope = 'module')
+def benchmark_results(request):
+    """Collects the results of the benchmarks, and saves them as JSON once they all ran"""
+    config = request.config
+    results = []
+    yield results
+
+    if not results:
+        return
+    output_fp = config.getoption('--benchmark-output')
+    if output_fp is None:
+        os.makedirs(BENCHMARKS_PATH, exist_ok = True)
+        output_fp = os.path.join(BENCHMARKS_PATH, f'benchmark_{int(time.time())}.json')
+    with open(output_fp, 'w') as f_out:
+        json.dump(
+            {
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'n_products': config.getoption('--benchmark-products'),
+                'delay': config.getoption('--benchmark-delay'),
+                'results': results,
+            },
+            f_out,
+            indent = 2
+        )
+    logger.info(f'Saved the benchmark results to {output_fp!r}')
+
+@pytest.fixture(scope = 'module')
+def benchmark_pages(request, tmp_path_factory) -> str:
+    """
+    Folder with the recorded product pages, a large one, and a listing page
+    of `--benchmark-products` products that cycles through them
+    """
+    pages_dir = tmp_path_factory.mktemp('benchmark_pages')
+    for page in PRODUCT_PAGES:
+        shutil.copy(os.path.join(FIXTURES_DIR, page), pages_dir)
+
+    with open(os.path.join(FIXTURES_DIR, PRODUCT_PAGES[0]), encoding = 'utf-8') as f_in:
+        html = f_in.read()
+    padding = f'<script>/*{"x"*LARGE_PAGE_BYTES}*/</script>'
+    (pages_dir / 'product_large.html').write_text(html.replace('</body>', padding + '</body>'), encoding = 'utf-8')
+
+    pages = [*PRODUCT_PAGES, 'product_large.html']
+    # the query makes each href unique, whereas the server ignores it
+    teasers = '\n'.join(
+        f'<div class="oct-teaser"><a class="oct-teaser__title-link" href="/{pages[i%len(pages)]}?id={i}">Product {i}</a></div>'
+        for i in range(request.config.getoption('--benchmark-products'))
+    )
+    (pages_dir / 'listing.html').write_text(
+        f'<!DOCTYPE html>\n<html lang="en">\n<body>\n<div class="oct-grid">\n{teasers}\n</div>\n</body>\n</html>\n',
+        encoding = 'utf-8'
+    )
+    return str(pages_dir)
+
+def _startup_time(engine: str) -> float:
+    """Seconds a fresh interpreter takes to import the engine module"""
+    code = f'import time; start = time.perf_counter(); import {ENGINE_MODULES[engine]}; print(time.perf_counter() - start)'
+    output = subprocess.run([sys.executable, '-c', code], cwd = SRC_DIR, capture_output = True, text = True, check = True)
+    return float(output.stdout)
+
+def _run(args: list[str], tmp_dir: str) -> tuple[int, float, int]:
+    """
+    Runs the CLI with `args` in a new process, and returns its exit code, its
+    elapsed seconds and its peak RSS, in KB (None where `os.wait4` is missing)
+    """
+    env = {**os.environ, 'PYTHONPATH': SRC_DIR}
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', _RUN_CLI, tmp_dir, *args],
+        cwd = ROOT_DIR, env = env, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL
+    )
+    if not hasattr(os, 'wait4'):
+        exit_code = process.wait()
+        return exit_code, time.perf_counter() - start, None
+
+    # unlike `resource.RUSAGE_CHILDREN`, the usage of this process only
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # `ru_maxrss` is in bytes on macOS, and in KB elsewhere
+    peak_rss = usage.ru_maxrss//1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return process.returncode, time.perf_counter() - start, peak_rss
+
+def test_benchmark(engine, n_workers, benchmark_pages, benchmark_results, start_fixture_server, tmp_path, request):
+    """
+    Measures the throughput, the per-product latency percentiles, the peak RSS and the
+    startup time of an engine, parsing the benchmark listing with `n_workers` workers
+    """
+    config = request.config
+    n_products = config.getoption('--benchmark-products')
+    server_url = start_fixture_server(config.getoption('--benchmark-delay'), benchmark_pages)
+
+    metrics_fp = str(tmp_path / 'metrics.json')
+    args = [
+        '--url', f'{server_url}/listing.html',
+        '--engine', engine,
+        '--workers', str(n_workers),
+        '--output-path', str(tmp_path),
+        '--metrics-file', metrics_fp,
+    ]
+    if engine != 'selenium':
+        args.append('--no-rating-fallback')
+    if engine == 'async':
+        # the politeness limits would bound the throughput, rather than the engine
+        args += ['--rate', '1000']
+
+    exit_code, elapsed, peak_rss = _run(args, str(tmp_path / 'tmp'))
+    assert exit_code == 0
+
+    with open(tmp_path / 'sleep_products.json') as f_in:
+        assert len(json.load(f_in)['Products']) == n_products
+    with open(metrics_fp) as f_in:
+        metrics = json.load(f_in)
+    product_latency = next(
+        histogram for histogram in metrics['histograms'] if histogram['labels'].get('stage') == 'product'
+    )
+
+    result = {
+        'engine': engine,
+        'n_workers': n_workers,
+        'elapsed_seconds': elapsed,
+        'products_per_second': n_products/elapsed,
+        'product_p50_seconds': product_latency['p50'],
+        'product_p95_seconds': product_latency['p95'],
+        'peak_rss_kb': peak_rss,
+        'startup_seconds': _startup_time(engine),
+    }
+    benchmark_results.append(result)
+    logger.info(
+        f"{engine} x{n_workers}: {result['products_per_second']:.1f} products/s, "
+        f"p50 {result['product_p50_seconds']:.3f}s, p95 {result['product_p95_seconds']:.3f}s, "
+        f"peak RSS {peak_rss} KB, startup {result['startup_seconds']:.3f}s"
+    )
@@ -0,0 +1,35 @@
+import json
+from _browser import BrowserProfile, NetworkStats
+
+
+def performance_entry(method, **params):
+    return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+def test_allowed_url_patterns():
+    """Check the blocked patterns that would block the allowed ones are dropped"""
+    profile = BrowserProfile(
+        blocked_url_patterns = ('*.png', '*bazaarvoice.com*', '*tracker.com*'),
+        allowed_url_patterns = ('*apps.bazaarvoice.com*',)
+    )
+    assert profile.effective_blocked_url_patterns == ['*.png', '*tracker.com*']
+
+def test_default_profile_keeps_rating_widget():
+    """Check the default profile does not block the rating widget"""
+    profile = BrowserProfile()
+    assert '*network.bazaarvoice.com*' in profile.effective_blocked_url_patterns
+    assert len(profile.effective_blocked_url_patterns) == len(profile.blocked_url_patterns)
+    assert profile.prefs and '--blink-settings=imagesEnabled=false' in profile.arguments
+    # reading the performance log after each page is opt-in
+    assert not profile.collect_stats
+
+def test_network_stats():
+    """Check the requests, blocked requests and transferred bytes are read from the performance log"""
+    stats = NetworkStats()
+    stats.add_performance_log([
+        performance_entry('Network.requestWillBeSent', requestId = '1'),
+        performance_entry('Network.requestWillBeSent', requestId = '2'),
+        performance_entry('Network.loadingFinished', requestId = '1', encodedDataLength = 2048),
+        performance_entry('Network.loadingFailed', requestId = '2', blockedReason = 'inspector'),
+        performance_entry('Page.loadEventFired'),
+    ])
+    assert (stats.n_requests, stats.n_blocked, stats.transferred_bytes) == (2, 1, 2048)
@@ -0,0 +1,76 @@
+import pytest
+
+import json
+import _base
+from _cache import PageCache, PageCacheMiss, RAW_HTML, RENDERED_DOM
+from _http import BootsHttpScraper
+
+
+@pytest.fixture
+def cache_fp(tmp_path):
+    return str(tmp_path / 'cache' / 'pages.sqlite')
+
+def test_get_put(cache_fp):
+    """Check pages are stored by URL and kind, and persist across instances"""
+    cache = PageCache(cache_fp)
+    assert cache.get('https://example.com/a') is None
+
+    cache.put('https://example.com/a', '<p>raw</p>', final_url = 'https://example.com/b')
+    cache.put('https://example.com/a', '<p>rendered</p>', RENDERED_DOM)
+    cache.close()
+
+    cache = PageCache(cache_fp)
+    page = cache.get('https://example.com/a', RAW_HTML)
+    assert page.html == '<p>raw</p>' and page.final_url == 'https://example.com/b'
+    assert cache.get('https://example.com/a', RENDERED_DOM).html == '<p>rendered</p>'
+    assert (cache.n_hits, cache.n_misses) == (2, 0)
+    cache.close()
+
+def test_lru_eviction(cache_fp):
+    """Check the least recently used pages are evicted first, keeping the cache within budget"""
+    # random-ish pages, so that compression does not shrink them much
+    pages = {f'https://example.com/{i}': ''.join(f'{j*i*7919 % 1009}' for j in range(400)) for i in range(1, 4)}
+    cache = PageCache(cache_fp, max_bytes = 10**9)
+    for url, html in pages.items():
+        cache.put(url, html)
+    page_size = cache.size//3
+
+    cache.max_bytes = cache.size - page_size//2
+    cache.get('https://example.com/1')
+    cache.put('https://example.com/2', pages['https://example.com/2'])
+
+    assert cache.size <= cache.max_bytes
+    assert cache.get('https://example.com/3') is None
+    assert cache.get('https://example.com/1') is not None
+    cache.close()
+
+def test_replay_only(cache_fp):
+    """Check replay-only mode raises on misses, and stores nothing"""
+    cache = PageCache(cache_fp, replay_only = True)
+    cache.put('https://example.com/a', '<p>a</p>')
+    with pytest.raises(PageCacheMiss):
+        cache.get('https://example.com/a')
+    cache.close()
+
+def test_http_replay(fixture_server, tmp_path, monkeypatch, cache_fp):
+    """Check a run can be replayed from the page cache, without requests"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    url = f'{fixture_server}/listing.html'
+
+    scraper = BootsHttpScraper(url = url, rating_fallback = False, page_cache = PageCache(cache_fp))
+    expected = [scraper._parse_product(product) for product in scraper.find_products()]
+    scraper.page_cache.close()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('Unexpected request')
+
+    scraper = BootsHttpScraper(url = url, rating_fallback = False, page_cache = PageCache(cache_fp, replay_only = True))
+    monkeypatch.setattr(scraper, '_get', fail)
+    replayed = [scraper._parse_product(product) for product in scraper.find_products()]
+    # replayed pages were not transferred, so they only have their decoded size
+    assert all(product_data.pop('Page_Transfer_KB') is None for product_data in replayed)
+    for product_data in expected:
+        del product_data['Page_Transfer_KB']
+    # NaN ratings do not compare equal, but their JSON does
+    assert json.dumps(replayed) == json.dumps(expected)
+    scraper.page_cache.close()
@@ -0,0 +1,44 @@
+import json
+import math
+
+from _changes import ChangeIndex, record_digest
+
+
+def record(title, price, rating = math.nan, page_size = 100):
+    return {'Title': title, 'Price': price, 'Price_Unit': '£', 'Short_Desc': None, 'Rating': rating, 'Page_Size_KB': page_size}
+
+def test_record_digest_ignores_page_sizes():
+    """Check the digest only depends on the compared fields, and missing ratings are equal"""
+    assert record_digest(record('a', 1.)) == record_digest(record('a', 1., page_size = 200))
+    assert record_digest(record('a', 1.)) != record_digest(record('a', 2.))
+
+def test_change_feed(tmp_path):
+    """Check the feed has the added, removed and modified products since the previous run, which is persisted"""
+    path = str(tmp_path / 'index.json')
+    index = ChangeIndex(path)
+    feed = index.diff([('p1', record('a', 1.)), ('p2', record('b', 2.))])
+    assert feed['Summary'] == {'Added': 2, 'Removed': 0, 'Modified': 0, 'Unchanged': 0}
+    assert feed['Previous_Run_Timestamp'] is None
+    index.save()
+
+    index = ChangeIndex(path)
+    feed = index.diff([('p1', record('a', 1.5, rating = '4.5')), ('p3', record('c', 3.))])
+    assert feed['Summary'] == {'Added': 1, 'Removed': 1, 'Modified': 1, 'Unchanged': 0}
+    assert feed['Added'] == [{'Key': 'p3', 'Record': record('c', 3.)}]
+    assert [change['Key'] for change in feed['Removed']] == ['p2']
+    [modified] = feed['Modified']
+    assert modified['Key'] == 'p1' and set(modified['Changes']) == {'Price', 'Rating'}
+    assert modified['Changes']['Price'] == {'Old': 1., 'New': 1.5}
+    assert math.isnan(modified['Changes']['Rating']['Old']) and modified['Changes']['Rating']['New'] == '4.5'
+
+def test_write_feed(tmp_path):
+    """Check the feed is written, and a rerun without changes has an empty one"""
+    path = str(tmp_path / 'index.json')
+    records = [('p1', record('a', 1.)), ('p2', record('b', 2.))]
+    ChangeIndex(path).write_feed(records, str(tmp_path / 'changes.json'))
+
+    ChangeIndex(path).write_feed(records, str(tmp_path / 'changes.json'))
+    with open(tmp_path / 'changes.json') as f_in:
+        feed = json.load(f_in)
+    assert feed['Summary'] == {'Added': 0, 'Removed': 0, 'Modified': 0, 'Unchanged': 2}
+    assert not feed['Added'] and not feed['Removed'] and not feed['Modified']
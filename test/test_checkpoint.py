@@ -0,0 +1,60 @@
+import math
+from _checkpoint import CheckpointJournal
+
+
+def test_append_and_resume(tmp_path):
+    """Check the records survive reopening the journal, and the latest record of a key wins"""
+    path = str(tmp_path / 'checkpoint.jsonl')
+    journal = CheckpointJournal(path)
+    journal.append('a', {'Price': '1.00'})
+    journal.append('b', {'Price': '2.00', 'Rating': math.nan})
+    journal.append('a', {'Price': '3.00'})
+    journal.close()
+
+    journal = CheckpointJournal(path)
+    assert 'a' in journal and 'b' in journal and 'c' not in journal
+    assert len(journal) == 2
+
+    records = list(journal.records())
+    assert [record['Price'] for record in records] == ['2.00', '3.00']
+    assert math.isnan(records[0]['Rating'])
+
+def test_corrupted_tail_is_dropped(tmp_path):
+    """Check an append interrupted by a crash is dropped, and the journal stays appendable"""
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(str(path))
+    journal.append('a', {'Price': '1.00'})
+    journal.close()
+    with open(path, 'ab') as f_out:
+        f_out.write(b'{"key": "b", "rec')
+
+    journal = CheckpointJournal(str(path))
+    assert len(journal) == 1 and 'b' not in journal
+
+    journal.append('b', {'Price': '2.00'})
+    assert [record['Price'] for record in journal.records()] == ['1.00', '2.00']
+
+def test_remove(tmp_path):
+    """Check removing the journal deletes its file and empties it"""
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(str(path), fsync = False)
+    journal.append('a', {})
+    journal.remove()
+
+    assert not path.exists()
+    assert len(journal) == 0 and list(journal.records()) == []
+
+def test_get_and_compact(tmp_path):
+    """Check single records are read by key, and compacting keeps only the latest ones"""
+    path = tmp_path / 'checkpoint.jsonl'
+    journal = CheckpointJournal(str(path))
+    for i in range(3):
+        journal.append('a', {'i': i})
+    journal.append('b', {'i': 3})
+
+    assert journal.get('a') == {'i': 2} and journal.get('c') is None
+
+    journal.compact()
+    assert len(path.read_text().splitlines()) == 2
+    assert journal.get('a') == {'i': 2} and journal.get('b') == {'i': 3}
+    assert CheckpointJournal(str(path)).get('a') == {'i': 2}
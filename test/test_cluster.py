@@ -0,0 +1,128 @@
+import pytest
+
+import json
+import queue
+import time
+import _base
+import _cluster
+from _base import ScrapingException
+from _cluster import NodePool, NoHealthyNodeError
+from _http import BootsHttpScraper
+from _product import Product
+
+
+DEAD_NODE_URL = 'http://127.0.0.1:9'
+
+class StubSession:
+    def __init__(self, node_url):
+        self.node_url = node_url
+
+    def close(self):
+        pass
+
+def stub_parse(delays):
+    """Returns a function that processes items after the delay of the session node, failing in dead nodes"""
+    def parse(session, item):
+        delay = delays[session.node_url]
+        if delay is None:
+            raise ConnectionError(f'{session.node_url} is down')
+        time.sleep(delay)
+        return session.node_url
+    return parse
+
+def test_node_pool_requeues_items_of_dead_nodes():
+    """Check the items that fail in a dead node are processed by the rest, and the node is taken out"""
+    delays = {'a': 0.01, 'b': 0.01, 'dead': None}
+    with NodePool(StubSession, list(delays), 2) as pool:
+        results = list(pool.imap_unordered(stub_parse(delays), range(30)))
+        nodes = {node.url: node for node in pool.nodes}
+
+    assert sorted(item for item, _, _ in results) == list(range(30))
+    assert all(error is None for _, _, error in results)
+    assert {result for _, result, _ in results} == {'a', 'b'}
+    assert nodes['dead'].n_failed and not nodes['dead'].n_done
+    assert nodes['a'].alive and nodes['b'].alive
+
+def test_node_pool_prefers_fast_nodes():
+    """Check faster nodes process more items"""
+    delays = {'fast': 0.005, 'slow': 0.1}
+    with NodePool(StubSession, list(delays), 2) as pool:
+        results = [result for _, result, _ in pool.imap_unordered(stub_parse(delays), range(40))]
+
+    assert results.count('fast') > 3*results.count('slow')
+
+def test_node_pool_not_done_while_item_taken(monkeypatch):
+    """Check the pool is not done between a worker taking the last item from the queue and processing it"""
+    class ProbedQueue(queue.Queue):
+        def get(self, *args, **kwargs):
+            job = super().get(*args, **kwargs)
+            # the work queue, unlike the results one, is bounded
+            if self.maxsize:
+                # e.g., the last item, once the feeder is done
+                if self.empty():
+                    pool._fed.wait(1)
+                done_while_taken.append(pool._is_done())
+            return job
+
+    monkeypatch.setattr(_cluster.queue, 'Queue', ProbedQueue)
+    done_while_taken = []
+    with NodePool(StubSession, ['a', 'b'], 2) as pool:
+        results = list(pool.imap_unordered(lambda session, item: item, range(20)))
+
+    assert len(results) == 20
+    assert len(done_while_taken) == 20 and not any(done_while_taken)
+
+def test_node_pool_item_errors():
+    """Check item errors are yielded, without requeuing the item or taking out the node"""
+    def parse(session, item):
+        if item == 3:
+            raise ValueError('boom')
+        return item
+
+    with NodePool(StubSession, ['a', 'b'], 1) as pool:
+        errors = [item for item, _, error in pool.imap_unordered(parse, range(10)) if error is not None]
+        assert errors == [3]
+        assert all(node.alive for node in pool.nodes)
+
+def test_node_pool_all_nodes_down():
+    """Check the pool raises once every node is down"""
+    delays = {'a': None, 'b': None}
+    with NodePool(StubSession, list(delays), 1) as pool:
+        with pytest.raises(NoHealthyNodeError):
+            list(pool.imap_unordered(stub_parse(delays), range(10)))
+
+def test_http_mirrors(fixture_server, start_fixture_server, tmp_path, monkeypatch):
+    """Check products are parsed across several mirrors, one of them down, into a single output"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    node_urls = [start_fixture_server(), start_fixture_server(delay = 0.05), DEAD_NODE_URL]
+
+    # the site URL is unreachable, so the products are only parsed through the mirrors
+    scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False)
+    products = scraper.find_products()
+    for product in products:
+        product.href = product.href.replace(fixture_server, 'http://boots.invalid')
+
+    scraper.parse_products(products, output_path = str(tmp_path), n_workers = 2, node_urls = node_urls)
+
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert sorted(product['Title'] for product in output['Products']) == sorted(p.name for p in products)
+
+def test_http_mirrors_missing_pages(fixture_server, start_fixture_server, tmp_path, monkeypatch):
+    """Check the 404s of delisted products fail the products, rather than taking the mirrors out"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    monkeypatch.setattr(_base, 'FAILED_PRODUCTS_LOG_FP', str(tmp_path / 'failed_{time}.txt'))
+    node_urls = [start_fixture_server(), start_fixture_server()]
+
+    scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False)
+    products = scraper.find_products()
+    delisted = [Product(href = f'http://boots.invalid/delisted_{i}.html', name = f'Delisted {i}') for i in range(4)]
+    for product in products:
+        product.href = product.href.replace(fixture_server, 'http://boots.invalid')
+
+    with pytest.raises(ScrapingException):
+        scraper.parse_products(delisted + products, output_path = str(tmp_path), n_workers = 1, node_urls = node_urls)
+
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        output = json.load(f_in)
+    assert sorted(product['Title'] for product in output['Products']) == sorted(p.name for p in products)
@@ -0,0 +1,96 @@
+import pytest
+
+import asyncio
+import time
+import _decorator
+from _decorator import CircuitBreaker, RetryBudget, async_retry, retry
+from _metrics import METRICS, FATAL_ERRORS, RETRY_BUDGET_EXHAUSTED
+
+
+class FatalError(Exception):
+    pass
+
+def flaky_function(calls: list, n_failures: int, error: Exception = ValueError('boom'), **kwargs):
+    """Returns a function decorated with `retry(**kwargs)` that fails its first `n_failures` calls"""
+    @retry(**{'exceptions': Exception, 'delay': 0, **kwargs})
+    def flaky(key = 'a'):
+        calls.append(key)
+        if len(calls) <= n_failures:
+            raise error
+        return 'ok'
+    return flaky
+
+def test_full_jitter(monkeypatch):
+    """Check the waits are random, between 0 and the exponential backoff delay"""
+    sleeps = []
+    monkeypatch.setattr(_decorator.time, 'sleep', sleeps.append)
+
+    calls = []
+    flaky = flaky_function(calls, 4, n_tries = 5, delay = 1, backoff = 2, max_delay = 100)
+    assert flaky() == 'ok'
+
+    assert len(sleeps) == 4
+    assert all(0 <= sleep_time <= 2**n for n, sleep_time in enumerate(sleeps, 1))
+
+def test_fatal_errors_are_not_retried():
+    """Check the errors that are not retriable are re-raised right away"""
+    METRICS.reset()
+    calls = []
+    flaky = flaky_function(calls, 1, FatalError(), is_retriable = lambda e: not isinstance(e, FatalError))
+    with pytest.raises(FatalError):
+        flaky()
+
+    assert len(calls) == 1
+    assert METRICS.counters[(FATAL_ERRORS, (('function', 'flaky'),))] == 1
+
+def test_retry_budget():
+    """Check the retries stop once the budget shared by the functions is exhausted"""
+    METRICS.reset()
+    budget = RetryBudget(ratio = 0, min_retries = 2)
+    calls = []
+    flaky = flaky_function(calls, 10, n_tries = 5, budget = budget)
+    with pytest.raises(ValueError):
+        flaky()
+
+    # the first call, and the 2 retries of the budget
+    assert len(calls) == 3
+    assert METRICS.counters[(RETRY_BUDGET_EXHAUSTED, (('function', 'flaky'),))] == 1
+
+def test_circuit_breaker_pauses_key():
+    """Check a key is paused after consecutive failures, and resumes after the pause"""
+    breaker = CircuitBreaker(failure_threshold = 2, reset_timeout = 0.2)
+    calls = []
+    flaky = flaky_function(calls, 2, n_tries = 3, breaker = breaker, breaker_key = lambda key = 'a': key)
+
+    start = time.monotonic()
+    assert flaky('a') == 'ok'
+    # the third attempt waited for the circuit, opened by the second failure
+    assert time.monotonic() - start >= 0.2
+    assert breaker.wait_time('a') == 0 and breaker.wait_time('b') == 0
+
+    breaker.record_failure('b')
+    breaker.record_failure('b')
+    assert breaker.wait_time('b') > 0 and breaker.wait_time('a') == 0
+
+def test_async_retry_circuit_breaker():
+    """Check the async variant waits for the circuit without blocking the event loop"""
+    breaker = CircuitBreaker(failure_threshold = 1, reset_timeout = 0.2)
+    calls = []
+
+    @async_retry(exceptions = ValueError, n_tries = 2, delay = 0, breaker = breaker)
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError('boom')
+        return 'ok'
+
+    async def run():
+        ticks = 0
+        task = asyncio.create_task(flaky())
+        while not task.done():
+            ticks += 1
+            await asyncio.sleep(0.01)
+        return task.result(), ticks
+
+    result, ticks = asyncio.run(run())
+    assert result == 'ok' and ticks > 5
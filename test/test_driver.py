@@ -0,0 +1,205 @@
+import pytest
+
+import math
+import shutil
+import time
+from selenium import webdriver
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+
+import _scraper
+from _base import PRODUCT_RATING_CLASS_NAME, RATING_PLACEHOLDER_SELECTOR
+from _scraper import BootsPageScraper, ChromeDriverWrapper
+from _product import Product
+
+
+# executables of a local Chrome, which runs the page scripts against the fixture pages
+CHROME_EXECUTABLES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser')
+
+
+class StubElement:
+    def __init__(self, text):
+        self.text = text
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+class StubDriver:
+    """
+    Fake WebDriver whose rating (or missing rating marker) shows up after `delay` seconds,
+    and whose batch extraction script returns the given `extracted` result
+    """
+    def __init__(self, rating = None, delay = 0.3, extracted = None):
+        self.rating = rating
+        self.ready_at = time.monotonic() + delay
+        self.extracted = extracted
+        self.n_extractions = 0
+        self.n_round_trips = 0
+
+    def get(self, url):
+        pass
+
+    def find_element(self, by, value):
+        if self.rating is None or time.monotonic() < self.ready_at:
+            raise NoSuchElementException(value)
+        return StubElement(self.rating)
+
+    def execute_script(self, script, *args):
+        self.n_round_trips += 1
+        if script == _scraper._EXTRACT_ELEMENTS_SCRIPT:
+            self.n_extractions += 1
+            return self.extracted
+        if time.monotonic() < self.ready_at:
+            return None
+        return {'rating': self.rating}
+
+def stub_wrapper(driver):
+    wrapper = ChromeDriverWrapper.__new__(ChromeDriverWrapper)
+    wrapper.driver = driver
+    wrapper.network_stats = None
+    wrapper._session_manager = None
+    wrapper.n_pages = 0
+    return wrapper
+
+def test_wait_until_any():
+    """Check the name and result of the first fulfilled condition are returned"""
+    wrapper = stub_wrapper(StubDriver())
+    conditions = {
+        'never': lambda driver: False,
+        'missing': lambda driver: driver.find_element('id', 'missing'),
+        'ready': lambda driver: time.monotonic() >= driver.ready_at and 'yes',
+    }
+    assert wrapper._wait_until_any(conditions, timeout = 2) == ('ready', 'yes')
+
+    with pytest.raises(TimeoutException):
+        wrapper._wait_until_any({'never': lambda driver: False}, timeout = 0.2)
+
+@pytest.mark.parametrize('rating', ['4.5', None])
+def test_read_rating(rating):
+    """Check ratings are read, and missing ones resolve as soon as the widget loads"""
+    driver = StubDriver(rating)
+    start = time.monotonic()
+    result = BootsPageScraper._read_rating(None, stub_wrapper(driver))
+
+    assert time.monotonic() - start < 1
+    # a single round-trip per poll
+    assert driver.n_round_trips <= 0.3/_scraper.WAIT_POLL_FREQUENCY + 2
+    if rating is None:
+        assert math.isnan(result)
+    else:
+        assert result == rating
+
+def test_parse_product_single_extraction():
+    """Check the product fields, and the page size, are read in a single extraction round-trip"""
+    extracted = {
+        'elements': {
+            'title': [['Nytol One-A-Night', None, {}]],
+            'rating': [['4.5', None, {}]],
+            'text': [['Helps you fall asleep.\nSecond line', None, {}]],
+            'price': [['£5.99', None, {}]],
+            'rating_widget': [['4.5', None, {}]],
+        },
+        'page_size': {'transfer': 1024, 'decoded': 4096},
+    }
+    driver = StubDriver('4.5', delay = 0, extracted = extracted)
+    scraper = BootsPageScraper.__new__(BootsPageScraper)
+    scraper.page_cache = None
+    scraper.ratings_provider = None
+
+    product_data = scraper._parse_product(Product(href = 'https://example.com/p', name = ''), stub_wrapper(driver))
+
+    assert driver.n_extractions == 1
+    assert product_data == {
+        'Title': 'Nytol One-A-Night',
+        'Price': 5.99,
+        'Price_Unit': '£',
+        'Short_Desc': 'Helps you fall asleep.',
+        'Rating': '4.5',
+        'Page_Size_KB': 4,
+        'Page_Transfer_KB': 1,
+    }
+
+def test_probe_session_per_worker():
+    """Check each worker thread probes the product pages with its own HTTP session, as sessions are not thread-safe"""
+    import threading
+
+    scraper = BootsPageScraper.__new__(BootsPageScraper)
+    scraper._probe_sessions, scraper._all_probe_sessions = threading.local(), []
+    sessions = []
+    threads = [threading.Thread(target = lambda: sessions.append(scraper._probe_session())) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(session) for session in sessions}) == 3
+    assert scraper._probe_session() is scraper._probe_session()
+    assert len(scraper._all_probe_sessions) == 4
+    for session in scraper._all_probe_sessions:
+        session.close()
+
+def test_parse_product_skips_rating_wait():
+    """Check the rating is not waited for if the ratings provider reads it in bulk, from the product ID"""
+    extracted = {
+        'elements': {
+            'title': [['Nytol One-A-Night', None, {}]],
+            'rating': [],
+            'text': [],
+            'price': [['£5.99', None, {}]],
+            'rating_widget': [['', None, {'data-bv-product-id': '10178953'}]],
+        },
+        'page_size': {'transfer': None, 'decoded': 2048},
+    }
+    # the rating would only resolve after the rating timeout
+    driver = StubDriver(None, delay = 60, extracted = extracted)
+    scraper = BootsPageScraper.__new__(BootsPageScraper)
+    scraper.page_cache = None
+    scraper.ratings_provider = object()
+    product = Product(href = 'https://example.com/p', name = '')
+
+    start = time.monotonic()
+    product_data = scraper._parse_product(product, stub_wrapper(driver))
+
+    assert time.monotonic() - start < 1
+    assert product.product_id == '10178953'
+    assert product_data['Rating'] is None
+
+@pytest.fixture(scope = 'module')
+def local_chrome():
+    """Headless local Chrome WebDriver, if Chrome is installed"""
+    if not any(shutil.which(executable) for executable in CHROME_EXECUTABLES):
+        pytest.skip('needs a local Chrome')
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    try:
+        driver = webdriver.Chrome(options = options)
+    except WebDriverException as e:
+        pytest.skip(f'unable to start Chrome: {type(e).__name__}')
+    yield driver
+    driver.quit()
+
+@pytest.mark.parametrize(
+    'page, widget_html, expected',
+    [
+        # rendered by the server
+        ('product_4.html', None, {'rating': '4.6'}),
+        # the served placeholder, before the widget loads
+        ('product_1.html', None, None),
+        ('product_1.html', f'<div class="{PRODUCT_RATING_CLASS_NAME}">4.2</div>', {'rating': '4.2'}),
+        # the widget loaded without rating, e.g., its "no reviews" state
+        ('product_1.html', '<button>Write a review</button>', {'rating': None}),
+        # no widget at all
+        ('product_5.html', None, {'rating': None}),
+    ]
+)
+def test_read_rating_script(local_chrome, fixture_server, page, widget_html, expected):
+    """Check the rating script against the fixture pages, i.e., it keeps polling until the widget loads"""
+    local_chrome.get(f'{fixture_server}/{page}')
+    if widget_html is not None:
+        local_chrome.execute_script(
+            'document.querySelector(arguments[0]).innerHTML = arguments[1]', RATING_PLACEHOLDER_SELECTOR, widget_html
+        )
+    result = local_chrome.execute_script(_scraper._READ_RATING_SCRIPT, PRODUCT_RATING_CLASS_NAME, RATING_PLACEHOLDER_SELECTOR)
+    assert result == expected
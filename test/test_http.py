@@ -0,0 +1,196 @@
+import pytest
+
+import json
+import math
+import _base
+from _base import parse_listing_details
+from _html import BY_ID, BY_CLASS_NAME, extract_elements, extract_json_ld, extract_scoped_elements
+from _http import BootsHttpScraper
+from _product import Product
+
+
+EXPECTED_PRODUCTS = {
+    'product_1.html': {
+        'Title': 'Nytol One-A-Night 50mg Tablets - 20 Tablets',
+        'Price': 5.99,
+        'Price_Unit': '£',
+        'Short_Desc': 'Nytol One-A-Night helps you fall asleep.',
+    },
+    'product_2.html': {
+        'Title': 'Kalms Night One-A-Night - 21 Tablets',
+        'Price': 4.49,
+        'Price_Unit': '£',
+        'Short_Desc': 'Missing product description.',
+    },
+    'product_3.html': {
+        'Title': 'Boots Sleep Aid & Relief 25mg Tablets - 20 Tablets',
+        'Price': 12.,
+        'Price_Unit': '£',
+        'Short_Desc': 'Helps relieve temporary sleeplessness.',
+    },
+}
+
+def test_extract_elements_text():
+    """Check the extracted text is rendered as `WebElement.text` does"""
+    html = (
+        '<div id="a">  One <b>bold</b>\n word<br>next   line'
+        '<p>paragraph</p><script>ignored()</script><li hidden>hidden</li></div>'
+        '<span class="x y">first</span><span class="y">second</span>'
+    )
+    elements = extract_elements(html, {'a': (BY_ID, 'a'), 'y': (BY_CLASS_NAME, 'y')})
+
+    assert elements['a'][0].text == 'One bold word\nnext line\nparagraph'
+    assert [element.text for element in elements['y']] == ['first', 'second']
+    assert elements['y'][0].attrs['class'] == 'x y'
+
+def test_extract_scoped_elements():
+    """Check the elements are grouped by their innermost scope element, and the rest are skipped"""
+    html = (
+        '<span class="x">outside</span>'
+        '<div class="s"><span class="x">a</span><div class="s"><span class="x">b</span></div><span class="x">c</span></div>'
+        '<div class="s"></div>'
+    )
+    scoped = extract_scoped_elements(html, (BY_CLASS_NAME, 's'), {'x': (BY_CLASS_NAME, 'x')})
+
+    assert [[element.text for element in elements['x']] for elements in scoped] == [['a', 'c'], ['b'], []]
+
+def test_extract_json_ld():
+    """Check the JSON-LD items are read, flattening arrays and graphs, and invalid scripts are skipped"""
+    html = (
+        '<script type="application/ld+json">[{"@type": "A"}, {"@graph": [{"@type": "B"}]}]</script>'
+        '<script type="application/ld+json">{invalid</script>'
+        '<script>{"@type": "C"}</script>'
+    )
+    assert extract_json_ld(html) == [{'@type': 'A'}, {'@type': 'B'}]
+
+def test_parse_listing_details():
+    """Check the teaser details take precedence over the structured data, which fills the missing ones"""
+    html = '''
+        <script type="application/ld+json">{"@type": "ItemList", "itemListElement": [
+            {"@type": "ListItem", "url": "/a", "item": {"@type": "Product", "url": "/a", "description": "First\\nSecond",
+             "offers": {"price": "1.00", "priceCurrency": "GBP"}, "aggregateRating": {"ratingValue": 4}}},
+            {"@type": "ListItem", "item": {"@type": "Product", "url": "https://example.com/c",
+             "offers": [{"price": 3, "priceCurrency": "EUR"}]}}
+        ]}</script>
+        <div class="oct-teaser"><a class="oct-teaser__title-link" href="/a">A</a><p class="oct-teaser__productPrice">£2.50</p></div>
+        <div class="oct-teaser"><a class="oct-teaser__title-link" href="/b">B</a></div>
+        <div class="oct-teaser"><a class="oct-teaser__title-link" href="c">C</a></div>
+    '''
+    a, b, c = parse_listing_details(html, 'https://example.com/sleep')
+
+    assert (a.href, a.name, a.price_unit, a.price, a.rating, a.description) == ('https://example.com/a', 'A', '£', 2.5, '4', 'First')
+    assert (b.price, b.rating, b.description) == (None, None, None)
+    assert (c.price_unit, c.price) == ('€', 3.)
+
+@pytest.fixture
+def scraper(fixture_server, tmp_path, monkeypatch):
+    """`BootsHttpScraper` for the fixture server listing, without rating fallback"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False)
+    yield scraper
+    scraper.quit()
+
+class TestBootsHttpScraper:
+    """Class that contains the tests for the `BootsHttpScraper`, against the recorded pages"""
+    def test_find_products(self, scraper, fixture_server):
+        """Check the listing page products, with absolute hrefs"""
+        products = scraper.find_products()
+
+        assert [product.href for product in products] == [
+            f'{fixture_server}/{page}' for page in EXPECTED_PRODUCTS
+        ]
+        assert [product.name for product in products] == [
+            expected['Title'] for expected in EXPECTED_PRODUCTS.values()
+        ]
+
+    @pytest.mark.parametrize('page', EXPECTED_PRODUCTS)
+    def test_parse_product(self, scraper, fixture_server, page):
+        """Check the product pages are parsed as `BootsPageScraper` does"""
+        product_data = scraper._parse_product(Product(href = f'{fixture_server}/{page}'))
+
+        assert {key: product_data[key] for key in EXPECTED_PRODUCTS[page]} == EXPECTED_PRODUCTS[page]
+        assert math.isnan(product_data['Rating'])
+        assert isinstance(product_data['Page_Size_KB'], int)
+        # the fixture server sends the `Content-Length` of the (uncompressed) page
+        assert product_data['Page_Transfer_KB'] == product_data['Page_Size_KB']
+
+    def test_listing_only(self, fixture_server, tmp_path, monkeypatch):
+        """Check the products are read from the listing page only, with its details"""
+        monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+        scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False, listing_only = True)
+        fetched_urls = []
+        get_html = scraper._get_html
+        monkeypatch.setattr(scraper, '_get_html', lambda url, session = None: fetched_urls.append(url) or get_html(url, session))
+
+        scraper.parse_products(scraper.find_products(), output_path = str(tmp_path))
+        scraper.quit()
+
+        assert fetched_urls == [f'{fixture_server}/listing.html']
+        with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+            output = {product['Title']: product for product in json.load(f_in)['Products']}
+        for page, expected in EXPECTED_PRODUCTS.items():
+            assert {key: output[expected['Title']][key] for key in ('Price', 'Price_Unit')} == {
+                key: expected[key] for key in ('Price', 'Price_Unit')
+            }
+        assert output[EXPECTED_PRODUCTS['product_1.html']['Title']]['Short_Desc'] == EXPECTED_PRODUCTS['product_1.html']['Short_Desc']
+        assert output[EXPECTED_PRODUCTS['product_2.html']['Title']]['Rating'] == '4.2'
+
+    @pytest.mark.parametrize('n_workers', [1, 3])
+    def test_parse_products(self, scraper, tmp_path, n_workers):
+        """Check the output file, parsing the products sequentially and concurrently"""
+        products = scraper.find_products()
+        scraper.parse_products(products, output_path = str(tmp_path), n_workers = n_workers)
+
+        with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+            output = json.load(f_in)
+
+        titles = {product['Title'] for product in output['Products']}
+        assert titles == {expected['Title'] for expected in EXPECTED_PRODUCTS.values()}
+
+    def test_rating_fallback_browser_per_worker(self, fixture_server, tmp_path, monkeypatch):
+        """Check concurrent workers read the ratings in browsers of their own, up to the limit, which are then reused"""
+        import threading
+        import time
+        import _http
+        import _scraper
+
+        monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+        n_workers = 2*_http.MAX_FALLBACK_BROWSERS
+        # only released once as many workers as browsers read a rating at once
+        barrier = threading.Barrier(_http.MAX_FALLBACK_BROWSERS, timeout = 5)
+        n_reading, max_reading = [0], [0]
+        lock = threading.Lock()
+
+        class StubBrowser:
+            def __init__(self, **kwargs):
+                self.n_reads = 0
+
+            def _read_page_rating(self, href):
+                with lock:
+                    n_reading[0] += 1
+                    max_reading[0] = max(max_reading[0], n_reading[0])
+                self.n_reads += 1
+                if self.n_reads == 1:
+                    barrier.wait()
+                time.sleep(0.05)
+                with lock:
+                    n_reading[0] -= 1
+                return '4.2'
+
+            def quit(self):
+                pass
+
+        monkeypatch.setattr(_scraper, 'BootsPageScraper', StubBrowser)
+        scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html')
+        products = [Product(href = f'{fixture_server}/product_{i}.html') for i in range(n_workers)]
+        threads = [threading.Thread(target = scraper._read_rating, args = (product,)) for product in products]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not barrier.broken
+        assert max_reading[0] == _http.MAX_FALLBACK_BROWSERS
+        assert scraper._read_rating(products[0]) == '4.2'
+        assert len(scraper._browsers) == _http.MAX_FALLBACK_BROWSERS
+        scraper.quit()
@@ -0,0 +1,83 @@
+import pytest
+
+import _base
+from _http import BootsHttpScraper
+from _incremental import IncrementalCache
+from _product import Product
+
+
+@pytest.fixture
+def cache_fp(tmp_path):
+    return str(tmp_path / 'cache' / 'incremental.jsonl')
+
+def probing_scraper(fixture_server, cache):
+    """`BootsHttpScraper` that probes the product pages with the given incremental cache"""
+    scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False)
+    scraper.incremental_cache = cache
+    return scraper
+
+def test_probe(fixture_server, cache_fp):
+    """Check a stored page is unchanged (the fixture server answers `If-Modified-Since` with 304)"""
+    href = f'{fixture_server}/product_1.html'
+    cache = IncrementalCache(cache_fp)
+    scraper = probing_scraper(fixture_server, cache)
+
+    probe = scraper._probe_product(Product(href = href))
+    assert not probe.unchanged
+    assert probe.validators['last_modified'] and probe.validators['content_hash']
+    # the fetched page, to be parsed
+    assert probe.page[0].startswith('<!DOCTYPE html>')
+
+    cache.store(href, {'Title': 'cached'}, probe)
+    probe = scraper._probe_product(Product(href = href))
+    assert probe.unchanged and probe.record == {'Title': 'cached'}
+    cache.close()
+    scraper.quit()
+
+def test_probe_content_hash(fixture_server, cache_fp):
+    """Check the content hash detects unchanged pages without validators"""
+    href = f'{fixture_server}/product_1.html'
+    cache = IncrementalCache(cache_fp)
+    scraper = probing_scraper(fixture_server, cache)
+    probe = scraper._probe_product(Product(href = href))
+    probe.validators['last_modified'] = None
+    cache.store(href, {'Title': 'cached'}, probe)
+
+    assert scraper._probe_product(Product(href = href)).unchanged
+    cache.close()
+    scraper.quit()
+
+def test_ttl(fixture_server, cache_fp):
+    """Check expired records are parsed again"""
+    href = f'{fixture_server}/product_1.html'
+    cache = IncrementalCache(cache_fp, ttl = 0)
+    scraper = probing_scraper(fixture_server, cache)
+    cache.store(href, {'Title': 'cached'}, scraper._probe_product(Product(href = href)))
+
+    assert not scraper._probe_product(Product(href = href)).unchanged
+    cache.close()
+    scraper.quit()
+
+def test_incremental_run(fixture_server, tmp_path, monkeypatch, cache_fp):
+    """Check a second run reuses every product, and writes the same output, requesting each page once"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    outputs = []
+    requested_urls = []
+    for run in range(2):
+        scraper = BootsHttpScraper(url = f'{fixture_server}/listing.html', rating_fallback = False)
+        requested_urls.append([])
+        get = scraper._get
+        monkeypatch.setattr(scraper, '_get', lambda url, *args: requested_urls[-1].append(url) or get(url, *args))
+        cache = IncrementalCache(cache_fp)
+        output_path = tmp_path / f'run_{run}'
+        output_path.mkdir()
+
+        scraper.parse_products(scraper.find_products(), output_path = str(output_path), incremental_cache = cache)
+        scraper.quit()
+        outputs.append((output_path / _base.OUTPUT_FILE).read_text())
+
+    assert cache.n_reused == 3
+    # each product page is requested once, i.e., the page of the probe is parsed
+    for urls in requested_urls:
+        assert len(urls) == len(set(urls)) == 4
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,114 @@
+import multiprocessing
+
+from _jobs import DONE, FAILED, IN_PROGRESS, PENDING, JobQueue
+
+
+N_JOBS = 50
+
+def claim_all(path, keys):
+    """Claims and completes as many `keys` as possible, and returns the claimed ones"""
+    jobs = JobQueue(path)
+    claimed = [key for key in keys if jobs.claim(key) and jobs.complete(key, {'key': key})]
+    jobs.close()
+    return claimed
+
+def test_claim_is_exclusive(tmp_path):
+    """Check a claimed job is skipped by other workers, and by everyone once done"""
+    path = str(tmp_path / 'jobs.sqlite')
+    worker, other = JobQueue(path), JobQueue(path)
+
+    assert worker.claim('a', 'https://example.com/a', 'A')
+    assert not other.claim('a') and not worker.claim('a')
+    assert worker.count(IN_PROGRESS) == 1
+
+    assert worker.complete('a', {'Title': 'A'})
+    assert not other.claim('a')
+    assert 'a' in other and len(other) == 1
+    assert list(other.records()) == [('a', {'Title': 'A'})]
+
+def test_claim_across_processes(tmp_path):
+    """Check concurrent processes claim every job exactly once"""
+    path = str(tmp_path / 'jobs.sqlite')
+    keys = [f'p{i}' for i in range(N_JOBS)]
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        claimed = pool.starmap(claim_all, [(path, keys)]*4)
+
+    assert sorted(key for keys in claimed for key in keys) == sorted(keys)
+    assert len(JobQueue(path)) == N_JOBS
+
+def test_expired_lease_is_taken_over(tmp_path):
+    """Check the jobs of a crashed worker are taken over, and its late results are dropped"""
+    path = str(tmp_path / 'jobs.sqlite')
+    crashed, other = JobQueue(path, lease_ttl = 0), JobQueue(path)
+    assert crashed.claim('a', 'https://example.com/a', 'A')
+
+    assert other.claim_next() == ('a', 'https://example.com/a', 'A')
+    assert other.claim_next() is None
+    assert not crashed.complete('a', {'Title': 'stale'})
+    assert other.complete('a', {'Title': 'A'})
+    assert [record for _, record in other.records()] == [{'Title': 'A'}]
+
+def test_failed_and_released_jobs(tmp_path):
+    """Check failed jobs are claimed again when listed, and released ones right away"""
+    path = str(tmp_path / 'jobs.sqlite')
+    worker, other = JobQueue(path), JobQueue(path)
+    worker.claim('a')
+    worker.claim('b')
+
+    worker.fail('a', 'ValueError: boom')
+    assert worker.count(FAILED) == 1
+    # failed jobs are only retried by the workers that list them
+    assert other.claim_next() is None
+    assert other.claim('a')
+
+    assert worker.release() == 1
+    assert worker.count(PENDING) == 1
+    assert other.claim_next()[0] == 'b'
+
+def test_remove(tmp_path):
+    """Check removing the queue deletes its database"""
+    path = tmp_path / 'jobs.sqlite'
+    jobs = JobQueue(str(path))
+    jobs.claim('a')
+    jobs.complete('a', {})
+    jobs.remove()
+
+    assert not list(tmp_path.iterdir())
+    assert len(jobs) == 0 and jobs.count(DONE) == 0
+
+def test_memberships(tmp_path):
+    """Check each category records its jobs once, even if listed again, e.g., when resuming"""
+    jobs = JobQueue(str(tmp_path / 'jobs.sqlite'))
+    assert jobs.memberships() == {}
+
+    jobs.add_memberships([('a', 'sleep'), ('b', 'sleep'), ('a', 'relax')])
+    jobs.add_memberships([('a', 'sleep')])
+    assert jobs.memberships() == {'relax': ['a'], 'sleep': ['a', 'b']}
+
+def test_renewed_lease_is_kept(tmp_path):
+    """Check a renewed lease outlives its original expiry, and only the jobs this worker holds are renewed"""
+    import time
+
+    path = str(tmp_path / 'jobs.sqlite')
+    worker, other = JobQueue(path, lease_ttl = 0.2), JobQueue(path)
+    worker.claim('a')
+    other.claim('b')
+
+    time.sleep(0.15)
+    assert worker.renew(['a', 'b']) == 1
+    time.sleep(0.1)
+    assert other.claim_next() is None
+
+def test_keys_and_leases_of_others(tmp_path):
+    """Check the keys are listed by state, and only the live leases of other workers are counted"""
+    path = str(tmp_path / 'jobs.sqlite')
+    worker, other, crashed = JobQueue(path), JobQueue(path), JobQueue(path, lease_ttl = -1)
+    worker.claim('a')
+    other.claim('b')
+    crashed.claim('c')
+    worker.fail('a', 'ValueError: boom')
+
+    assert worker.keys(FAILED) == ['a']
+    assert sorted(worker.keys(PENDING, IN_PROGRESS)) == ['b', 'c']
+    assert worker.n_leased_by_others() == 1
+    assert other.n_leased_by_others() == 0
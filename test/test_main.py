@@ -0,0 +1,30 @@
+import pytest
+
+import importlib.util
+import os
+from click.testing import CliRunner
+
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# the CLI module is `src/__main__.py`, which `import __main__` would not find, as it is pytest's
+_spec = importlib.util.spec_from_file_location('cli', os.path.join(SRC_DIR, '__main__.py'))
+cli = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cli)
+
+
+@pytest.mark.parametrize('args, option', [
+    (['--network-stats'], '--network-stats'),
+    (['--engine', 'http', '--lean-browser'], '--lean-browser'),
+    (['--engine', 'async', '--warm-sessions'], '--warm-sessions'),
+    (['--engine', 'http', '--page-load-strategy', 'eager'], '--page-load-strategy'),
+    (['--rate', '5'], '--rate'),
+    (['--engine', 'http', '--max-concurrency', '3'], '--max-concurrency'),
+    (['--engine', 'async', '--node-url', 'http://127.0.0.1:9'], '--node-url'),
+])
+def test_ignored_options_are_rejected(args, option):
+    """Check the options the selected engine would ignore are rejected, before any scraping"""
+    result = CliRunner().invoke(cli.main, args)
+
+    assert result.exit_code == 2
+    assert f'`{option}`' in result.output
@@ -0,0 +1,73 @@
+import pytest
+
+import json
+import math
+from _decorator import retry
+from _metrics import METRICS, PAGE_BYTES, RETRIES, STAGE_SECONDS, Histogram, Metrics
+
+
+def test_histogram_quantiles():
+    """Check the quantiles are interpolated within their bucket, and bounded by the maximum"""
+    histogram = Histogram(buckets = (1, 2, 4))
+    assert math.isnan(histogram.quantile(0.5))
+
+    for value in (0.5, 1.5, 1.5, 3):
+        histogram.observe(value)
+
+    assert histogram.count == 4 and histogram.sum == 6.5 and histogram.max == 3
+    assert histogram.bucket_counts == [1, 2, 1, 0]
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1) == 3
+
+def test_timer_records_failures():
+    """Check the timed stages are recorded, even if they raise"""
+    metrics = Metrics()
+
+    @metrics.timed('parse')
+    def parse(fail):
+        if fail:
+            raise ValueError('boom')
+
+    parse(False)
+    with pytest.raises(ValueError):
+        parse(True)
+    with metrics.timer('write'):
+        pass
+
+    histograms = {h['labels']['stage']: h for h in metrics.as_dict()['histograms']}
+    assert histograms['parse']['count'] == 2 and histograms['write']['count'] == 1
+
+def test_retries_are_counted():
+    """Check `retry` counts the failed attempts of the decorated function"""
+    METRICS.reset()
+    n_calls = []
+
+    @retry(exceptions = ValueError, delay = 0)
+    def flaky():
+        n_calls.append(1)
+        if len(n_calls) < 3:
+            raise ValueError('boom')
+
+    flaky()
+    assert METRICS.counters[(RETRIES, (('function', 'flaky'),))] == 2
+
+def test_exports():
+    """Check the metrics are exported as JSON and as Prometheus text"""
+    metrics = Metrics()
+    metrics.observe(STAGE_SECONDS, 0.2, stage = 'navigation')
+    metrics.observe(PAGE_BYTES, 300*1024)
+    metrics.count(RETRIES, function = '_get')
+
+    exported = json.loads(metrics.to_json())
+    assert [h['name'] for h in exported['histograms']] == [PAGE_BYTES, STAGE_SECONDS]
+    assert exported['counters'] == [{'name': RETRIES, 'labels': {'function': '_get'}, 'value': 1}]
+
+    lines = metrics.to_prometheus().splitlines()
+    assert '# TYPE boots_scraper_stage_seconds histogram' in lines
+    assert 'boots_scraper_stage_seconds_bucket{stage="navigation",le="0.25"} 1' in lines
+    assert 'boots_scraper_stage_seconds_bucket{stage="navigation",le="0.1"} 0' in lines
+    assert 'boots_scraper_stage_seconds_count{stage="navigation"} 1' in lines
+    assert 'boots_scraper_page_bytes_count 1' in lines
+    assert 'boots_scraper_retries_total{function="_get"} 1' in lines
+
+    assert 'navigation' in metrics.summary()
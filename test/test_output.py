@@ -0,0 +1,110 @@
+import pytest
+
+import csv
+import json
+import os
+import math
+from datetime import datetime, timezone
+from _output import history_fp, load_history, open_products_writer, to_typed_row
+
+
+RECORDS = [
+    {'Title': 'A', 'Price': 5.99, 'Rating': '4.5'},
+    {'Title': 'B', 'Price': 4.01, 'Rating': math.nan},
+    {'Title': 'C', 'Price': 1.5, 'Rating': None},
+    {'Title': 'D', 'Price': None, 'Rating': None},
+]
+SUMMARY = {'Median': 4.01, 'Mean': 3.83}
+RUN_TIMESTAMP = datetime(2024, 1, 31, 8, tzinfo = timezone.utc)
+
+def test_json_writer_matches_json_dump(tmp_path):
+    """Check the streamed JSON is byte-identical to dumping the whole output at once"""
+    fp = tmp_path / 'out.json'
+    with open_products_writer(str(fp), 'json') as writer:
+        for record in RECORDS:
+            writer.write(record)
+
+    expected = json.dumps({'Products': RECORDS, **SUMMARY})
+    assert fp.read_text() == expected
+
+def test_ndjson_writer(tmp_path):
+    """Check the NDJSON lines are readable while writing, and the summary sidecar file"""
+    fp = tmp_path / 'out.ndjson'
+    writer = open_products_writer(str(fp), 'ndjson')
+    writer.write(RECORDS[0])
+    assert json.loads(fp.read_text()) == RECORDS[0]
+
+    for record in RECORDS[1:]:
+        writer.write(record)
+    writer.close()
+
+    assert len(fp.read_text().splitlines()) == len(RECORDS)
+    assert json.loads((tmp_path / 'out_summary.json').read_text()) == SUMMARY
+
+def test_unknown_format(tmp_path):
+    """Check unknown formats are rejected"""
+    with pytest.raises(ValueError):
+        open_products_writer(str(tmp_path / 'out.xml'), 'xml')
+
+def test_csv_writer(tmp_path):
+    """Check the CSV rows have plain numbers, empty missing values, and the run timestamp"""
+    fp = tmp_path / 'out.csv'
+    with open_products_writer(str(fp), 'csv', RUN_TIMESTAMP) as writer:
+        for record in RECORDS:
+            writer.write(record)
+
+    with open(fp, newline = '') as f_in:
+        rows = list(csv.DictReader(f_in))
+    assert [row['Rating'] for row in rows] == ['4.5', '', '', '']
+    assert rows[3]['Price'] == '' and rows[0]['Page_Size_KB'] == ''
+    assert {row['Run_Timestamp'] for row in rows} == {RUN_TIMESTAMP.isoformat()}
+    assert json.loads((tmp_path / 'out_summary.json').read_text()) == SUMMARY
+
+def test_typed_row_unparsable_values():
+    """Check the float columns of unparsable values, e.g., a rating placeholder, are missing, instead of raising"""
+    row = to_typed_row({'Title': 'E', 'Price': '3.50', 'Rating': 'n/a'}, RUN_TIMESTAMP)
+    assert (row['Price'], row['Rating']) == (3.5, None)
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_columnar_writers(tmp_path, monkeypatch, output_format):
+    """Check the columnar files have typed columns, across several batches"""
+    pa = pytest.importorskip('pyarrow')
+    monkeypatch.setattr('_output.COLUMNAR_BATCH_SIZE', 3)
+    fp = tmp_path / f'out.{output_format}'
+    with open_products_writer(str(fp), output_format, RUN_TIMESTAMP) as writer:
+        for record in RECORDS:
+            writer.write(record)
+
+    if output_format == 'parquet':
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(fp)
+    else:
+        table = pa.ipc.open_file(pa.memory_map(str(fp))).read_all()
+    assert table.schema.field('Price').type == pa.float64()
+    assert table.schema.field('Rating').type == pa.float64()
+    assert table.schema.field('Page_Size_KB').type == pa.int64()
+    assert table.column('Rating').to_pylist() == [4.5, None, None, None]
+    assert table.column('Run_Timestamp').to_pylist() == [RUN_TIMESTAMP]*len(RECORDS)
+    assert json.loads((tmp_path / 'out_summary.json').read_text()) == SUMMARY
+
+@pytest.mark.parametrize('output_format', ['csv', 'parquet', 'arrow'])
+def test_load_history(tmp_path, output_format):
+    """Check the runs appended to the history are loaded, and filtered, by run date"""
+    pytest.importorskip('pyarrow')
+    import pyarrow.dataset as ds
+
+    fp = str(tmp_path / f'out.{output_format}')
+    for day in (1, 2):
+        run_timestamp = RUN_TIMESTAMP.replace(day = day)
+        run_fp = history_fp(fp, run_timestamp)
+        os.makedirs(os.path.dirname(run_fp))
+        with open_products_writer(run_fp, output_format, run_timestamp) as writer:
+            for record in RECORDS:
+                writer.write(record)
+
+    history = load_history(str(tmp_path / 'out'), output_format)
+    assert history.count_rows() == 2*len(RECORDS)
+    table = history.to_table(filter = ds.field('run_date') == '2024-01-02')
+    assert table.num_rows == len(RECORDS)
+    assert table.column('Price').to_pylist()[:3] == [5.99, 4.01, 1.5]
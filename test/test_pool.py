@@ -0,0 +1,82 @@
+import pytest
+
+import threading
+import time
+from _pool import DriverPool
+
+
+class StubSession:
+    """Stand-in for a `ChromeDriverWrapper`, which records the items it processes"""
+    def __init__(self):
+        self.items = []
+        self.closed = False
+
+    def quit(self):
+        self.closed = True
+
+class TestDriverPool:
+    """Class that contains the tests for the `DriverPool`"""
+    def test_all_items_processed(self):
+        """Check every item is processed exactly once, and sessions are closed afterwards"""
+        def func(session, item):
+            session.items.append(item)
+            return item*2
+
+        with DriverPool(StubSession, 3) as pool:
+            results = list(pool.imap_unordered(func, range(20)))
+            sessions = pool.sessions
+
+        assert sorted(result for _, result, _ in results) == [2*i for i in range(20)]
+        assert sorted(item for session in sessions for item in session.items) == list(range(20))
+        assert all(session.closed for session in sessions)
+
+    def test_errors_are_yielded(self):
+        """Check a failing item does not stop the rest"""
+        def func(session, item):
+            if item == 3:
+                raise ValueError('boom')
+            return item
+
+        with DriverPool(StubSession, 2) as pool:
+            results = {item: (result, error) for item, result, error in pool.imap_unordered(func, range(5))}
+
+        assert isinstance(results[3][1], ValueError)
+        assert all(results[i] == (i, None) for i in (0, 1, 2, 4))
+
+    def test_work_is_concurrent(self):
+        """Check the items are processed concurrently"""
+        barrier = threading.Barrier(4, timeout = 5)
+
+        def func(session, item):
+            # it only passes if the 4 workers are running at once
+            barrier.wait()
+            return item
+
+        with DriverPool(StubSession, 4) as pool:
+            results = list(pool.imap_unordered(func, range(4)))
+
+        assert len(results) == 4
+
+    def test_bounded_queue(self):
+        """Check the items are pulled lazily from the input"""
+        pulled = []
+
+        def items():
+            for i in range(100):
+                pulled.append(i)
+                yield i
+
+        def func(session, item):
+            time.sleep(0.1)
+            return item
+
+        with DriverPool(StubSession, 2, queue_size = 2) as pool:
+            results = pool.imap_unordered(func, items())
+            next(results)
+            # at most, the finished (2), in-progress (2), queued (2) and feeder (1) ones
+            assert len(pulled) <= 7
+
+    def test_invalid_workers(self):
+        """Check the pool needs at least one worker"""
+        with pytest.raises(ValueError):
+            DriverPool(StubSession, 0)
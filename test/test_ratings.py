@@ -0,0 +1,45 @@
+import pytest
+
+import json
+import math
+import _base
+from _async import AsyncBootsScraper
+from _http import BootsHttpScraper
+from _ratings import RatingsProvider
+
+
+# expected ratings of the listing products, by title, as in `fixtures/ratings.json`
+EXPECTED_RATINGS = {
+    'Nytol One-A-Night 50mg Tablets - 20 Tablets': '4.5',
+    'Kalms Night One-A-Night - 21 Tablets': math.nan,
+    'Boots Sleep Aid & Relief 25mg Tablets - 20 Tablets': '3.9',
+}
+
+def test_fetch_in_batches(ratings_server):
+    """Check the ratings are requested in batches, and the products without reviews have none"""
+    api_url, requests = ratings_server
+    provider = RatingsProvider('passkey', api_url = api_url, batch_size = 2)
+    ratings = provider.fetch(['10178953', '10263541', '10088620', 'unknown', '10178953'])
+    provider.close()
+
+    assert requests == [['10178953', '10263541'], ['10088620', 'unknown']]
+    assert ratings['10178953'] == '4.5' and ratings['10088620'] == '3.9'
+    assert math.isnan(ratings['10263541']) and math.isnan(ratings['unknown'])
+
+@pytest.mark.parametrize('scraper_class', [BootsHttpScraper, AsyncBootsScraper])
+def test_parse_products_joins_ratings(scraper_class, fixture_server, ratings_server, tmp_path, monkeypatch):
+    """Check the ratings read in bulk are joined into the output records"""
+    monkeypatch.setattr(_base, 'TMP_DATA_PATH', str(tmp_path / 'tmp'))
+    api_url, requests = ratings_server
+    provider = RatingsProvider('passkey', api_url = api_url, batch_size = 2)
+    scraper = scraper_class(url = f'{fixture_server}/listing.html', rating_fallback = False)
+
+    scraper.parse_products(scraper.find_products(), output_path = str(tmp_path), n_workers = 2, ratings_provider = provider)
+    scraper.quit()
+    provider.close()
+
+    assert [len(product_ids) for product_ids in requests] == [2, 1]
+    with open(tmp_path / _base.OUTPUT_FILE) as f_in:
+        ratings = {product['Title']: product['Rating'] for product in json.load(f_in)['Products']}
+    # NaN ratings do not compare equal, but their JSON does
+    assert json.dumps(ratings, sort_keys = True) == json.dumps(EXPECTED_RATINGS, sort_keys = True)
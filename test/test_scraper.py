@@ -3,6 +3,7 @@ import pytest
 import re
 import json
 from _scraper import BootsPageScraper
+from _cache import PageCache
 
 
 EXPECTED_PAGE_TITLE = 'Sleep Aid Tablets | Sleep Products | Boots'
@@ -13,10 +14,14 @@ EXPECTED_PRODUCT_COUNT = 96 # this is just a fail-safe in case the regex match d
 @pytest.fixture(scope = 'class', autouse = True)
 def headless(pytestconfig):
     """
-    Sets the `headless` value for TestBootsPageScraper,
-    which comes from user input
+    Sets the `headless` and page cache values for TestBootsPageScraper,
+    which come from user input
     """
     TestBootsPageScraper.headless = pytestconfig.getoption('headless')
+    page_cache_fp = pytestconfig.getoption('page_cache')
+    TestBootsPageScraper.page_cache = (
+        PageCache(page_cache_fp, replay_only = pytestconfig.getoption('replay')) if page_cache_fp else None
+    )
 
 class TestBootsPageScraper:
     """Class that contains the tests for the `BootsPageScraper`"""
@@ -24,7 +29,8 @@ class TestBootsPageScraper:
     def setup_class(cls):
         cls.scraper = BootsPageScraper(
             headless = cls.headless,
-            auto_accept_cookies = False
+            auto_accept_cookies = False,
+            page_cache = cls.page_cache
         )
         cls.driver = cls.scraper.driver
 
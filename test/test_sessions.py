@@ -0,0 +1,124 @@
+import pytest
+
+import json
+import requests
+from selenium.common.exceptions import WebDriverException
+
+from _scraper import ChromeDriverWrapper
+from _sessions import SessionManager
+
+
+class StubDriver:
+    n_started = 0
+
+    def __init__(self):
+        StubDriver.n_started += 1
+        self.session_id = f'session-{StubDriver.n_started}'
+        self.alive = True
+        self.cookies = []
+        self.visited = []
+
+    def execute_script(self, script, *args):
+        if not self.alive:
+            raise WebDriverException('session deleted')
+        return 1
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def get_cookies(self):
+        return [{'name': 'OptanonAlertBoxClosed', 'value': '1'}]
+
+    def quit(self):
+        self.alive = False
+
+class StubWrapper:
+    """Stands in for a `ChromeDriverWrapper` that starts local sessions"""
+    _headless = False
+    _remote_executor_url = None
+
+    def _start_driver(self):
+        return StubDriver()
+
+@pytest.fixture
+def manager(tmp_path):
+    return SessionManager(max_pages = 3, state_path = str(tmp_path), site_url = 'https://example.com/sleep')
+
+def test_sessions_reused(manager):
+    """Check released sessions are handed to the next acquire"""
+    driver = manager.acquire(StubWrapper())
+    manager.release(driver, n_pages = 1)
+
+    assert manager.acquire(StubWrapper()) is driver
+    assert (manager.n_started, manager.n_reused) == (1, 1)
+
+def test_sessions_recycled(manager):
+    """Check sessions are replaced after `max_pages` pages, or once they stop responding"""
+    driver = manager.acquire(StubWrapper())
+    manager.release(driver, n_pages = 2)
+    manager.release(manager.acquire(StubWrapper()), n_pages = 1)
+    assert not driver.alive
+
+    driver = manager.acquire(StubWrapper())
+    manager.release(driver)
+    driver.alive = False
+    assert manager.acquire(StubWrapper()) is not driver
+    assert manager.n_recycled == 1
+
+def test_sessions_recycled_during_run(manager):
+    """Check a wrapper swaps its session once it loaded `max_pages` pages, without quitting"""
+    wrapper = ChromeDriverWrapper.__new__(ChromeDriverWrapper)
+    wrapper._headless, wrapper._remote_executor_url = False, None
+    wrapper._start_driver = StubDriver
+    wrapper._session_manager, wrapper.n_pages = manager, 0
+    wrapper.driver = first = manager.acquire(wrapper)
+
+    for _ in range(4):
+        wrapper.recycle_session_if_due()
+        wrapper.n_pages += 1
+
+    assert not first.alive and wrapper.driver is not first
+    assert (wrapper.n_pages, manager.n_recycled) == (1, 1)
+
+def test_health_checked_outside_lock(manager):
+    """Check sessions are probed without holding the lock, so that other workers are not stalled"""
+    class ProbedDriver(StubDriver):
+        def execute_script(self, script, *args):
+            assert not manager._lock.locked()
+            return super().execute_script(script, *args)
+
+    wrapper = StubWrapper()
+    wrapper._start_driver = ProbedDriver
+    driver = manager.acquire(wrapper)
+    manager.release(driver, n_pages = 1)
+    assert manager.acquire(wrapper) is driver
+
+def test_cookies_restored(manager):
+    """Check the saved cookies are restored in new sessions, from a page of the site"""
+    manager.save_cookies(StubDriver())
+    driver = manager.acquire(StubWrapper())
+
+    assert driver.visited == ['https://example.com/robots.txt']
+    assert [cookie['name'] for cookie in driver.cookies] == ['OptanonAlertBoxClosed']
+
+def test_close_quits_local_sessions(manager, tmp_path):
+    """Check local sessions are quit on close, as they cannot outlive the process"""
+    driver = manager.acquire(StubWrapper())
+    manager.release(driver)
+    manager.close()
+
+    assert not driver.alive
+    assert not (tmp_path / 'sessions.json').exists()
+
+def test_remote_executor_readiness(fixture_server):
+    """Check a ready executor is detected right away, and a missing one raises"""
+    wrapper = ChromeDriverWrapper.__new__(ChromeDriverWrapper)
+    wrapper._remote_executor_url = fixture_server
+    wrapper._wait_for_remote_executor(timeout = 1)
+
+    wrapper._remote_executor_url = 'http://127.0.0.1:9'
+    with pytest.raises(requests.ConnectionError):
+        wrapper._wait_for_remote_executor(timeout = 0.3)
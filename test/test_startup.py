@@ -0,0 +1,75 @@
+import logging
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+
+# modules that used to be imported just to average the prices
+HEAVY_MODULES = ('pandas', 'numpy')
+# modules only the engines (or the optional outputs) need, which the CLI imports once they are selected
+ENGINE_MODULES = ('selenium', 'urllib3', 'requests', 'aiohttp', 'pyarrow')
+# budgets of `--help`, beyond the ones of a bare interpreter, with room for slower machines
+MAX_STARTUP_MODULES = 150
+MAX_STARTUP_SECONDS = 0.3
+# budget of importing the scraper modules, i.e., with the engines, with room for slower machines
+MAX_IMPORT_SECONDS = 1.5
+
+
+logger = logging.getLogger(__name__)
+
+def _import_time(statement: str) -> tuple[float, set]:
+    """Runs `statement` in a fresh interpreter, and returns its time and the imported top-level modules"""
+    code = (
+        'import sys, time; start = time.perf_counter(); '
+        f'{statement}; '
+        'print(time.perf_counter() - start); '
+        'print(",".join({name.split(".")[0] for name in sys.modules}))'
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd = SRC_DIR, capture_output = True, text = True, check = True
+    ).stdout.splitlines()
+    return float(output[0]), set(output[1].split(','))
+
+def test_no_heavy_imports():
+    """Check the scraper modules do not import pandas nor numpy, and their import time stays within the budget"""
+    elapsed, modules = _import_time('import _base, _http, _scraper')
+    assert not modules.intersection(HEAVY_MODULES)
+
+    logger.info(f'Scraper modules import: {elapsed*1000:.0f} ms')
+    assert elapsed <= MAX_IMPORT_SECONDS
+
+def _importtime(*args: str) -> dict[str, float]:
+    """
+    Runs a fresh interpreter with `-X importtime` and `args`, and returns the cumulative
+    seconds of each module it imports, by module name, indented as nested in the importing module
+    """
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args], cwd = ROOT_DIR, capture_output = True, text = True, check = True
+    ).stderr.splitlines()
+    modules = {}
+    # e.g., `import time:       666 |      27001 | click`, after a header line
+    for line in output[1:]:
+        if line.startswith('import time:'):
+            _, cumulative, name = line.split('|')
+            # the name follows a separator space
+            modules[name[1:].rstrip()] = int(cumulative)/1e6
+    return modules
+
+def test_cli_startup():
+    """Check `--help` imports no engine, and its imported modules and time stay within the budgets"""
+    baseline = {name.strip() for name in _importtime('-c', 'pass')}
+    modules = _importtime(SRC_DIR, '--help')
+    new_modules = {name: seconds for name, seconds in modules.items() if name.strip() not in baseline}
+
+    imported = {name.strip().split('.')[0] for name in new_modules}
+    assert not imported.intersection(ENGINE_MODULES)
+    assert len(new_modules) <= MAX_STARTUP_MODULES
+
+    # the top-level imports, whose cumulative times include the nested ones
+    elapsed = sum(seconds for name, seconds in new_modules.items() if not name.startswith(' '))
+    logger.info(f'CLI startup: {len(new_modules)} modules in {elapsed*1000:.0f} ms')
+    assert elapsed <= MAX_STARTUP_SECONDS
@@ -0,0 +1,35 @@
+import pytest
+
+import math
+from _base import parse_price
+from _stats import PriceStats, RunningMean
+
+
+@pytest.mark.parametrize('price_str, expected', [
+    ('£5.99', ('£', 5.99)),
+    ('£12', ('£', 12.)),
+    ('From £3.49', ('F', 3.49)),
+    ('£', ('£', None)),
+])
+def test_parse_price(price_str, expected):
+    """Check prices are parsed as numbers, even when the string is unusual"""
+    assert parse_price(price_str) == expected
+
+def test_running_mean():
+    """Check the mean skips non-numeric values, and it is NaN without values"""
+    mean = RunningMean()
+    assert math.isnan(mean.value)
+
+    for value in ('1.5', 2.5, None, 'n/a', math.nan):
+        mean.add(value)
+    assert mean.count == 2 and mean.value == 2.
+
+def test_price_stats():
+    """Check the median and mean, which used to be mixed up"""
+    stats = PriceStats()
+    assert math.isnan(stats.median) and math.isnan(stats.mean)
+
+    for value in (1., 2., 10., '3.00', None):
+        stats.add(value)
+    assert stats.count == 4
+    assert stats.summary() == {'Median': 2.5, 'Mean': 4.}